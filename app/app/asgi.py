@@ -1,7 +1,9 @@
 """
 ASGI config for app project.
 
-It exposes the ASGI callable as a module-level variable named ``application``.
+It exposes the ASGI callable as a module-level variable named ``application``,
+serving app.urls_async. scripts/run.sh starts it with uvicorn when SERVER=asgi,
+one process per container.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
@@ -12,5 +14,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+os.environ.setdefault('ROOT_URLCONF', 'app.urls_async')
 
 application = get_asgi_application()
@@ -53,16 +53,31 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilingMiddleware',
+    'core.middleware.DatabaseRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'core.middleware.WebOnlyMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+# Only used outside API_PATH_PREFIXES, the API authenticates with tokens.
+WEB_ONLY_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'app.urls'
+API_PATH_PREFIXES = ['/api/']
+
+# The admin checks only look at MIDDLEWARE, the session, auth and messages
+# middleware are run for the admin through WEB_ONLY_MIDDLEWARE.
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
+
+# app.asgi serves app.urls_async, the same URLs with async views.
+ROOT_URLCONF = os.environ.get('ROOT_URLCONF', 'app.urls')
 
 TEMPLATES = [
     {
@@ -107,6 +122,71 @@ DATABASES = {
     }
 }
 
+# Read replicas
+# DB_REPLICA_HOSTS=host[:port],... adds `replica1`, `replica2`, ... aliases
+# with the credentials of `default`. Safe requests read from a replica unless
+# the user wrote within REPLICA_PIN_SECONDS. The pins are cached, so replicas
+# need a shared CACHE_BACKEND (system check core.E001).
+
+REPLICA_DATABASES = []
+for index, replica in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    replica_host, _, replica_port = replica.partition(':')
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port,
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASES.append(f'replica{index}')
+
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+# User sharding
+# DB_SHARD_HOSTS=host[:port][/name],... adds `shard1`, `shard2`, ... aliases.
+# New users are spread over `default` and the shards, ShardAssignment records
+# where each user's recipes, tags and ingredients live so existing users never
+# move unless `manage.py move_user_shard` moves them. Use a shared
+# CACHE_BACKEND with shards, the assignments are cached.
+# Migration 0018 gives the n-th alias the ids n * SHARD_ID_RANGE + 1 to
+# (n + 1) * SHARD_ID_RANGE so moved rows keep their ids, keep the order of
+# DB_SHARD_HOSTS and SHARD_ID_RANGE once the shards are migrated.
+
+SHARD_DATABASES = ['default']
+for index, shard in enumerate(filter(None, os.environ.get('DB_SHARD_HOSTS', '').split(',')), start=1):
+    shard, _, shard_name = shard.partition('/')
+    shard_host, _, shard_port = shard.partition(':')
+    shard_name = shard_name or DATABASES['default']['NAME']
+    DATABASES[f'shard{index}'] = {
+        **DATABASES['default'],
+        'NAME': shard_name,
+        'HOST': shard_host,
+        'PORT': shard_port,
+        'TEST': {'NAME': f'test_{shard_name}_shard{index}'},
+    }
+    SHARD_DATABASES.append(f'shard{index}')
+
+SHARDING_ENABLED = len(SHARD_DATABASES) > 1
+SHARD_CACHE_TIMEOUT = int(os.environ.get('SHARD_CACHE_TIMEOUT', 60))
+SHARD_ID_RANGE = int(os.environ.get('SHARD_ID_RANGE', 10 ** 12))
+
+DATABASE_ROUTERS = ['core.routers.ShardRouter', 'core.routers.ReplicaRouter']
+
+
+# Password hashing
+# Hashing runs in PASSWORD_HASHING_WORKERS processes per uWSGI worker (0 hashes
+# inline). Changing the hashers or iterations rehashes passwords on login.
+
+PASSWORD_HASHERS = list(filter(None, os.environ.get('PASSWORD_HASHERS', '').split(','))) or [
+    'core.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 260000))
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 0))
+PASSWORD_HASHING_QUEUE = int(os.environ.get('PASSWORD_HASHING_QUEUE', 8))
+PASSWORD_HASHING_TIMEOUT = float(os.environ.get('PASSWORD_HASHING_TIMEOUT', 5))
+
+AUTHENTICATION_BACKENDS = ['core.backends.PooledModelBackend']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -157,10 +237,127 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# Signed tokens
+# With SIGNED_TOKENS the token endpoint issues short lived signed access
+# tokens plus refresh tokens instead of database backed tokens. Access
+# tokens are revoked by bumping the user's token version, which is cached for
+# TOKEN_VERSION_CACHE_TIMEOUT seconds, so signed tokens need a shared
+# CACHE_BACKEND (system check core.E002).
+
+SIGNED_TOKENS = bool(int(os.environ.get('SIGNED_TOKENS', 0)))
+ACCESS_TOKEN_LIFETIME = int(os.environ.get('ACCESS_TOKEN_LIFETIME', 5 * 60))
+REFRESH_TOKEN_LIFETIME = int(os.environ.get('REFRESH_TOKEN_LIFETIME', 14 * 24 * 60 * 60))
+TOKEN_VERSION_CACHE_TIMEOUT = int(os.environ.get('TOKEN_VERSION_CACHE_TIMEOUT', 30))
+
 REST_FRAMEWORK = {
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema'
+    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_THROTTLE_CLASSES': ['core.throttling.TokenBucketThrottle'],
+    'DEFAULT_THROTTLE_RATES': {
+        'read': os.environ.get('THROTTLE_RATE_READ', '600/min'),
+        'write': os.environ.get('THROTTLE_RATE_WRITE', '120/min'),
+        'upload': os.environ.get('THROTTLE_RATE_UPLOAD', '20/min'),
+        'login': os.environ.get('THROTTLE_RATE_LOGIN', '30/min'),
+    },
 }
 
+# Rate limiting
+# Buckets live in shared memory created before uWSGI forks the workers.
+
+THROTTLE_ENABLED = bool(int(os.environ.get('THROTTLE_ENABLED', 1)))
+THROTTLE_TABLE_SLOTS = int(os.environ.get('THROTTLE_TABLE_SLOTS', 65536))
+
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True
 }
+
+# Metrics
+# Every uWSGI worker dumps its samples to METRICS_DIR, /metrics merges them.
+
+METRICS_ENABLED = bool(int(os.environ.get('METRICS_ENABLED', 1)))
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_ALLOWED_IPS = list(filter(
+    None,
+    os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')
+))
+
+# Profiling
+# Requests are profiled when they carry a signed X-Profile header
+# (see `manage.py profile_token`) or are picked by the sample rate.
+
+PROFILING_ENABLED = bool(int(os.environ.get('PROFILING_ENABLED', 0)))
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_DIR = os.environ.get('PROFILING_DIR', '/tmp/profiles')
+PROFILING_MAX_FILES = int(os.environ.get('PROFILING_MAX_FILES', 200))
+
+# Changes feed
+# /api/recipe/changes/ only returns rows older than CHANGES_SETTLE_SECONDS so
+# transactions that commit late cannot slip in behind a client's cursor.
+# Tombstones are kept TOMBSTONE_RETENTION_DAYS, older cursors must resync.
+
+CHANGES_PAGE_SIZE = int(os.environ.get('CHANGES_PAGE_SIZE', 200))
+CHANGES_SETTLE_SECONDS = float(os.environ.get('CHANGES_SETTLE_SECONDS', 2))
+TOMBSTONE_RETENTION_DAYS = int(os.environ.get('TOMBSTONE_RETENTION_DAYS', 30))
+
+# Pantry matching
+# The ingredient to recipes index of a user is cached for this long under a
+# version of their recipe ingredients, a change misses the cache at once. The
+# pantry action returns the best PANTRY_RESULTS recipes.
+
+PANTRY_INDEX_CACHE_TIMEOUT = int(os.environ.get('PANTRY_INDEX_CACHE_TIMEOUT', 600))
+PANTRY_RESULTS = int(os.environ.get('PANTRY_RESULTS', 50))
+
+# Similar recipes
+# The SIMILAR_RECIPES most similar recipes of every recipe are stored and
+# updated as tags and ingredients are linked, rebuild_recipe_similarity
+# recomputes them after changing these. Tags and ingredients of more than
+# SIMILAR_FEATURE_MAX_RECIPES recipes are not matched.
+
+SIMILAR_RECIPES = int(os.environ.get('SIMILAR_RECIPES', 10))
+SIMILAR_FEATURE_MAX_RECIPES = int(os.environ.get('SIMILAR_FEATURE_MAX_RECIPES', 200))
+
+# Idempotency keys
+# POSTs sent with an Idempotency-Key header store their response in
+# IDEMPOTENCY_STORE (core.idempotency.DatabaseStore or CacheStore) for
+# IDEMPOTENCY_TTL_SECONDS and retries get it replayed. A retry waits up to
+# IDEMPOTENCY_WAIT_SECONDS for the first request, which holds the key at most
+# IDEMPOTENCY_LOCK_SECONDS. Run purge_idempotency_keys to drop expired rows.
+
+IDEMPOTENCY_STORE = os.environ.get('IDEMPOTENCY_STORE', 'core.idempotency.DatabaseStore')
+IDEMPOTENCY_TTL_SECONDS = int(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 24 * 60 * 60))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 10))
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', 60))
+
+# Read coalescing
+# Identical concurrent GETs of the recipe, tag and ingredient lists share one
+# computation, within a process and across processes through the cache.
+# Waiters give up and run the view themselves after COALESCE_WAIT_SECONDS.
+
+COALESCE_READS = bool(int(os.environ.get('COALESCE_READS', 1)))
+COALESCE_WAIT_SECONDS = float(os.environ.get('COALESCE_WAIT_SECONDS', 5))
+
+# Task queue
+# Background tasks are rows of core_task run by `manage.py run_worker`. A
+# worker holds a task for TASK_LEASE_SECONDS before another may take it over,
+# failed tasks are retried after TASK_RETRY_BASE_SECONDS doubling up to
+# TASK_RETRY_MAX_SECONDS, at most TASK_MAX_ATTEMPTS times by default.
+
+TASK_LEASE_SECONDS = int(os.environ.get('TASK_LEASE_SECONDS', 300))
+TASK_RETRY_BASE_SECONDS = float(os.environ.get('TASK_RETRY_BASE_SECONDS', 10))
+TASK_RETRY_MAX_SECONDS = float(os.environ.get('TASK_RETRY_MAX_SECONDS', 60 * 60))
+TASK_MAX_ATTEMPTS = int(os.environ.get('TASK_MAX_ATTEMPTS', 5))
+TASK_POLL_SECONDS = float(os.environ.get('TASK_POLL_SECONDS', 1))
+
+# ASGI deployment
+# Under ASGI the blocking work of async views runs in a pool of
+# ASYNC_POOL_THREADS threads per process, each holding its own database
+# connections. run.sh starts one process per container: uvicorn spawns its
+# workers instead of forking them, so each would get its own rate limit table.
+
+ASYNC_POOL_THREADS = int(os.environ.get('ASYNC_POOL_THREADS', 16))
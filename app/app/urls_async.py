@@ -0,0 +1,10 @@
+"""URL configuration of the ASGI deployment
+
+The URLs of app.urls with every view made async, see core.asyncviews. Used as
+ROOT_URLCONF by app.asgi.
+"""
+from core.asyncviews import async_patterns
+
+from app import urls
+
+urlpatterns = async_patterns(urls.urlpatterns)
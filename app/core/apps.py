@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # create the shared rate limit table before uWSGI forks the workers
+        from core import ratelimit  # noqa: F401
+        from core import checks  # noqa: F401
+        from core import signals  # noqa: F401
@@ -0,0 +1,54 @@
+"""
+Async versions of API views for the ASGI deployment.
+
+Django 3.2 has no async ORM and DRF views are synchronous, so an async view
+runs the DRF view, queries, serialization and rendering included, in the
+bounded pool of core.pool. The event loop meanwhile reads and writes the
+sockets, so slow clients cost a coroutine instead of a worker.
+
+Every view is wrapped, a sync view left alone would run on Django's single
+thread for sync code and be served one request at a time per process.
+"""
+
+from django.urls import URLPattern, URLResolver
+
+from core import pool
+
+import functools
+
+
+def _render(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    return response
+
+
+def async_view(view):
+    """Wrap a view made by as_view() into a coroutine running it in the pool."""
+
+    # wraps() copies cls, actions and csrf_exempt, which the middleware and the schema read
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await pool.run(_render, view, request, *args, **kwargs)
+
+    return wrapper
+
+
+def async_patterns(patterns):
+    """Return patterns with their views made async, included patterns too."""
+
+    converted = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            pattern = URLResolver(
+                pattern.pattern,
+                async_patterns(pattern.url_patterns),
+                pattern.default_kwargs,
+                pattern.app_name,
+                pattern.namespace,
+            )
+        else:
+            pattern = URLPattern(pattern.pattern, async_view(pattern.callback), pattern.default_args, pattern.name)
+        converted.append(pattern)
+    return converted
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from core import passwords
+
+
+class PooledModelBackend(ModelBackend):
+    """Model backend verifying passwords in the hashing pool.
+
+    Hashes made with outdated hashers or work factors are replaced on a
+    successful login.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # hash anyway so unknown emails take as long as wrong passwords
+            passwords.make_password(password)
+            return None
+
+        valid, new_encoded = passwords.verify_password(password, user.password)
+        if not valid or not self.user_can_authenticate(user):
+            return None
+
+        if new_encoded:
+            user.password = new_encoded
+            user.save(update_fields=['password'])
+        return user
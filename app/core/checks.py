@@ -0,0 +1,41 @@
+"""
+System checks of the deployment settings.
+"""
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# cache backends keeping their entries in each process
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def shared_cache_errors(setting, error_id):
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f'{setting} needs a cache shared by every worker, {backend} is per process.',
+        hint='Set CACHE_BACKEND and CACHE_LOCATION to a shared cache such as memcached or the database cache.',
+        id=error_id,
+    )]
+
+
+@register(Tags.caches)
+def check_replica_pin_cache(app_configs, **kwargs):
+    """The read-your-writes pins must be seen by every worker."""
+
+    if not settings.REPLICA_DATABASES:
+        return []
+    return shared_cache_errors('REPLICA_DATABASES', 'core.E001')
+
+
+@register(Tags.caches)
+def check_token_version_cache(app_configs, **kwargs):
+    """A revocation must be seen by every worker, not only the one revoking."""
+
+    if not settings.SIGNED_TOKENS:
+        return []
+    return shared_cache_errors('SIGNED_TOKENS', 'core.E002')
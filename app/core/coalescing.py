@@ -0,0 +1,135 @@
+"""
+Single-flight coalescing of identical concurrent reads.
+
+Identical GET requests (same user, path, query string and media type) that
+overlap share one computation: the first runs the view and renders it, the
+others wait and get a copy of its bytes. Within a process the waiters block
+on an event, across processes the leader holds a lock in the cache and
+publishes its result there.
+
+A computation is only shared with requests that arrived before it started,
+so a client never gets a response older than its own request. Requests
+arriving while it runs wait for it to finish and share the next one.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from core import metrics
+
+import functools
+import hashlib
+import threading
+import time
+
+_local_lock = threading.Lock()
+# flights waiting for the running flight of their key to finish, and the running flights
+_waiting = {}
+_running = {}
+
+
+class _Flight:
+    """A computation in this process that other threads can wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.started = None
+        self.result = None
+
+
+def _lock_key(key):
+    return f'coalesce-lock:{key}'
+
+
+def _result_key(key):
+    return f'coalesce-result:{key}'
+
+
+class CoalescedReadMixin:
+    """Share the rendered response of concurrent identical reads.
+
+    Coalesces the actions in `coalesced_actions`. Only 200 responses are
+    shared, a waiter whose leader failed runs the view itself.
+    """
+
+    coalesced_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # runs after authentication and content negotiation, before the handler is looked up
+        if settings.COALESCE_READS and request.method == 'GET' and self.action in self.coalesced_actions:
+            self.get = functools.partial(self.coalesce, self.get)
+
+    def coalescing_key(self, request):
+        raw = f'{request.user.pk}\0{request.get_full_path()}\0{request.accepted_media_type}'
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def coalesce(self, handler, request, *args, **kwargs):
+        key = self.coalescing_key(request)
+
+        with _local_lock:
+            flight = _waiting.get(key)
+            leader = flight is None
+            if leader:
+                flight = _waiting[key] = _Flight()
+                previous = _running.get(key)
+
+        if not leader:
+            flight.done.wait(2 * settings.COALESCE_WAIT_SECONDS)
+            result = flight.result
+            metrics.record_cache('read_coalescing', result is not None)
+            if result is not None:
+                return self._shared_response(result)
+            return handler(request, *args, **kwargs)
+
+        if previous is not None:
+            # it may have read the database before the requests waiting on this flight wrote
+            previous.done.wait(settings.COALESCE_WAIT_SECONDS)
+        with _local_lock:
+            del _waiting[key]
+            _running[key] = flight
+            flight.started = time.time()
+
+        try:
+            return self._lead(flight, key, handler, request, *args, **kwargs)
+        finally:
+            with _local_lock:
+                if _running.get(key) is flight:
+                    del _running[key]
+            flight.done.set()
+
+    def _lead(self, flight, key, handler, request, *args, **kwargs):
+        """Run the view unless another process is already computing the same read."""
+
+        deadline = flight.started + settings.COALESCE_WAIT_SECONDS
+        while not cache.add(_lock_key(key), flight.started, settings.COALESCE_WAIT_SECONDS):
+            result = cache.get(_result_key(key))
+            # every request of this flight arrived before it started
+            if result is not None and result[0] >= flight.started:
+                metrics.record_cache('read_coalescing', True)
+                flight.result = result
+                return self._shared_response(result)
+            if time.time() >= deadline:
+                metrics.record_cache('read_coalescing', False)
+                return self._run(flight, key, handler, request, *args, **kwargs)
+            time.sleep(0.01)
+
+        try:
+            return self._run(flight, key, handler, request, *args, **kwargs)
+        finally:
+            cache.delete(_lock_key(key))
+
+    def _run(self, flight, key, handler, request, *args, **kwargs):
+        """Run the view and publish its rendered bytes if they can be shared."""
+
+        response = self.finalize_response(request, handler(request, *args, **kwargs), *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            response.render()
+            flight.result = (flight.started, response['Content-Type'], response.content)
+            cache.set(_result_key(key), flight.result, settings.COALESCE_WAIT_SECONDS)
+        return response
+
+    def _shared_response(self, result):
+        _started, content_type, content = result
+        return HttpResponse(content, content_type=content_type)
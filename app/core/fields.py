@@ -0,0 +1,68 @@
+"""
+Model fields.
+"""
+
+from django.db import connections, models
+from django.db.models.fields.related_descriptors import ManyToManyDescriptor
+from django.utils.functional import cached_property
+
+
+class UserScopedManyToManyDescriptor(ManyToManyDescriptor):
+    """Many to many accessor that keeps the through table's user_id in sync.
+
+    Both ends of the relation and the through rows belong to one user, the
+    manager fills `user_id` in on new links and adds it to every query on the
+    through table so Postgres can prune the partitions of other users.
+    """
+
+    @cached_property
+    def related_manager_cls(self):
+        manager_cls = super().related_manager_cls
+
+        class UserScopedManyRelatedManager(manager_cls):
+            def __init__(self, instance=None):
+                super().__init__(instance)
+                links = self.through._meta.get_field(self.target_field_name).related_query_name()
+                self.core_filters[f'{links}__user_id'] = instance.user_id
+
+            def add(self, *objs, through_defaults=None):
+                through_defaults = {**(through_defaults or {}), 'user_id': self.instance.user_id}
+                super().add(*objs, through_defaults=through_defaults)
+
+            def _build_remove_filters(self, removed_vals):
+                return super()._build_remove_filters(removed_vals) & models.Q(user_id=self.instance.user_id)
+
+            def _get_missing_target_ids(self, source_field_name, target_field_name, db, target_ids):
+                vals = self.through._default_manager.using(db).values_list(
+                    target_field_name, flat=True
+                ).filter(**{
+                    source_field_name: self.related_val[0],
+                    f'{target_field_name}__in': target_ids,
+                    'user_id': self.instance.user_id,
+                })
+                return target_ids.difference(vals)
+
+            def get_prefetch_queryset(self, instances, queryset=None):
+                queryset, *prefetch = super().get_prefetch_queryset(instances, queryset)
+                # the join table is referred to by name like the select Django adds
+                qn = connections[queryset.db].ops.quote_name
+                queryset = queryset.extra(
+                    where=[f'{qn(self.through._meta.db_table)}.{qn("user_id")} IN %s'],
+                    params=[tuple({instance.user_id for instance in instances})],
+                )
+                return (queryset, *prefetch)
+
+        return UserScopedManyRelatedManager
+
+
+class UserScopedManyToManyField(models.ManyToManyField):
+    """Many to many field between models of one user through a table with a user_id column."""
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        setattr(cls, self.name, UserScopedManyToManyDescriptor(self.remote_field, reverse=False))
+
+    def contribute_to_related_class(self, cls, related):
+        super().contribute_to_related_class(cls, related)
+        if not self.remote_field.is_hidden() and not related.related_model._meta.swapped:
+            setattr(cls, related.get_accessor_name(), UserScopedManyToManyDescriptor(self.remote_field, reverse=True))
@@ -0,0 +1,229 @@
+"""
+Idempotency-Key support for POST endpoints.
+
+A client retrying a POST sends the same Idempotency-Key header. The first
+request with a key runs the view and stores its response, later ones get the
+stored response back with an `Idempotent-Replayed: true` header. A retry
+arriving while the first request still runs waits for it. Keys are scoped
+to the user and path, and a key reused for a different request body is
+rejected.
+
+The store is settings.IDEMPOTENCY_STORE, the database or the cache. Responses
+are kept IDEMPOTENCY_TTL_SECONDS, and a running request holds its key for at
+most IDEMPOTENCY_LOCK_SECONDS so a crashed worker does not block retries.
+Errors and 5xx responses are not stored, so a retry runs the view again.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, router, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.response import Response
+from rest_framework.utils import encoders
+
+from core.models import IdempotencyRecord
+
+import datetime
+import functools
+import hashlib
+import json
+import time
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+NEW, PENDING, DONE = 'new', 'pending', 'done'
+
+
+class KeyInFlight(exceptions.APIException):
+    status_code = 409
+    default_detail = _('A request with this Idempotency-Key is still being processed, retry later.')
+    default_code = 'idempotency_key_in_flight'
+
+
+class KeyReused(exceptions.APIException):
+    status_code = 422
+    default_detail = _('This Idempotency-Key was used for a different request.')
+    default_code = 'idempotency_key_reused'
+
+
+class DatabaseStore:
+    """Keep idempotency records in the IdempotencyRecord table."""
+
+    def _records(self):
+        return IdempotencyRecord.objects.using(router.db_for_write(IdempotencyRecord))
+
+    def begin(self, key, fingerprint):
+        """Try to claim key.
+
+        Returns (NEW, None) when claimed, otherwise (PENDING or DONE, record)
+        where record is (fingerprint, status, data) or None if it just vanished.
+        """
+
+        now = timezone.now()
+        locked_until = now + datetime.timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        expires_at = now + datetime.timedelta(seconds=settings.IDEMPOTENCY_TTL_SECONDS)
+        records = self._records()
+        # expired records and abandoned claims are taken over in place
+        claimed = records.filter(
+            Q(expires_at__lt=now) | Q(status_code__isnull=True, locked_until__lt=now), key=key
+        ).update(
+            fingerprint=fingerprint, status_code=None, response=None, locked_until=locked_until, expires_at=expires_at
+        )
+        if claimed:
+            return NEW, None
+        try:
+            with transaction.atomic(using=records.db):
+                records.create(key=key, fingerprint=fingerprint, locked_until=locked_until, expires_at=expires_at)
+            return NEW, None
+        except IntegrityError:
+            pass
+        return self.get(key)
+
+    def get(self, key):
+        record = self._records().filter(key=key).first()
+        if record is None:
+            return PENDING, None
+        if record.status_code is None:
+            return PENDING, (record.fingerprint, None, None)
+        return DONE, (record.fingerprint, record.status_code, record.response)
+
+    def complete(self, key, status_code, data):
+        self._records().filter(key=key).update(status_code=status_code, response=data)
+
+    def release(self, key):
+        self._records().filter(key=key, status_code__isnull=True).delete()
+
+    def purge(self, batch_size=1000):
+        """Delete expired records in batches, returning how many."""
+
+        records, deleted = self._records(), 0
+        now = timezone.now()
+        while True:
+            ids = list(records.filter(expires_at__lt=now).values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            deleted += records.filter(id__in=ids).delete()[0]
+
+
+class CacheStore:
+    """Keep idempotency records in the default cache, which expires them itself."""
+
+    def _cache_key(self, key):
+        return f'idempotency:{key}'
+
+    def begin(self, key, fingerprint):
+        pending = {'fingerprint': fingerprint, 'status_code': None, 'data': None}
+        if cache.add(self._cache_key(key), pending, settings.IDEMPOTENCY_LOCK_SECONDS):
+            return NEW, None
+        return self.get(key)
+
+    def get(self, key):
+        entry = cache.get(self._cache_key(key))
+        if entry is None:
+            return PENDING, None
+        if entry['status_code'] is None:
+            return PENDING, (entry['fingerprint'], None, None)
+        return DONE, (entry['fingerprint'], entry['status_code'], entry['data'])
+
+    def complete(self, key, status_code, data):
+        entry = cache.get(self._cache_key(key)) or {}
+        entry.update(status_code=status_code, data=data)
+        cache.set(self._cache_key(key), entry, settings.IDEMPOTENCY_TTL_SECONDS)
+
+    def release(self, key):
+        cache.delete(self._cache_key(key))
+
+    def purge(self, batch_size=1000):
+        return 0
+
+
+@functools.lru_cache(maxsize=None)
+def _store(path):
+    return import_string(path)()
+
+
+def get_store():
+    return _store(settings.IDEMPOTENCY_STORE)
+
+
+def fingerprint(request):
+    """Hash the method, path and parsed body of a request, uploaded files included."""
+
+    digest = hashlib.sha256(f'{request.method} {request.path}'.encode())
+    data = request.data
+    if hasattr(data, 'lists'):
+        for name, values in sorted(data.lists(), key=lambda item: item[0]):
+            digest.update(f'\0{name}'.encode())
+            for value in values:
+                if isinstance(value, UploadedFile):
+                    for chunk in value.chunks():
+                        digest.update(chunk)
+                    value.seek(0)
+                else:
+                    digest.update(f'\0{value}'.encode())
+    else:
+        digest.update(json.dumps(data, cls=encoders.JSONEncoder, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def _record_key(request, key):
+    user = getattr(request, 'user', None)
+    owner = user.pk if user is not None and user.is_authenticated else '-'
+    return hashlib.sha256(f'{owner}\0{request.path}\0{key}'.encode()).hexdigest()
+
+
+def _replay(status_code, data):
+    response = Response(data, status=status_code)
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def idempotent(view_method):
+    """Decorate a POST handler of an API view to honour Idempotency-Key."""
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            raise exceptions.ValidationError({HEADER: _('At most %d characters.') % MAX_KEY_LENGTH})
+
+        store = get_store()
+        record_key, request_fingerprint = _record_key(request, key), fingerprint(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        delay = 0.05
+        while True:
+            state, record = store.begin(record_key, request_fingerprint)
+            if state == NEW:
+                break
+            if record is not None and record[0] != request_fingerprint:
+                raise KeyReused()
+            if state == DONE:
+                return _replay(*record[1:])
+            if time.monotonic() >= deadline:
+                raise KeyInFlight()
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except BaseException:
+            store.release(record_key)
+            raise
+        if response.status_code >= 500 or not isinstance(response, Response):
+            store.release(record_key)
+            return response
+        data = json.loads(json.dumps(response.data, cls=encoders.JSONEncoder))
+        store.complete(record_key, response.status_code, data)
+        return response
+
+    return wrapper
@@ -0,0 +1,94 @@
+"""
+Django command to measure login throughput and API latency during a login storm.
+"""
+
+from django.contrib.auth import authenticate, get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+
+from core import passwords
+
+from concurrent.futures import ThreadPoolExecutor
+import resource
+import statistics
+import threading
+import time
+
+EMAIL = 'benchmark-login@example.com'
+PASSWORD = 'benchmark-password'
+
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+class Command(BaseCommand):
+    """Django command to benchmark logins"""
+
+    help = 'Run concurrent logins and report throughput, CPU per login and API latency meanwhile.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=100)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--probe-path', default='/api/recipe/tags/',
+                            help='Path requested repeatedly during the storm.')
+
+    def login(self, _):
+        start = time.perf_counter()
+        try:
+            user = authenticate(username=EMAIL, password=PASSWORD)
+        finally:
+            connections.close_all()
+        assert user is not None, 'benchmark login failed'
+        return time.perf_counter() - start
+
+    def probe(self, path, stop, latencies):
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            client = Client()
+            while not stop.is_set():
+                start = time.perf_counter()
+                client.get(path)
+                latencies.append(time.perf_counter() - start)
+                time.sleep(0.01)
+
+    def handle(self, *args, **options):
+        get_user_model().objects.filter(email=EMAIL).delete()
+        get_user_model().objects.create_user(email=EMAIL, password=PASSWORD)
+
+        stop = threading.Event()
+        probe_latencies = []
+        probe = threading.Thread(
+            target=self.probe,
+            args=(options['probe_path'], stop, probe_latencies)
+        )
+        try:
+            probe.start()
+            cpu_start, wall_start = cpu_seconds(), time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                latencies = list(pool.map(self.login, range(options['logins'])))
+            wall = time.perf_counter() - wall_start
+            # pool processes only show up in RUSAGE_CHILDREN once they exited
+            passwords.shutdown_pool()
+            cpu = cpu_seconds() - cpu_start
+        finally:
+            stop.set()
+            probe.join()
+            get_user_model().objects.filter(email=EMAIL).delete()
+
+        latencies.sort()
+        probe_latencies.sort()
+        self.stdout.write(f'{options["logins"]} logins, concurrency {options["concurrency"]}')
+        self.stdout.write(f'  throughput:     {options["logins"] / wall:8.1f} logins/s')
+        self.stdout.write(f'  login latency:  p50 {statistics.median(latencies) * 1000:.1f}ms '
+                          f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms')
+        self.stdout.write(f'  cpu per login:  {cpu / options["logins"] * 1000:8.1f} ms')
+        if probe_latencies:
+            self.stdout.write(
+                f'  api latency:    p50 {statistics.median(probe_latencies) * 1000:.1f}ms '
+                f'p95 {probe_latencies[int(len(probe_latencies) * 0.95) - 1] * 1000:.1f}ms '
+                f'({len(probe_latencies)} probes)'
+            )
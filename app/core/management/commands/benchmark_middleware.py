@@ -0,0 +1,63 @@
+"""
+Django command to compare the lean API middleware stack with the full stack.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+import time
+
+
+def full_stack():
+    """Return MIDDLEWARE with the web-only middleware inlined for all paths."""
+
+    middleware = []
+    for path in settings.MIDDLEWARE:
+        if path == 'core.middleware.WebOnlyMiddleware':
+            middleware.extend(settings.WEB_ONLY_MIDDLEWARE)
+        else:
+            middleware.append(path)
+    return middleware
+
+
+class Command(BaseCommand):
+    """Django command to benchmark per-request middleware overhead"""
+
+    help = 'Measure the per-request cost of the full and the lean API middleware stack.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/recipe/tags/', help='API path to request.')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per stack.')
+        parser.add_argument('--session-cookie', action='store_true',
+                            help='Send session and CSRF cookies like a browser would.')
+
+    def measure(self, middleware, path, requests, cookies):
+        with override_settings(MIDDLEWARE=middleware, ALLOWED_HOSTS=['testserver']):
+            client = Client()
+            client.cookies.load(cookies)
+            client.get(path)
+            start = time.perf_counter()
+            for _ in range(requests):
+                client.get(path)
+            return (time.perf_counter() - start) / requests
+
+    def handle(self, *args, **options):
+        cookies = {}
+        if options['session_cookie']:
+            cookies = {
+                settings.SESSION_COOKIE_NAME: 'x' * 32,
+                settings.CSRF_COOKIE_NAME: 'y' * 64,
+            }
+
+        path, requests = options['path'], options['requests']
+        full = self.measure(full_stack(), path, requests, cookies)
+        lean = self.measure(settings.MIDDLEWARE, path, requests, cookies)
+
+        self.stdout.write(f'{path} x {requests}')
+        self.stdout.write(f'  full stack: {full * 1e6:8.1f} us/request')
+        self.stdout.write(f'  lean stack: {lean * 1e6:8.1f} us/request')
+        self.stdout.write(self.style.SUCCESS(
+            f'  saving:     {(full - lean) * 1e6:8.1f} us/request ({(full - lean) / full:.0%})'
+        ))
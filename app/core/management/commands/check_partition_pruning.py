@@ -0,0 +1,140 @@
+"""
+Django command to verify the recipe API only scans one partition per table.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import sharding
+from core.models import Recipe, Tag, Ingredient
+
+import json
+
+PLANNED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+
+def partition_parents(connection):
+    """Map partition names to the names of their partitioned tables."""
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname, parent.relname FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            "WHERE parent.relkind = 'p'"
+        )
+        return dict(cursor.fetchall())
+
+
+def relation_names(plan):
+    """Yield every relation a JSON query plan scans or modifies."""
+
+    if 'Relation Name' in plan:
+        yield plan['Relation Name']
+    for child in plan.get('Plans', []):
+        yield from relation_names(child)
+
+
+def scanned_partitions(connection, sql, parents):
+    """Return {partitioned table: partitions in the plan of sql}."""
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    scanned = {}
+    for name in relation_names(plan[0]['Plan']):
+        if name in parents:
+            scanned.setdefault(parents[name], set()).add(name)
+    return scanned
+
+
+def recipe_api_requests(client, recipe, tag, ingredient):
+    """Yield (label, callable) for every recipe API query path."""
+
+    recipes = reverse('recipe:recipe-list')
+    detail = reverse('recipe:recipe-detail', args=[recipe.id])
+    tags = reverse('recipe:tag-list')
+    ingredients = reverse('recipe:ingredient-list')
+    payload = {'tags': [{'name': 'Pruned'}], 'ingredients': [{'name': 'Salt'}]}
+
+    yield 'recipe list', lambda: client.get(recipes)
+    yield 'recipe list by tag', lambda: client.get(recipes, {'tags': tag.id, 'ingredients': ingredient.id})
+    yield 'recipe list by price', lambda: client.get(recipes, {'price_max': '5', 'ordering': '-price', 'limit': 1})
+    yield 'recipe retrieve', lambda: client.get(detail)
+    yield 'recipe create', lambda: client.post(
+        recipes, {'title': 'New', 'description': 'New', 'time_minutes': 5, 'price': '1.00', **payload}, format='json')
+    yield 'recipe update', lambda: client.patch(detail, payload, format='json')
+    yield 'recipe clone', lambda: client.post(reverse('recipe:recipe-clone', args=[recipe.id]) + '?count=2')
+    yield 'tag list assigned', lambda: client.get(tags, {'assigned_only': 1})
+    yield 'ingredient list assigned', lambda: client.get(ingredients, {'assigned_only': 1})
+    yield 'bootstrap', lambda: client.get(reverse('recipe:bootstrap'), {'tags': tag.id, 'assigned_only': 1})
+    yield 'changes feed', lambda: client.get(reverse('recipe:changes'))
+    yield 'stats', lambda: client.get(reverse('recipe:stats'))
+    yield 'pantry', lambda: client.get(reverse('recipe:recipe-pantry'), {'ingredients': ingredient.id})
+    yield 'similar', lambda: client.get(reverse('recipe:recipe-similar', args=[recipe.id]))
+    yield 'shopping list', lambda: client.get(reverse('recipe:recipe-shopping-list'), {'ids': f'{recipe.id}:2'})
+    yield 'tag update', lambda: client.patch(reverse('recipe:tag-detail', args=[tag.id]), {'name': 'Renamed'})
+    yield 'tag delete', lambda: client.delete(reverse('recipe:tag-detail', args=[tag.id]))
+    yield 'recipe delete', lambda: client.delete(detail)
+
+
+class Command(BaseCommand):
+    """Django command to check partition pruning of the recipe API queries"""
+
+    help = 'Run the recipe API in a rolled back transaction and EXPLAIN its queries.'
+
+    def handle(self, *args, **options):
+        failures = []
+        with transaction.atomic():
+            user = get_user_model().objects.create_user(email='pruning-check@example.com')
+            alias = sharding.shard_for_user(user.pk)[0]
+            connection = connections[alias]
+            with transaction.atomic(using=alias):
+                failures = self.check_requests(user, connection)
+                transaction.set_rollback(True, using=alias)
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError('Queries scanning several partitions:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Every recipe API query scans one partition per table.'))
+
+    def check_requests(self, user, connection):
+        parents = partition_parents(connection)
+        if not parents:
+            raise CommandError(f'No partitioned tables on {connection.alias}.')
+
+        tag = Tag.objects.create(user=user, name='Tag')
+        ingredient = Ingredient.objects.create(user=user, name='Ingredient')
+        recipe = Recipe.objects.create(user=user, title='Recipe', time_minutes=1, price='1.00')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+
+        client = APIClient()
+        client.force_authenticate(user)
+        failures = []
+        with override_settings(ALLOWED_HOSTS=['testserver'], CHANGES_SETTLE_SECONDS=0):
+            for label, request in recipe_api_requests(client, recipe, tag, ingredient):
+                with CaptureQueriesContext(connection) as queries:
+                    response = request()
+                if response.status_code >= 400:
+                    raise CommandError(f'{label}: HTTP {response.status_code} {response.content!r}')
+
+                checked = 0
+                for query in queries.captured_queries:
+                    sql = query['sql']
+                    if not sql.lstrip().upper().startswith(PLANNED_STATEMENTS):
+                        continue
+                    for table, partitions in scanned_partitions(connection, sql, parents).items():
+                        checked += 1
+                        if len(partitions) > 1:
+                            failures.append(f'{label}: {len(partitions)} partitions of {table}: {sql}')
+                self.stdout.write(f'{label}: {checked} partitioned table scans checked')
+        return failures
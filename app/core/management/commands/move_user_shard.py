@@ -0,0 +1,64 @@
+"""
+Django command to move a user's recipes, tags and ingredients to another shard.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+from core.models import ShardAssignment
+
+import time
+
+
+class Command(BaseCommand):
+    """Django command to move a user between shards
+
+    Reads keep being served from the source shard during the copy. Writes
+    of the user are refused with 503 from the moment every worker has seen
+    the `moving` flag until the assignment is flipped to the target.
+    """
+
+    help = "Move a user's data to another shard."
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_id', type=int)
+        parser.add_argument('target', help='Target database alias.')
+        parser.add_argument('--settle', type=float, default=None,
+                            help='Seconds to wait for workers to see the move (default SHARD_CACHE_TIMEOUT).')
+
+    def set_assignment(self, user_id, **fields):
+        ShardAssignment.objects.using('default').filter(user_id=user_id).update(**fields)
+        sharding.forget(user_id)
+
+    def handle(self, *args, **options):
+        user_id, target = options['user_id'], options['target']
+        if target not in settings.SHARD_DATABASES:
+            raise CommandError(f'{target} is not one of {", ".join(settings.SHARD_DATABASES)}.')
+        if not get_user_model().objects.using('default').filter(pk=user_id).exists():
+            raise CommandError(f'User {user_id} does not exist.')
+
+        assignment, _ = ShardAssignment.objects.using('default').get_or_create(
+            user_id=user_id, defaults={'alias': 'default'})
+        source = assignment.alias
+        if source == target:
+            raise CommandError(f'User {user_id} already lives on {target}.')
+
+        self.set_assignment(user_id, moving=True)
+        settle = settings.SHARD_CACHE_TIMEOUT if options['settle'] is None else options['settle']
+        self.stdout.write(f'Freezing writes of user {user_id}, waiting {settle:g}s for workers...')
+        time.sleep(settle)
+
+        try:
+            sharding.copy_user_data(user_id, source, target)
+        except Exception as exc:
+            self.set_assignment(user_id, moving=False)
+            raise CommandError(f'Copy failed, user {user_id} stays on {source}: {exc}')
+
+        self.set_assignment(user_id, alias=target, moving=False)
+        # workers may read from the source until their cached assignment expires
+        time.sleep(settle)
+        sharding.delete_user_data(user_id, source)
+
+        self.stdout.write(self.style.SUCCESS(f'Moved user {user_id} from {source} to {target}.'))
@@ -0,0 +1,16 @@
+"""
+Django command to print a signed value for the X-Profile request header.
+"""
+
+from django.core.management.base import BaseCommand
+
+from core.profiling import issue_token
+
+
+class Command(BaseCommand):
+    """Django command to issue a profiling header token"""
+
+    help = 'Print a signed X-Profile header value valid for one hour.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(issue_token())
@@ -0,0 +1,35 @@
+"""
+Django command to delete tombstones older than the changes feed retention.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Tombstone
+
+import datetime
+
+
+class Command(BaseCommand):
+    """Django command to prune old tombstones"""
+
+    help = 'Delete tombstones older than TOMBSTONE_RETENTION_DAYS in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=settings.TOMBSTONE_RETENTION_DAYS)
+        deleted = 0
+        for alias in settings.SHARD_DATABASES:
+            while True:
+                ids = list(
+                    Tombstone.objects.using(alias).filter(deleted_at__lt=cutoff)
+                    .values_list('id', flat=True)[:options['batch_size']]
+                )
+                if not ids:
+                    break
+                deleted += Tombstone.objects.using(alias).filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones.'))
@@ -0,0 +1,20 @@
+"""
+Django command to delete expired idempotency records.
+"""
+
+from django.core.management.base import BaseCommand
+
+from core import idempotency
+
+
+class Command(BaseCommand):
+    """Django command to purge expired idempotency keys"""
+
+    help = 'Delete stored Idempotency-Key responses older than IDEMPOTENCY_TTL_SECONDS in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = idempotency.get_store().purge(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} idempotency records.'))
@@ -0,0 +1,55 @@
+"""
+Django command to run background tasks.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import autodiscover_modules
+
+from core import tasks
+
+import signal
+import threading
+
+
+class Command(BaseCommand):
+    """Django command to run queued tasks"""
+
+    help = (
+        'Run queued background tasks with a number of threads. Start as many workers as needed, '
+        'they never run the same task at once.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Number of tasks run at once.')
+        parser.add_argument('--burst', action='store_true', help='Exit once no task is due.')
+        parser.add_argument('--poll-interval', type=float, default=settings.TASK_POLL_SECONDS)
+
+    def handle(self, *args, **options):
+        autodiscover_modules('tasks')
+        stop = threading.Event()
+
+        def shutdown(signum, frame):
+            self.stdout.write('Stopping after the running tasks...')
+            stop.set()
+
+        previous = {signum: signal.signal(signum, shutdown) for signum in (signal.SIGTERM, signal.SIGINT)}
+        self.stdout.write(f'Running tasks with {options["concurrency"]} threads.')
+        try:
+            tasks.run_workers(
+                concurrency=options['concurrency'],
+                burst=options['burst'],
+                poll_interval=options['poll_interval'],
+                report=self.report,
+                stop=stop,
+            )
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS('Worker stopped.'))
+
+    def report(self, task, error):
+        if error is None:
+            self.stdout.write(f'Task {task.pk} {task.name} done.')
+        else:
+            self.stderr.write(f'Task {task.pk} {task.name} failed attempt {task.attempts}:\n{error}')
@@ -0,0 +1,62 @@
+"""
+Django command to summarize the captured request profiles.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.profiling import load_profiles
+
+from collections import defaultdict
+
+
+def percentile(values, share):
+    values = sorted(values)
+    index = min(int(round(share * (len(values) - 1))), len(values) - 1)
+    return values[index]
+
+
+class Command(BaseCommand):
+    """Django command to summarize profiles by endpoint"""
+
+    help = 'Summarize captured profiles across recipe, tag, ingredient and user endpoints.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help='Profile directory.')
+        parser.add_argument('--group', default=None, help='Only show one endpoint group.')
+        parser.add_argument('--top', type=int, default=10, help='Number of functions per endpoint.')
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or settings.PROFILING_DIR
+        endpoints = defaultdict(list)
+        for profile in load_profiles(directory):
+            if options['group'] and profile.get('group') != options['group']:
+                continue
+            key = (profile.get('group'), profile.get('view'), profile.get('action'))
+            endpoints[key].append(profile)
+
+        if not endpoints:
+            self.stdout.write(f'No profiles found in {directory}.')
+            return
+
+        for (group, view, action), profiles in sorted(endpoints.items()):
+            durations = [p['duration'] * 1000 for p in profiles]
+            queries = [len(p['queries']) for p in profiles]
+            query_time = [sum(q['duration'] for q in p['queries']) * 1000 for p in profiles]
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{group}: {view}.{action}'))
+            self.stdout.write(
+                f'  profiles={len(profiles)} '
+                f'avg={sum(durations) / len(durations):.1f}ms '
+                f'p95={percentile(durations, 0.95):.1f}ms '
+                f'queries/req={sum(queries) / len(queries):.1f} '
+                f'sql={sum(query_time) / len(query_time):.1f}ms'
+            )
+
+            functions = defaultdict(float)
+            for profile in profiles:
+                for row in profile['top_functions']:
+                    functions[row['function']] += row['cumtime']
+            top = sorted(functions.items(), key=lambda item: item[1], reverse=True)
+            for function, cumtime in top[:options['top']]:
+                self.stdout.write(f'    {cumtime / len(profiles) * 1000:8.2f}ms  {function}')
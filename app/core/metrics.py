@@ -0,0 +1,258 @@
+"""
+Metrics registry exposed in the Prometheus text format.
+
+uWSGI runs several worker processes, so every process keeps its own samples
+in memory and periodically dumps them to ``settings.METRICS_DIR``. The
+``/metrics`` view merges the files of all workers. Counters and histograms of
+workers that exited are kept, gauges are only reported for live workers.
+"""
+
+from django.conf import settings
+
+import json
+import os
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUESTS_TOTAL = 'recipe_api_http_requests_total'
+REQUEST_DURATION = 'recipe_api_http_request_duration_seconds'
+REQUESTS_IN_FLIGHT = 'recipe_api_http_requests_in_flight'
+DB_QUERIES_TOTAL = 'recipe_api_db_queries_total'
+CACHE_REQUESTS_TOTAL = 'recipe_api_cache_requests_total'
+CACHE_HIT_RATIO = 'recipe_api_cache_hit_ratio'
+
+METRIC_HELP = {
+    REQUESTS_TOTAL: 'HTTP requests by view, action, method and status.',
+    REQUEST_DURATION: 'HTTP request latency by view and action.',
+    REQUESTS_IN_FLIGHT: 'HTTP requests currently being processed.',
+    DB_QUERIES_TOTAL: 'Database queries issued by view and action.',
+    CACHE_REQUESTS_TOTAL: 'Cache lookups by cache and result.',
+    CACHE_HIT_RATIO: 'Share of cache lookups that were hits.',
+}
+
+
+def _freeze(labels):
+    return tuple(sorted((labels or {}).items()))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', r'\\').replace('"', r'\"'))
+        for k, v in labels
+    )
+    return '{' + pairs + '}'
+
+
+class Registry:
+    """Counters, gauges and histograms of the current process."""
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._buckets = {}
+        self._pid = os.getpid()
+        self._last_flush = 0.0
+
+    def _check_fork(self):
+        """Drop samples inherited from the parent after a fork."""
+
+        pid = os.getpid()
+        if pid != self._pid:
+            self._pid = pid
+            self._samples = {}
+            self._last_flush = 0.0
+
+    def inc(self, name, labels=None, amount=1):
+        """Increase a counter."""
+
+        key = ('counter', name, _freeze(labels))
+        with self._lock:
+            self._check_fork()
+            self._samples[key] = self._samples.get(key, 0) + amount
+        self.maybe_flush()
+
+    def gauge_add(self, name, amount, labels=None):
+        """Move a gauge up or down."""
+
+        key = ('gauge', name, _freeze(labels))
+        with self._lock:
+            self._check_fork()
+            self._samples[key] = self._samples.get(key, 0) + amount
+        self.maybe_flush()
+
+    def observe(self, name, value, labels=None, buckets=DEFAULT_BUCKETS):
+        """Record a value in a histogram."""
+
+        key = ('histogram', name, _freeze(labels))
+        with self._lock:
+            self._check_fork()
+            self._buckets.setdefault(name, tuple(buckets))
+            sample = self._samples.get(key)
+            if sample is None:
+                # one slot per bucket plus +Inf, then sum and count
+                sample = self._samples[key] = [0] * (len(buckets) + 3)
+            index = len(buckets)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    index = i
+                    break
+            sample[index] += 1
+            sample[-2] += value
+            sample[-1] += 1
+        self.maybe_flush()
+
+    def _dump(self):
+        with self._lock:
+            return {
+                'pid': self._pid,
+                'buckets': {k: list(v) for k, v in self._buckets.items()},
+                'samples': [
+                    [kind, name, [list(p) for p in labels], value]
+                    for (kind, name, labels), value in self._samples.items()
+                ],
+            }
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'metrics-{pid}.json')
+
+    def flush(self):
+        """Write the samples of this process to the metrics directory."""
+
+        if not self.directory:
+            return
+        data = self._dump()
+        os.makedirs(self.directory, exist_ok=True)
+        self._last_flush = time.monotonic()
+        path = self._path(data['pid'])
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as fh:
+            json.dump(data, fh)
+        os.replace(tmp_path, path)
+
+    def maybe_flush(self):
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def _snapshots(self):
+        own = self._dump()
+        yield own
+        if not self.directory or not os.path.isdir(self.directory):
+            return
+        for file_name in os.listdir(self.directory):
+            if not (file_name.startswith('metrics-') and file_name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.directory, file_name)) as fh:
+                    data = json.load(fh)
+            except (OSError, ValueError):
+                continue
+            if data['pid'] != own['pid']:
+                yield data
+
+    def collect(self):
+        """Merge samples of all worker processes."""
+
+        merged = {}
+        buckets = {}
+        for data in self._snapshots():
+            alive = data['pid'] == self._pid or _pid_alive(data['pid'])
+            buckets.update({k: tuple(v) for k, v in data['buckets'].items()})
+            for kind, name, labels, value in data['samples']:
+                if kind == 'gauge' and not alive:
+                    continue
+                key = (kind, name, tuple(tuple(p) for p in labels))
+                current = merged.get(key)
+                if current is None:
+                    merged[key] = list(value) if kind == 'histogram' else value
+                elif kind == 'histogram':
+                    merged[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    merged[key] = current + value
+        return merged, buckets
+
+    def render(self):
+        """Render all samples in the Prometheus text exposition format."""
+
+        merged, buckets = self.collect()
+        by_name = {}
+        for (kind, name, labels), value in merged.items():
+            by_name.setdefault((name, kind), []).append((labels, value))
+        by_name.update(self._derived(merged))
+
+        lines = []
+        for (name, kind), samples in sorted(by_name.items()):
+            if name in METRIC_HELP:
+                lines.append(f'# HELP {name} {METRIC_HELP[name]}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(samples):
+                if kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                bounds = buckets[name] + (float('inf'),)
+                cumulative = 0
+                for bound, count in zip(bounds, value):
+                    cumulative += count
+                    bucket_labels = labels + (('le', _format_value(bound)),)
+                    lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-2])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {value[-1]}')
+        return '\n'.join(lines) + '\n'
+
+    def _derived(self, merged):
+        """Compute the cache hit ratio gauges from the cache counters."""
+
+        totals = {}
+        for (kind, name, labels), value in merged.items():
+            if name != CACHE_REQUESTS_TOTAL:
+                continue
+            label_map = dict(labels)
+            hits, total = totals.get(label_map.get('cache'), (0, 0))
+            if label_map.get('result') == 'hit':
+                hits += value
+            totals[label_map.get('cache')] = (hits, total + value)
+
+        if not totals:
+            return {}
+        return {
+            (CACHE_HIT_RATIO, 'gauge'): [
+                ((('cache', cache),), hits / total if total else 0)
+                for cache, (hits, total) in totals.items()
+            ]
+        }
+
+
+registry = Registry(directory=getattr(settings, 'METRICS_DIR', None))
+
+
+def record_cache(cache_name, hit):
+    """Count a cache lookup for the hit ratio metrics."""
+
+    if settings.METRICS_ENABLED:
+        registry.inc(CACHE_REQUESTS_TOTAL, {'cache': cache_name, 'result': 'hit' if hit else 'miss'})
@@ -0,0 +1,313 @@
+"""
+Middleware shared by the API apps.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.db import connections
+from django.utils.module_loading import import_string
+
+from core import metrics, pool, profiling, routers
+
+import cProfile
+import functools
+import random
+import time
+
+
+def resolve_view_name(request, view_func):
+    """Return the (view, action) pair used to label a request."""
+
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    view = view_class.__name__ if view_class else getattr(view_func, '__name__', 'unknown')
+
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        action = actions.get(request.method.lower(), request.method.lower())
+    else:
+        action = request.method.lower()
+
+    return view, action
+
+
+class AsyncCapableMiddleware:
+    """Base of middleware running as a coroutine when the handler is async.
+
+    Subclasses implement __call__ and __acall__, the async version.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+
+@contextmanager
+def wrap_queries(wrapper):
+    """Install wrapper as execute wrapper of every connection of this thread."""
+
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(wrapper))
+        yield
+
+
+@contextmanager
+def profile_thread(profiler):
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+
+
+class QueryCounter:
+    """Database execute wrapper counting the queries of a request."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """Record latency, status, query count and concurrency of each request."""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        counter = QueryCounter()
+        metrics.registry.gauge_add(metrics.REQUESTS_IN_FLIGHT, 1)
+        start = time.perf_counter()
+        try:
+            with wrap_queries(counter):
+                response = self.get_response(request)
+        finally:
+            metrics.registry.gauge_add(metrics.REQUESTS_IN_FLIGHT, -1)
+        return self.record(request, response, counter, start)
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        metrics.registry.gauge_add(metrics.REQUESTS_IN_FLIGHT, 1)
+        start = time.perf_counter()
+        try:
+            with pool.pool_hook(functools.partial(wrap_queries, counter)):
+                response = await self.get_response(request)
+        finally:
+            metrics.registry.gauge_add(metrics.REQUESTS_IN_FLIGHT, -1)
+        return self.record(request, response, counter, start)
+
+    def record(self, request, response, counter, start):
+        registry = metrics.registry
+        duration = time.perf_counter() - start
+        view, action = getattr(request, '_metrics_view', ('unmatched', ''))
+        labels = {'view': view, 'action': action}
+
+        registry.observe(metrics.REQUEST_DURATION, duration, labels)
+        registry.inc(metrics.DB_QUERIES_TOTAL, labels, counter.count)
+        registry.inc(metrics.REQUESTS_TOTAL, {
+            **labels,
+            'method': request.method,
+            'status': response.status_code,
+        })
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view = resolve_view_name(request, view_func)
+
+
+class ProfilingMiddleware(AsyncCapableMiddleware):
+    """Profile sampled requests or requests carrying a signed header.
+
+    Under ASGI only the work run in the pool is profiled, the event loop
+    serves other requests meanwhile.
+    """
+
+    header = 'X-Profile'
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+
+    def should_profile(self, request):
+        token = request.headers.get(self.header)
+        if token:
+            return profiling.is_valid_token(token)
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        recorder = profiling.QueryRecorder()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with wrap_queries(recorder):
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        return self.write(request, response, profiler, recorder, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self.should_profile(request):
+            return await self.get_response(request)
+
+        recorder = profiling.QueryRecorder()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        with pool.pool_hook(functools.partial(wrap_queries, recorder)), \
+                pool.pool_hook(functools.partial(profile_thread, profiler)):
+            response = await self.get_response(request)
+        return await pool.run(self.write, request, response, profiler, recorder, time.perf_counter() - start)
+
+    def write(self, request, response, profiler, recorder, duration):
+        view, action = getattr(request, '_profiling_view', ('unmatched', ''))
+        profiling.write_profile(
+            profiler,
+            recorder.queries,
+            method=request.method,
+            path=request.path,
+            group=profiling.endpoint_group(request.path),
+            view=view,
+            action=action,
+            status=response.status_code,
+            duration=duration,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._profiling_view = resolve_view_name(request, view_func)
+
+
+class WebOnlyMiddleware(AsyncCapableMiddleware):
+    """Run settings.WEB_ONLY_MIDDLEWARE for everything but the API.
+
+    The API authenticates with tokens, so sessions, CSRF cookies and messages
+    are skipped for paths under settings.API_PATH_PREFIXES while the admin
+    keeps the full stack.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.api_prefixes = tuple(settings.API_PATH_PREFIXES)
+        self.middleware = []
+
+        handler = get_response
+        for middleware_path in reversed(settings.WEB_ONLY_MIDDLEWARE):
+            try:
+                middleware = import_string(middleware_path)(handler)
+            except MiddlewareNotUsed:
+                continue
+            self.middleware.insert(0, middleware)
+            handler = convert_exception_to_response(middleware)
+        self.web_handler = handler
+
+    def is_api(self, request):
+        return request.path_info.startswith(self.api_prefixes)
+
+    def __call__(self, request):
+        if self.is_api(request):
+            return self.get_response(request)
+        return self.web_handler(request)
+
+    async def __acall__(self, request):
+        if self.is_api(request):
+            return await self.get_response(request)
+        return await self.web_handler(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.is_api(request):
+            return None
+        for middleware in self.middleware:
+            if hasattr(middleware, 'process_view'):
+                response = middleware.process_view(request, view_func, view_args, view_kwargs)
+                if response is not None:
+                    return response
+        return None
+
+    def process_exception(self, request, exception):
+        if self.is_api(request):
+            return None
+        for middleware in reversed(self.middleware):
+            if hasattr(middleware, 'process_exception'):
+                response = middleware.process_exception(request, exception)
+                if response is not None:
+                    return response
+        return None
+
+    def process_template_response(self, request, response):
+        if self.is_api(request):
+            return response
+        for middleware in reversed(self.middleware):
+            if hasattr(middleware, 'process_template_response'):
+                response = middleware.process_template_response(request, response)
+        return response
+
+
+class DatabaseRoutingMiddleware(AsyncCapableMiddleware):
+    """Expose the current request to the database routers.
+
+    The routers use it to find the authenticated user for shard lookups and
+    read-your-writes pinning. Reads of writing requests always use the
+    primary, and users who wrote are pinned to it for a short while.
+    """
+
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASES and not settings.SHARDING_ENABLED:
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        writing = request.method not in self.safe_methods
+        token = routers.start_request(request, pinned=writing)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.finish_request(token)
+        self.pin_writer(request, writing)
+        return response
+
+    async def __acall__(self, request):
+        # the pool threads see the request through the copied context
+        writing = request.method not in self.safe_methods
+        token = routers.start_request(request, pinned=writing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.finish_request(token)
+        await pool.run(self.pin_writer, request, writing)
+        return response
+
+    def pin_writer(self, request, writing):
+        if writing and settings.REPLICA_DATABASES:
+            user_id = routers.authenticated_user_id(request)
+            if user_id is not None:
+                routers.pin_user(user_id)
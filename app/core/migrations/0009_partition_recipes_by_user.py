@@ -0,0 +1,141 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:26
+
+import core.fields
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+PARTITIONS = 16
+
+LINK_TABLES = [
+    ('core_recipe_tags', 'tag_id', 'core_tag', 'core_recipe_tags_user_tag_idx'),
+    ('core_recipe_ingredients', 'ingredient_id', 'core_ingredient', 'core_recipe_ingr_user_ingr_idx'),
+]
+
+
+def partitions(table):
+    return [
+        f'CREATE TABLE {table}_p{remainder} PARTITION OF {table}_new '
+        f'FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {remainder})'
+        for remainder in range(PARTITIONS)
+    ]
+
+
+def partition_sql():
+    """Rebuild core_recipe and its link tables hash partitioned by user_id.
+
+    Unique keys of a partitioned table must contain the partition key, so the
+    primary keys become (id, user_id) and the link tables reference recipes,
+    tags and ingredients through composite (id, user_id) foreign keys.
+    """
+
+    sql = [
+        'CREATE TABLE core_recipe_new (LIKE core_recipe INCLUDING DEFAULTS) PARTITION BY HASH (user_id)',
+        *partitions('core_recipe'),
+        'INSERT INTO core_recipe_new SELECT * FROM core_recipe',
+    ]
+    for table, column, _, _ in LINK_TABLES:
+        sql += [
+            f'CREATE TABLE {table}_new (LIKE {table} INCLUDING DEFAULTS, user_id bigint NOT NULL) '
+            'PARTITION BY HASH (user_id)',
+            *partitions(table),
+            f'INSERT INTO {table}_new (id, recipe_id, {column}, user_id) '
+            f'SELECT link.id, link.recipe_id, link.{column}, recipe.user_id FROM {table} link '
+            'JOIN core_recipe recipe ON recipe.id = link.recipe_id',
+        ]
+
+    tables = [table for table, _, _, _ in LINK_TABLES] + ['core_recipe']
+    # the id sequences are owned by the old tables, keep them for the new ones
+    sql += [f'ALTER SEQUENCE {table}_id_seq OWNED BY NONE' for table in tables]
+    sql += [f'DROP TABLE {table}' for table in tables]
+    for table in tables:
+        sql += [
+            f'ALTER TABLE {table}_new RENAME TO {table}',
+            f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id',
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, user_id)',
+        ]
+
+    sql += [
+        'CREATE INDEX core_recipe_user_id_idx ON core_recipe (user_id, id)',
+        'ALTER TABLE core_recipe ADD CONSTRAINT core_recipe_user_id_fk_core_user_id '
+        'FOREIGN KEY (user_id) REFERENCES core_user (id) DEFERRABLE INITIALLY DEFERRED',
+    ]
+    for table, column, target, index in LINK_TABLES:
+        sql += [
+            f'ALTER TABLE {target} ADD CONSTRAINT {target}_id_user_id_uniq UNIQUE (id, user_id)',
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_user_recipe_uniq UNIQUE (user_id, recipe_id, {column})',
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_recipe_fk FOREIGN KEY (recipe_id, user_id) '
+            'REFERENCES core_recipe (id, user_id) ON DELETE CASCADE',
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fk FOREIGN KEY ({column}, user_id) '
+            f'REFERENCES {target} (id, user_id) ON DELETE CASCADE',
+            f'CREATE INDEX {index} ON {table} (user_id, {column})',
+        ]
+    return sql
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_shard_assignment'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(partition_sql()),
+            ],
+            state_operations=[
+                migrations.CreateModel(
+                    name='RecipeTag',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('recipe', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='tag_links', to='core.recipe')),
+                        ('tag', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='recipe_links', to='core.tag')),
+                        ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'core_recipe_tags',
+                    },
+                ),
+                migrations.CreateModel(
+                    name='RecipeIngredient',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('ingredient', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='recipe_links', to='core.ingredient')),
+                        ('recipe', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='ingredient_links', to='core.recipe')),
+                        ('user', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'core_recipe_ingredients',
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='ingredients',
+                    field=core.fields.UserScopedManyToManyField(related_name='recipe', through='core.RecipeIngredient', to='core.Ingredient'),
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='tags',
+                    field=core.fields.UserScopedManyToManyField(related_name='recipe', through='core.RecipeTag', to='core.Tag'),
+                ),
+                migrations.AddIndex(
+                    model_name='recipetag',
+                    index=models.Index(fields=['user', 'tag'], name='core_recipe_tags_user_tag_idx'),
+                ),
+                migrations.AlterUniqueTogether(
+                    name='recipetag',
+                    unique_together={('user', 'recipe', 'tag')},
+                ),
+                migrations.AddIndex(
+                    model_name='recipeingredient',
+                    index=models.Index(fields=['user', 'ingredient'], name='core_recipe_ingr_user_ingr_idx'),
+                ),
+                migrations.AlterUniqueTogether(
+                    name='recipeingredient',
+                    unique_together={('user', 'recipe', 'ingredient')},
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:33
+
+from django.db import migrations, models
+
+
+BACKFILL_SQL = """
+UPDATE core_recipe SET
+tag_summary = COALESCE((
+    SELECT jsonb_agg(jsonb_build_object('id', item.id, 'name', item.name) ORDER BY item.id)
+    FROM core_recipe_tags link JOIN core_tag item ON item.id = link.tag_id
+    WHERE link.user_id = core_recipe.user_id AND link.recipe_id = core_recipe.id
+), '[]'::jsonb),
+ingredient_summary = COALESCE((
+    SELECT jsonb_agg(jsonb_build_object('id', item.id, 'name', item.name) ORDER BY item.id)
+    FROM core_recipe_ingredients link JOIN core_ingredient item ON item.id = link.ingredient_id
+    WHERE link.user_id = core_recipe.user_id AND link.recipe_id = core_recipe.id
+), '[]'::jsonb)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_changes_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_summary',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tag_summary',
+            field=models.JSONField(default=list, editable=False),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_user_recipe_stat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('recipe', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.recipe')),
+                ('similar', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.recipe')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipesimilarity',
+            index=models.Index(fields=['user', 'similar'], name='core_recipesim_similar_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='recipesimilarity',
+            unique_together={('user', 'recipe', 'similar')},
+        ),
+        migrations.RunSQL(
+            [
+                'ALTER TABLE core_recipesimilarity ADD CONSTRAINT core_recipesimilarity_recipe_fk '
+                'FOREIGN KEY (recipe_id, user_id) REFERENCES core_recipe (id, user_id) ON DELETE CASCADE',
+                'ALTER TABLE core_recipesimilarity ADD CONSTRAINT core_recipesimilarity_similar_fk '
+                'FOREIGN KEY (similar_id, user_id) REFERENCES core_recipe (id, user_id) ON DELETE CASCADE',
+            ],
+            [
+                'ALTER TABLE core_recipesimilarity DROP CONSTRAINT core_recipesimilarity_similar_fk',
+                'ALTER TABLE core_recipesimilarity DROP CONSTRAINT core_recipesimilarity_recipe_fk',
+            ],
+        ),
+    ]
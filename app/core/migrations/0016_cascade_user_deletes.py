@@ -0,0 +1,68 @@
+# Generated by Django 3.2.25 on 2026-10-19 10:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# tables whose rows go with their user
+USER_TABLES = ['core_tag', 'core_ingredient', 'core_recipe', 'core_tombstone', 'core_userrecipestat',
+               'core_recipesimilarity']
+
+
+def user_fk_sql(on_delete):
+    """Replace the foreign key from each table to core_user by one with on_delete."""
+
+    sql = []
+    for table in USER_TABLES:
+        sql += [
+            # the names Django generated are hashed, look them up
+            "DO $$ DECLARE fk name; BEGIN "
+            "FOR fk IN SELECT conname FROM pg_constraint "
+            f"WHERE conrelid = '{table}'::regclass AND confrelid = 'core_user'::regclass AND contype = 'f' "
+            f"LOOP EXECUTE format('ALTER TABLE {table} DROP CONSTRAINT %I', fk); END LOOP; END $$",
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_user_id_fk_core_user_id FOREIGN KEY (user_id) '
+            f'REFERENCES core_user (id) {on_delete} DEFERRABLE INITIALLY DEFERRED',
+        ]
+    return sql
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_idempotency_record'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingredient',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='recipesimilarity',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='userrecipestat',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunSQL(user_fk_sql('ON DELETE CASCADE'), user_fk_sql('')),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 3.2.25 on 2026-10-19 14:12
+
+from django.conf import settings
+from django.db import migrations
+
+
+# tables whose rows move between shards with their user, keeping their ids
+SHARDED_TABLES = ['core_tag', 'core_ingredient', 'core_recipe', 'core_recipe_tags', 'core_recipe_ingredients',
+                  'core_tombstone', 'core_userrecipestat', 'core_recipesimilarity']
+
+
+def sequences(cursor):
+    for table in SHARDED_TABLES:
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence, = cursor.fetchone()
+        if sequence is not None:
+            yield sequence
+
+
+def set_id_ranges(apps, schema_editor):
+    """Make the id sequences of this alias hand out ids of its own SHARD_ID_RANGE.
+
+    The n-th alias of SHARD_DATABASES gets the ids n * SHARD_ID_RANGE + 1 to
+    (n + 1) * SHARD_ID_RANGE, so the ids of a user moved to another shard
+    never collide with the rows already there.
+    """
+
+    alias = schema_editor.connection.alias
+    if alias not in settings.SHARD_DATABASES:
+        return
+    first = settings.SHARD_DATABASES.index(alias) * settings.SHARD_ID_RANGE + 1
+    last = first + settings.SHARD_ID_RANGE - 1
+
+    with schema_editor.connection.cursor() as cursor:
+        for sequence in list(sequences(cursor)):
+            cursor.execute(f'SELECT last_value, is_called FROM {sequence}')
+            last_value, is_called = cursor.fetchone()
+            restart = max(first, last_value + 1 if is_called else last_value)
+            cursor.execute(
+                f'ALTER SEQUENCE {sequence} MINVALUE {first} MAXVALUE {last} START WITH {first} RESTART WITH {restart}'
+            )
+
+
+def unset_id_ranges(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for sequence in list(sequences(cursor)):
+            cursor.execute(f'ALTER SEQUENCE {sequence} NO MINVALUE NO MAXVALUE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_task'),
+    ]
+
+    operations = [
+        migrations.RunPython(set_id_ranges, unset_id_ranges),
+    ]
@@ -1,5 +1,9 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import signals
+from django.utils import timezone
 from app import settings
+from core import passwords
+from core.fields import UserScopedManyToManyField
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -28,7 +32,7 @@ class UserManager(BaseUserManager):
             raise ValueError('Email must not be empty')
 
         user = self.model(email=self.normalize_email(email), **extra_fields)
-        user.set_password(password)
+        passwords.set_password(user, password)
         user.save(using=self._db)
 
         return user
@@ -51,6 +55,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    token_version = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = 'email'
 
@@ -59,10 +64,15 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 class Tag(models.Model):
     name = models.CharField(max_length=255)
+    # cascades in the database, see migration 0016
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.DO_NOTHING
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'updated_at', 'id'], name='core_tag_changes_idx')]
 
     def __str__(self) -> str:
         return self.name
@@ -70,29 +80,280 @@ class Tag(models.Model):
 
 class Ingredient(models.Model):
     name = models.CharField(max_length=255)
+    # cascades in the database, see migration 0016
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.DO_NOTHING
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'updated_at', 'id'], name='core_ingredient_changes_idx')]
 
     def __str__(self) -> str:
         return self.name
 
 
 class Recipe(models.Model):
+    """Recipe of a user.
+
+    core_recipe and its through tables are hash partitioned by user_id, keep
+    user_id in every query so Postgres scans one partition.
+    """
+
+    # cascades in the database, see migration 0016
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
-        on_delete=models.CASCADE
+        on_delete=models.DO_NOTHING
     )
     title = models.CharField(max_length=255)
     description = models.CharField(max_length=500)
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
     link = models.CharField(max_length=255, blank=True)
-    tags = models.ManyToManyField(Tag, related_name='recipe')
-    ingredients = models.ManyToManyField(
-        Ingredient, related_name='recipe')
+    tags = UserScopedManyToManyField(Tag, related_name='recipe', through='RecipeTag')
+    ingredients = UserScopedManyToManyField(
+        Ingredient, related_name='recipe', through='RecipeIngredient')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    updated_at = models.DateTimeField(auto_now=True)
+    # [{id, name}] of the links, written only by recipe.summaries
+    tag_summary = models.JSONField(default=list, editable=False)
+    ingredient_summary = models.JSONField(default=list, editable=False)
+
+    SUMMARY_FIELDS = {'tag_summary', 'ingredient_summary'}
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at', 'id'], name='core_recipe_changes_idx'),
+            # one per ordering of the recipe list
+            models.Index(fields=['user', 'price', 'id'], name='core_recipe_price_idx'),
+            models.Index(fields=['user', 'time_minutes', 'id'], name='core_recipe_time_idx'),
+            models.Index(fields=['user', 'title', 'id'], name='core_recipe_title_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.title
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        # recipes never change owner, the extra filter prunes the other partitions
+        base_qs = base_qs.filter(user_id=self.user_id)
+        # a stale copy in memory must not overwrite summaries refreshed in SQL
+        values = [value for value in values if value[0].name not in self.SUMMARY_FIELDS]
+        return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+
+    def delete(self, using=None, keep_parents=False):
+        """Delete the recipe from its owner's partition only.
+
+        The links cascade in the database, so unlike the collector this
+        deletes by (id, user_id) even when delete signals have receivers.
+        """
+
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            signals.pre_delete.send(sender=type(self), instance=self, using=using)
+            count = type(self)._base_manager.using(using).filter(pk=self.pk, user_id=self.user_id)._raw_delete(using)
+            signals.post_delete.send(sender=type(self), instance=self, using=using)
+        return count, {self._meta.label: count}
+
+
+class RecipeTag(models.Model):
+    """Link between a recipe and a tag of the same user.
+
+    The foreign keys are declared in SQL by migration 0009 as composite keys
+    over (id, user_id) that cascade on delete.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='tag_links'
+    )
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='recipe_links'
+    )
+
+    class Meta:
+        db_table = 'core_recipe_tags'
+        unique_together = [('user', 'recipe', 'tag')]
+        indexes = [models.Index(fields=['user', 'tag'], name='core_recipe_tags_user_tag_idx')]
+
+
+class RecipeIngredient(models.Model):
+    """Link between a recipe and an ingredient of the same user.
+
+    The foreign keys are declared in SQL by migration 0009 as composite keys
+    over (id, user_id) that cascade on delete.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='ingredient_links'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='recipe_links'
+    )
+
+    class Meta:
+        db_table = 'core_recipe_ingredients'
+        unique_together = [('user', 'recipe', 'ingredient')]
+        indexes = [models.Index(fields=['user', 'ingredient'], name='core_recipe_ingr_user_ingr_idx')]
+
+
+class RefreshToken(models.Model):
+    """Long lived token exchanged for new signed access tokens."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    token_hash = models.CharField(max_length=64, unique=True)
+    version = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class ShardAssignment(models.Model):
+    """Database alias holding a user's recipes, tags and ingredients."""
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='shard'
+    )
+    alias = models.CharField(max_length=64)
+    moving = models.BooleanField(default=False)
+
+
+class Tombstone(models.Model):
+    """Record of a deleted recipe, tag or ingredient for the changes feed."""
+
+    KINDS = [('recipe', 'Recipe'), ('tag', 'Tag'), ('ingredient', 'Ingredient')]
+
+    # cascades in the database, see migration 0016
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING
+    )
+    kind = models.CharField(max_length=16, choices=KINDS)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'deleted_at', 'id'], name='core_tombstone_changes_idx')]
+
+
+class UserRecipeStat(models.Model):
+    """Running count and total of one statistic of a user's recipes."""
+
+    # cascades in the database, see migration 0016
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING
+    )
+    key = models.CharField(max_length=64)
+    count = models.BigIntegerField(default=0)
+    total = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = [('user', 'key')]
+
+
+class RecipeSimilarity(models.Model):
+    """One of the most similar recipes of a recipe, kept by recipe.similarity.
+
+    The foreign keys to core_recipe are declared in SQL by migration 0013 as
+    composite keys over (id, user_id) that cascade on delete.
+    """
+
+    # cascades in the database, see migration 0016
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name='+'
+    )
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = [('user', 'recipe', 'similar')]
+        indexes = [models.Index(fields=['user', 'similar'], name='core_recipesim_similar_idx')]
+
+
+class IdempotencyRecord(models.Model):
+    """Outcome of a POST sent with an Idempotency-Key, see core.idempotency."""
+
+    key = models.CharField(max_length=64, unique=True)
+    fingerprint = models.CharField(max_length=64)
+    # null while the first request is still running
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True)
+    locked_until = models.DateTimeField()
+    expires_at = models.DateTimeField(db_index=True)
+
+
+class Task(models.Model):
+    """Queued or failed background task, see core.tasks. Finished tasks are deleted."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField()
+    # while running, when the lease of the worker expires and the task is claimed again
+    run_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['run_at', 'id'],
+                name='core_task_due_idx',
+                condition=models.Q(status__in=['queued', 'running'])
+            ),
+        ]
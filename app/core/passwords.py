@@ -0,0 +1,117 @@
+"""
+Password hashing and verification in a bounded process pool.
+
+PBKDF2 is CPU bound, so a burst of logins would otherwise occupy every
+request worker. With PASSWORD_HASHING_WORKERS set, hashing runs in a small
+pool per worker process and at most PASSWORD_HASHING_QUEUE jobs may wait for
+it; requests beyond that fail fast with 503 instead of piling up.
+"""
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+
+from concurrent import futures
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import sys
+import threading
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_slots = None
+
+
+class PasswordHashingBusy(exceptions.APIException):
+    status_code = 503
+    default_detail = _('Too many logins in progress, try again shortly.')
+    default_code = 'password_hashing_busy'
+
+
+def _get_executor():
+    global _executor, _executor_pid, _slots
+
+    workers = settings.PASSWORD_HASHING_WORKERS
+    if workers <= 0:
+        return None
+
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            # the pool is created lazily so every uWSGI worker starts its own. Its processes come
+            # from a fork server rather than this process, forking a process running other threads,
+            # uWSGI threads or the ASGI pool, can leave locks they held locked in the children.
+            context = multiprocessing.get_context('forkserver')
+            context.set_forkserver_preload(['core.passwords'])
+            if 'uwsgi' in os.path.basename(sys.executable):
+                # the fork server is started with sys.executable, which is uwsgi under uWSGI
+                context.set_executable(os.path.join(sys.exec_prefix, 'bin', 'python3'))
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _executor_pid = os.getpid()
+            _slots = threading.BoundedSemaphore(workers + settings.PASSWORD_HASHING_QUEUE)
+        return _executor
+
+
+def shutdown_pool():
+    """Stop the hashing pool of this process, it is recreated on demand."""
+
+    global _executor
+    with _lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=True)
+        _executor = None
+
+
+def _run(func, *args):
+    executor = _get_executor()
+    if executor is None:
+        return func(*args)
+
+    slots = _slots
+    if not slots.acquire(timeout=settings.PASSWORD_HASHING_TIMEOUT):
+        raise PasswordHashingBusy()
+    try:
+        future = executor.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    # the slot is held until the job is done, also when the request gave up waiting on it
+    future.add_done_callback(lambda future: slots.release())
+    try:
+        return future.result(timeout=settings.PASSWORD_HASHING_TIMEOUT)
+    except futures.TimeoutError:
+        raise PasswordHashingBusy()
+
+
+def _verify(raw_password, encoded):
+    new_encoded = []
+    valid = hashers.check_password(
+        raw_password,
+        encoded,
+        setter=lambda raw: new_encoded.append(hashers.make_password(raw))
+    )
+    return valid, (new_encoded[0] if new_encoded else None)
+
+
+def make_password(raw_password):
+    """Hash a password with the preferred hasher."""
+
+    if raw_password is None:
+        return hashers.make_password(None)
+    return _run(hashers.make_password, raw_password)
+
+
+def verify_password(raw_password, encoded):
+    """Return (valid, new_encoded), new_encoded is set when a rehash is due."""
+
+    return _run(_verify, raw_password, encoded)
+
+
+def set_password(user, raw_password):
+    """Equivalent of user.set_password() hashing in the pool."""
+
+    user.password = make_password(raw_password)
+    user._password = raw_password
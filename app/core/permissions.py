@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.permissions import BasePermission, SAFE_METHODS
+
+from core import sharding
+
+
+class ShardMoving(exceptions.APIException):
+    status_code = 503
+    default_detail = _('Your data is being moved, try again shortly.')
+    default_code = 'shard_moving'
+
+    def __init__(self, wait, *args, **kwargs):
+        self.wait = wait
+        super().__init__(*args, **kwargs)
+
+
+class ShardWritable(BasePermission):
+    """Reject writes while the user's data moves between shards."""
+
+    def has_permission(self, request, view):
+        if request.method in SAFE_METHODS or not settings.SHARDING_ENABLED:
+            return True
+        if sharding.shard_for_user(request.user.pk)[1]:
+            raise ShardMoving(wait=settings.SHARD_CACHE_TIMEOUT)
+        return True
@@ -0,0 +1,62 @@
+"""
+Bounded thread pool for the blocking work of async views.
+
+Under ASGI the event loop only waits on sockets, the ORM and everything else
+that blocks runs in one pool of settings.ASYNC_POOL_THREADS threads per
+process, so the number of database connections a process opens is bounded
+however many requests it has open.
+
+Middleware wrapping the work of a request, like counting its queries, has
+its context entered around that work in the pool threads with pool_hook().
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+import threading
+
+_hooks = ContextVar('pool_thread_hooks', default=())
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.ASYNC_POOL_THREADS, thread_name_prefix='async-pool')
+        return _executor
+
+
+@contextmanager
+def pool_hook(hook):
+    """Enter the context manager hook() around the pool work of this code path."""
+
+    token = _hooks.set(_hooks.get() + (hook,))
+    try:
+        yield
+    finally:
+        _hooks.reset(token)
+
+
+def _run_hooked(func, args, kwargs):
+    # connections of pool threads outlive requests, recycle them like a request would
+    close_old_connections()
+    try:
+        with ExitStack() as stack:
+            for hook in _hooks.get():
+                stack.enter_context(hook())
+            return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run(func, *args, **kwargs):
+    """Call func in the pool and return its result."""
+
+    call = sync_to_async(_run_hooked, thread_sensitive=False, executor=get_executor())
+    return await call(func, args, kwargs)
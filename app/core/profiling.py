@@ -0,0 +1,160 @@
+"""
+Helpers for capturing and reading request profiles.
+"""
+
+from django.conf import settings
+from django.core import signing
+
+import json
+import os
+import pstats
+import time
+import uuid
+
+TOKEN_SALT = 'core.profiling'
+TOKEN_VALUE = 'profile'
+TOKEN_MAX_AGE = 60 * 60
+
+
+def issue_token():
+    """Return a signed value for the profiling request header."""
+
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(TOKEN_VALUE)
+
+
+def is_valid_token(value):
+    try:
+        unsigned = signing.TimestampSigner(salt=TOKEN_SALT).unsign(value, max_age=TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return unsigned == TOKEN_VALUE
+
+
+def endpoint_group(path):
+    """Group a request path by the API resource it targets."""
+
+    groups = (
+        ('/api/recipe/recipes/', 'recipe'),
+        ('/api/recipe/tags/', 'tag'),
+        ('/api/recipe/ingredients/', 'ingredient'),
+        ('/api/user/', 'user'),
+    )
+    for prefix, group in groups:
+        if path.startswith(prefix):
+            return group
+    return 'other'
+
+
+def _function_name(func):
+    file_name, line, name = func
+    if file_name == '~':
+        return name
+    return f'{file_name}:{line}({name})'
+
+
+def top_functions(stats, limit=30):
+    """Return the functions with the highest cumulative time."""
+
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)
+    return [
+        {
+            'function': _function_name(func),
+            'calls': nc,
+            'tottime': tt,
+            'cumtime': ct,
+        }
+        for func, (cc, nc, tt, ct, callers) in rows[:limit]
+    ]
+
+
+def call_tree(stats, max_depth=8, min_share=0.01):
+    """Build a call tree from the caller edges recorded by cProfile."""
+
+    callees = {}
+    for func, (cc, nc, tt, ct, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    roots = [func for func, data in stats.stats.items() if not data[4]]
+    if not roots:
+        return None
+    root = max(roots, key=lambda func: stats.stats[func][3])
+    total = stats.stats[root][3] or 1
+
+    def build(func, cumtime, depth, path):
+        node = {'function': _function_name(func), 'cumtime': cumtime, 'children': []}
+        if depth >= max_depth:
+            return node
+        children = sorted(callees.get(func, []), key=lambda child: child[1], reverse=True)
+        for child, child_time in children:
+            if child in path or child_time / total < min_share:
+                continue
+            node['children'].append(build(child, child_time, depth + 1, path | {child}))
+        return node
+
+    return build(root, stats.stats[root][3], 0, {root})
+
+
+def write_profile(profiler, queries, **info):
+    """Store a profile in the profile directory and rotate old ones."""
+
+    stats = pstats.Stats(profiler)
+    data = {
+        **info,
+        'timestamp': time.time(),
+        'top_functions': top_functions(stats),
+        'call_tree': call_tree(stats),
+        'queries': queries,
+    }
+
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    file_name = f'{int(data["timestamp"] * 1000)}-{uuid.uuid4().hex[:8]}.json'
+    with open(os.path.join(directory, file_name), 'w') as fh:
+        json.dump(data, fh)
+
+    rotate(directory, settings.PROFILING_MAX_FILES)
+    return file_name
+
+
+def rotate(directory, max_files):
+    """Delete the oldest profiles beyond max_files."""
+
+    file_names = sorted(f for f in os.listdir(directory) if f.endswith('.json'))
+    for file_name in file_names[:max(len(file_names) - max_files, 0)]:
+        try:
+            os.remove(os.path.join(directory, file_name))
+        except FileNotFoundError:
+            pass
+
+
+def load_profiles(directory):
+    """Yield the profiles stored in a directory."""
+
+    if not os.path.isdir(directory):
+        return
+    for file_name in sorted(os.listdir(directory)):
+        if not file_name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, file_name)) as fh:
+                yield json.load(fh)
+        except (OSError, ValueError):
+            continue
+
+
+class QueryRecorder:
+    """Database execute wrapper recording the SQL of a request."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql[:1000],
+                'duration': time.perf_counter() - start,
+            })
@@ -0,0 +1,128 @@
+"""
+Token buckets in memory shared by all uWSGI worker processes.
+
+The bucket table is an anonymous shared mapping created when this module is
+imported, which CoreConfig.ready() does while uWSGI loads the application in
+the master process. The forked workers therefore all see the same table and
+the same locks. (With `lazy-apps` every worker would get a private table.)
+
+The table is set associative: a key hashes to a set of WAYS slots guarded by
+one lock stripe, and the least recently used slot of the set is recycled
+when the set is full.
+
+A worker killed while holding a stripe, by harakiri for example, never
+releases it. Every stripe records the pid of its holder, and a stripe not
+acquired within LOCK_TIMEOUT seconds is broken only when that process is
+gone. A live holder is merely slow, and the check fails open meanwhile.
+"""
+
+from django.conf import settings
+
+import hashlib
+import mmap
+import multiprocessing
+import os
+import struct
+import time
+
+SLOT = struct.Struct('Qdd')  # key hash, tokens, last update
+HOLDER = struct.Struct('qd')  # pid and acquisition time of a stripe's holder
+WAYS = 4
+LOCK_TIMEOUT = 1
+
+
+class SharedTokenBucket:
+    """Token buckets keyed by string in a shared memory table."""
+
+    def __init__(self, slots=65536, stripes=64):
+        self.sets = max(slots // WAYS, 1)
+        self._map = mmap.mmap(-1, self.sets * WAYS * SLOT.size)
+        self._locks = [multiprocessing.Lock() for _ in range(stripes)]
+        self._holders = mmap.mmap(-1, stripes * HOLDER.size)
+        self._breaking = multiprocessing.Lock()
+
+    @staticmethod
+    def _hash(key):
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') or 1
+
+    @staticmethod
+    def _alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _acquire(self, stripe):
+        """Take a stripe, breaking it if its holder died. Returns False on timeout."""
+
+        lock, offset = self._locks[stripe], stripe * HOLDER.size
+        while not lock.acquire(timeout=LOCK_TIMEOUT):
+            holder = HOLDER.unpack_from(self._holders, offset)
+            if not holder[0] or self._alive(holder[0]):
+                return False
+            with self._breaking:
+                # another waiter may have broken the stripe and taken it already
+                if HOLDER.unpack_from(self._holders, offset) == holder:
+                    HOLDER.pack_into(self._holders, offset, 0, 0.0)
+                    lock.release()
+        HOLDER.pack_into(self._holders, offset, os.getpid(), time.monotonic())
+        return True
+
+    def _release(self, stripe):
+        HOLDER.pack_into(self._holders, stripe * HOLDER.size, 0, 0.0)
+        self._locks[stripe].release()
+
+    def consume(self, key, capacity, rate, now=None):
+        """Take a token from the bucket.
+
+        Returns 0 when the request is allowed, otherwise the number of
+        seconds until a token is available. Requests are allowed when the
+        stripe of the key stays busy for LOCK_TIMEOUT seconds.
+        """
+
+        key_hash = self._hash(key)
+        now = time.monotonic() if now is None else now
+        set_index = key_hash % self.sets
+        base = set_index * WAYS * SLOT.size
+
+        stripe = set_index % len(self._locks)
+        if not self._acquire(stripe):
+            return 0.0
+        try:
+            offset, tokens = None, float(capacity)
+            oldest_offset, oldest_time = base, None
+            for way in range(WAYS):
+                slot_offset = base + way * SLOT.size
+                slot_hash, slot_tokens, slot_time = SLOT.unpack_from(self._map, slot_offset)
+                if slot_hash == key_hash:
+                    offset = slot_offset
+                    tokens = min(float(capacity), slot_tokens + (now - slot_time) * rate)
+                    break
+                if oldest_time is None or slot_hash == 0 or slot_time < oldest_time:
+                    oldest_offset = slot_offset
+                    oldest_time = -1.0 if slot_hash == 0 else slot_time
+            if offset is None:
+                offset = oldest_offset
+
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            SLOT.pack_into(self._map, offset, key_hash, tokens, now)
+        finally:
+            self._release(stripe)
+
+        return wait
+
+    def reset(self):
+        """Forget all buckets."""
+
+        self._map[:] = bytes(len(self._map))
+
+
+buckets = SharedTokenBucket(slots=settings.THROTTLE_TABLE_SLOTS)
@@ -0,0 +1,144 @@
+"""
+Database routers.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import LazyObject, empty
+
+from core import sharding
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+import random
+
+_request_state = ContextVar('routing_request_state', default=None)
+_shard_user = ContextVar('routing_shard_user', default=None)
+
+
+def pin_cache_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+class RequestState:
+    """Routing state of the request being served."""
+
+    def __init__(self, request, pinned):
+        self.request = request
+        self.pinned = pinned
+        self.checked_user_id = None
+
+
+def start_request(request, pinned):
+    return _request_state.set(RequestState(request, pinned))
+
+
+def finish_request(token):
+    _request_state.reset(token)
+
+
+def authenticated_user_id(request):
+    """Return the id of the user once authentication has happened."""
+
+    user = request.__dict__.get('user')
+    if isinstance(user, LazyObject):
+        # never force authentication from inside the router
+        user = None if user._wrapped is empty else user._wrapped
+    if user is None or not user.is_authenticated:
+        return None
+    return user.pk
+
+
+@contextmanager
+def user_shard(user_id):
+    """Route user owned models to the shard of user_id outside of requests."""
+
+    token = _shard_user.set(user_id)
+    try:
+        yield
+    finally:
+        _shard_user.reset(token)
+
+
+def current_user_id():
+    """Return the user whose shard serves the current code path."""
+
+    user_id = _shard_user.get()
+    if user_id is not None:
+        return user_id
+    state = _request_state.get()
+    if state is None:
+        return None
+    return authenticated_user_id(state.request)
+
+
+def pin_user(user_id):
+    """Send the user's reads to the primary for REPLICA_PIN_SECONDS."""
+
+    cache.set(pin_cache_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def primary_required():
+    """Return True when reads of the current request must use the primary."""
+
+    state = _request_state.get()
+    if state is None:
+        return False
+    if state.pinned:
+        return True
+
+    user_id = authenticated_user_id(state.request)
+    if user_id is not None and state.checked_user_id != user_id:
+        state.checked_user_id = user_id
+        state.pinned = bool(cache.get(pin_cache_key(user_id)))
+    return state.pinned
+
+
+class ReplicaRouter:
+    """Send reads to settings.REPLICA_DATABASES and writes to the primary.
+
+    Writing requests read from the primary too, and so do the reads of a user
+    for a short while after they wrote (read-your-writes).
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+
+        replicas = settings.REPLICA_DATABASES
+        if not replicas or primary_required():
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ShardRouter:
+    """Send user owned models to the shard of their owner."""
+
+    def _db_for_model(self, model, hints):
+        if not settings.SHARDING_ENABLED:
+            return None
+        if model._meta.label_lower not in sharding.SHARDED_MODELS:
+            return None
+
+        instance = hints.get('instance')
+        user_id = getattr(instance, 'user_id', None)
+        if user_id is None and instance is not None and instance._state.db:
+            return instance._state.db
+        if user_id is None:
+            user_id = current_user_id()
+        if user_id is None:
+            return None
+        return sharding.shard_for_user(user_id)[0]
+
+    def db_for_read(self, model, **hints):
+        return self._db_for_model(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._db_for_model(model, hints)
@@ -0,0 +1,134 @@
+"""
+User shard directory.
+
+Recipes, tags and ingredients belong to exactly one user, so all of a user's
+rows live on one database alias. ShardAssignment (on `default`) records the
+alias; users without an assignment live on `default`.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.base import ModelState
+
+from core import metrics
+from core.models import (
+    ShardAssignment, Recipe, Tag, Ingredient, RecipeTag, RecipeIngredient, Tombstone, UserRecipeStat, RecipeSimilarity
+)
+
+import copy
+
+SHARDED_MODELS = {
+    'core.recipe',
+    'core.tag',
+    'core.ingredient',
+    'core.recipetag',
+    'core.recipeingredient',
+    'core.tombstone',
+    'core.userrecipestat',
+    'core.recipesimilarity',
+}
+
+
+class ShardCollision(Exception):
+    """Rows of the moved user already exist on the target shard."""
+
+
+def _cache_key(user_id):
+    return f'user-shard:{user_id}'
+
+
+def shard_for_user(user_id):
+    """Return (alias, moving) for the user."""
+
+    if not settings.SHARDING_ENABLED:
+        return 'default', False
+
+    key = _cache_key(user_id)
+    entry = cache.get(key)
+    metrics.record_cache('user_shard', entry is not None)
+    if entry is None:
+        entry = ShardAssignment.objects.using('default').filter(
+            user_id=user_id).values_list('alias', 'moving').first() or ('default', False)
+        cache.set(key, entry, settings.SHARD_CACHE_TIMEOUT)
+    return tuple(entry)
+
+
+def forget(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+def mirror_user(user, alias):
+    """Copy the user row to a shard so foreign keys to it hold there."""
+
+    if alias == 'default':
+        return
+    clone = copy.copy(user)
+    clone._state = ModelState()
+    clone.save(using=alias)
+
+
+def delete_mirrored_user(user_id):
+    """Delete the copies of a user on the shards, their rows there cascade in the database."""
+
+    for alias in settings.SHARD_DATABASES:
+        if alias != 'default':
+            get_user_model().objects.using(alias).filter(pk=user_id).delete()
+    forget(user_id)
+
+
+def assign_new_user(user):
+    """Place a new user on a shard chosen by user id."""
+
+    alias = settings.SHARD_DATABASES[user.pk % len(settings.SHARD_DATABASES)]
+    ShardAssignment.objects.using('default').create(user=user, alias=alias)
+    mirror_user(user, alias)
+    forget(user.pk)
+    return alias
+
+
+def user_querysets(user_id, alias):
+    """Querysets of everything a user owns on an alias, parents first."""
+
+    return [
+        Tag.objects.using(alias).filter(user_id=user_id),
+        Ingredient.objects.using(alias).filter(user_id=user_id),
+        Recipe.objects.using(alias).filter(user_id=user_id),
+        RecipeTag.objects.using(alias).filter(user_id=user_id),
+        RecipeIngredient.objects.using(alias).filter(user_id=user_id),
+        Tombstone.objects.using(alias).filter(user_id=user_id),
+        UserRecipeStat.objects.using(alias).filter(user_id=user_id),
+        RecipeSimilarity.objects.using(alias).filter(user_id=user_id),
+    ]
+
+
+def copy_user_data(user_id, source, target, batch_size=1000):
+    """Copy a user's rows from source to target keeping their ids.
+
+    The ids come from the id range of the alias they were created on, see
+    migration 0018, so the target sequences are left alone.
+    """
+
+    user = get_user_model().objects.using('default').get(pk=user_id)
+    with transaction.atomic(using=target):
+        mirror_user(user, target)
+        for queryset in user_querysets(user_id, source):
+            model = queryset.model
+            rows = list(queryset.order_by('pk'))
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                if model.objects.using(target).filter(pk__in=[row.pk for row in batch]).exists():
+                    raise ShardCollision(
+                        f'{model._meta.db_table} ids of user {user_id} already exist on {target}, '
+                        'were the shards migrated with their own SHARD_ID_RANGE?'
+                    )
+                model.objects.using(target).bulk_create(batch)
+
+
+def delete_user_data(user_id, alias):
+    """Delete a user's rows from an alias."""
+
+    with transaction.atomic(using=alias):
+        for queryset in reversed(user_querysets(user_id, alias)):
+            queryset._raw_delete(alias)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core import sharding
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def assign_user_shard(sender, instance, created, raw, using, **kwargs):
+    """Place new users on a shard."""
+
+    if created and not raw and using == 'default' and settings.SHARDING_ENABLED:
+        sharding.assign_new_user(instance)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def delete_user_from_shards(sender, instance, using, **kwargs):
+    """Delete the copies of a deleted user on the shards once the delete commits."""
+
+    if using == 'default' and settings.SHARDING_ENABLED:
+        user_id = instance.pk
+        transaction.on_commit(lambda: sharding.delete_mirrored_user(user_id), using=using)
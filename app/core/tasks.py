@@ -0,0 +1,192 @@
+"""
+Postgres-backed background tasks.
+
+Functions decorated with @task are queued with enqueue(), which inserts a
+row into the Task table, so a task enqueued inside a transaction only exists
+once it commits. `manage.py run_worker` runs them: a worker claims due rows
+with `FOR UPDATE SKIP LOCKED`, so any number of workers, threads or
+processes, share the table without taking the same task twice.
+
+A claimed task holds a lease of settings.TASK_LEASE_SECONDS, renewed every
+third of it while the task runs, so a task whose worker died is claimed again
+once its lease expires. A failing task is retried with
+exponential backoff until it has been attempted max_attempts times, then
+left as failed for inspection. Finished tasks are deleted. Tasks may run
+more than once and should be idempotent.
+"""
+
+from django.conf import settings
+from django.db import DatabaseError, connections, router
+from django.utils import timezone
+
+from core.models import Task
+
+from contextlib import contextmanager
+import datetime
+import random
+import threading
+import traceback
+
+_registry = {}
+
+CLAIM_SQL = (
+    'UPDATE core_task SET status = %s, attempts = attempts + 1, run_at = %s '
+    'WHERE id IN ('
+    'SELECT id FROM core_task WHERE status IN (%s, %s) AND run_at <= %s '
+    'ORDER BY run_at, id LIMIT %s FOR UPDATE SKIP LOCKED) '
+    'RETURNING *'
+)
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    """Register func as a task, under its dotted path unless named."""
+
+    def register(func):
+        func.task_name = name or f'{func.__module__}.{func.__qualname__}'
+        func.max_attempts = max_attempts
+        _registry[func.task_name] = func
+        return func
+
+    return register if func is None else register(func)
+
+
+def _tasks():
+    return Task.objects.using(router.db_for_write(Task))
+
+
+def enqueue(func, run_at=None, max_attempts=None, **kwargs):
+    """Queue a call of the task func with JSON serializable kwargs, returning its Task."""
+
+    return _tasks().create(
+        name=func.task_name,
+        kwargs=kwargs,
+        max_attempts=max_attempts or func.max_attempts or settings.TASK_MAX_ATTEMPTS,
+        run_at=run_at or timezone.now(),
+    )
+
+
+def claim(limit=1):
+    """Mark up to limit due tasks as running by this worker and return them."""
+
+    now = timezone.now()
+    lease = now + datetime.timedelta(seconds=settings.TASK_LEASE_SECONDS)
+    tasks = _tasks()
+    return list(tasks.raw(CLAIM_SQL, [Task.RUNNING, lease, Task.QUEUED, Task.RUNNING, now, limit], using=tasks.db))
+
+
+def renew_lease(claimed):
+    """Extend the lease of a running task, returning False when it is no longer this worker's."""
+
+    lease = timezone.now() + datetime.timedelta(seconds=settings.TASK_LEASE_SECONDS)
+    mine = _tasks().filter(pk=claimed.pk, status=Task.RUNNING, attempts=claimed.attempts)
+    return bool(mine.update(run_at=lease))
+
+
+def _renew_until(claimed, done):
+    try:
+        while not done.wait(settings.TASK_LEASE_SECONDS / 3):
+            try:
+                if not renew_lease(claimed):
+                    return
+            except DatabaseError:
+                # try again at the next renewal, the lease still has two thirds left
+                pass
+    finally:
+        connections.close_all()
+
+
+@contextmanager
+def _leased(claimed):
+    """Renew the lease of claimed from another thread while the block runs."""
+
+    done = threading.Event()
+    renewal = threading.Thread(target=_renew_until, args=(claimed, done), name=f'task-lease-{claimed.pk}',
+                               daemon=True)
+    renewal.start()
+    try:
+        yield
+    finally:
+        done.set()
+        renewal.join()
+
+
+def retry_delay(attempts):
+    """Seconds to wait before attempt attempts + 1, with jitter."""
+
+    delay = min(settings.TASK_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.TASK_RETRY_MAX_SECONDS)
+    return delay * random.uniform(0.5, 1)
+
+
+def run_task(claimed):
+    """Run a claimed task and record the outcome, returning the error or None."""
+
+    error = None
+    try:
+        if claimed.attempts > claimed.max_attempts:
+            # the lease of its last attempt expired
+            raise TimeoutError('The worker running the last attempt stopped.')
+        func = _registry.get(claimed.name)
+        if func is None:
+            raise LookupError(f'No task is registered as {claimed.name}.')
+        with _leased(claimed):
+            func(**claimed.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+
+    # a worker whose lease expired must not overwrite the task's next attempt
+    mine = _tasks().filter(pk=claimed.pk, status=Task.RUNNING, attempts=claimed.attempts)
+    if error is None:
+        mine.delete()
+    elif claimed.attempts >= claimed.max_attempts:
+        mine.update(status=Task.FAILED, last_error=error, finished_at=timezone.now())
+    else:
+        run_at = timezone.now() + datetime.timedelta(seconds=retry_delay(claimed.attempts))
+        mine.update(status=Task.QUEUED, last_error=error, run_at=run_at)
+    return error
+
+
+def work(stop, burst=False, poll_interval=1, report=None):
+    """Run due tasks one at a time until stop is set, or none is due in burst mode.
+
+    report(task, error) is called after every task.
+    """
+
+    while not stop.is_set():
+        claimed = claim()
+        if not claimed:
+            if burst:
+                return
+            stop.wait(poll_interval)
+            continue
+        error = run_task(claimed[0])
+        if report is not None:
+            report(claimed[0], error)
+
+
+def _work_in_thread(*args):
+    try:
+        work(*args)
+    finally:
+        # every thread has its own connections
+        connections.close_all()
+
+
+def run_workers(concurrency=1, burst=False, poll_interval=1, report=None, stop=None):
+    """Run concurrency threads working on the queue and wait for them to stop.
+
+    A single worker runs in the calling thread.
+    """
+
+    stop = stop or threading.Event()
+    if concurrency == 1:
+        return work(stop, burst, poll_interval, report)
+    threads = [
+        threading.Thread(target=_work_in_thread, args=(stop, burst, poll_interval, report), name=f'task-worker-{i}')
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        # join in slices so the main thread still handles signals
+        while thread.is_alive():
+            thread.join(0.5)
@@ -0,0 +1,99 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+
+from core.coalescing import CoalescedReadMixin, _lock_key, _result_key
+
+import threading
+import time
+
+
+class SlowView(CoalescedReadMixin, APIView):
+    authentication_classes = []
+    permission_classes = []
+    throttle_classes = []
+    action = 'list'
+    calls = 0
+
+    def get(self, request):
+        type(self).calls += 1
+        time.sleep(0.2)
+        return Response({'calls': type(self).calls})
+
+
+class CoalescingTests(SimpleTestCase):
+    """Testing coalescing of identical concurrent reads."""
+
+    def setUp(self):
+        cache.clear()
+        SlowView.calls = 0
+        self.view = SlowView.as_view()
+        self.factory = APIRequestFactory()
+
+    def get(self, path='/recipes/'):
+        response = self.view(self.factory.get(path))
+        return response.render() if hasattr(response, 'render') else response
+
+    def run_concurrently(self, count):
+        contents = []
+        threads = [threading.Thread(target=lambda: contents.append(self.get().content)) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, contents
+
+    def test_concurrent_requests_share(self):
+        """Testing identical reads waiting together run the view once"""
+
+        first, first_contents = self.run_concurrently(1)
+        time.sleep(0.05)
+        threads, contents = self.run_concurrently(5)
+        for thread in first + threads:
+            thread.join()
+
+        self.assertEqual(SlowView.calls, 2)
+        self.assertEqual(contents, [b'{"calls":2}'] * 5)
+
+    def test_running_computation_not_shared(self):
+        """Testing a read arriving after a computation started does not get its result"""
+
+        first, first_contents = self.run_concurrently(1)
+        time.sleep(0.05)
+        second = self.get()
+        first[0].join()
+
+        self.assertEqual(first_contents, [b'{"calls":1}'])
+        self.assertEqual(second.content, b'{"calls":2}')
+
+    def test_sequential_and_different_requests(self):
+        """Testing reads after a computation and other paths are not shared"""
+
+        self.get()
+        self.get()
+        self.get('/recipes/?tags=1')
+
+        self.assertEqual(SlowView.calls, 3)
+
+    def test_shared_across_processes(self):
+        """Testing a read waits for the result another process publishes"""
+
+        key = SlowView().coalescing_key(self._request())
+        cache.add(_lock_key(key), 0)
+        publisher = threading.Timer(0.1, lambda: cache.set(
+            _result_key(key), (time.time(), 'application/json', b'"shared"')
+        ))
+        publisher.start()
+
+        response = self.get()
+
+        publisher.join()
+        self.assertEqual(response.content, b'"shared"')
+        self.assertEqual(SlowView.calls, 0)
+
+    def _request(self):
+        view = SlowView(format_kwarg=None)
+        request = view.initialize_request(self.factory.get('/recipes/'))
+        request.accepted_renderer, request.accepted_media_type = view.perform_content_negotiation(request)
+        return request
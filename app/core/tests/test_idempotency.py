@@ -0,0 +1,111 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import idempotency
+from core.models import IdempotencyRecord, Recipe
+
+from io import StringIO
+import datetime
+
+RECIPES_URL = reverse('recipe:recipe-list')
+CREATE_USER_URL = reverse('user:create')
+PAYLOAD = {'title': 'Soup', 'description': 'Soup', 'time_minutes': 5, 'price': '2.00'}
+
+
+class IdempotencyTests(TestCase):
+    """Testing Idempotency-Key handling."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='test@example.com', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, key, payload=PAYLOAD):
+        return self.client.post(RECIPES_URL, payload, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replayed(self):
+        """Testing a retry returns the stored response without creating again"""
+
+        first = self.post('key-1')
+        retry = self.post('key-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry[idempotency.REPLAYED_HEADER], 'true')
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(self.post('key-2').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    def test_key_reused_for_other_request(self):
+        """Testing a key sent with a different body is rejected"""
+
+        self.post('key-1')
+
+        res = self.post('key-1', {**PAYLOAD, 'title': 'Stew'})
+
+        self.assertEqual(res.status_code, 422)
+
+    def test_errors_not_stored(self):
+        """Testing a failed request can be retried with the same key"""
+
+        self.assertEqual(self.post('key-1', {'title': 'Soup'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post('key-1').status_code, status.HTTP_201_CREATED)
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_in_flight(self):
+        """Testing a retry of a running request waits, and abandoned keys are taken over"""
+
+        self.post('key-1')
+        records = IdempotencyRecord.objects.all()
+        records.update(status_code=None, response=None, locked_until=timezone.now() + datetime.timedelta(minutes=1))
+
+        self.assertEqual(self.post('key-1').status_code, status.HTTP_409_CONFLICT)
+
+        records.update(locked_until=timezone.now())
+        self.assertEqual(self.post('key-1').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 2)
+
+    @override_settings(IDEMPOTENCY_STORE='core.idempotency.CacheStore')
+    def test_cache_store(self):
+        """Testing the cache store replays responses"""
+
+        first = self.post('key-1')
+        retry = self.post('key-1')
+
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 1)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+    def test_create_user(self):
+        """Testing anonymous user creation is idempotent"""
+
+        client = APIClient()
+        payload = {'email': 'new@example.com', 'password': 'testpass', 'name': 'New'}
+
+        first = client.post(CREATE_USER_URL, payload, HTTP_IDEMPOTENCY_KEY='signup')
+        retry = client.post(CREATE_USER_URL, payload, HTTP_IDEMPOTENCY_KEY='signup')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+
+    def test_purge(self):
+        """Testing the purge command deletes expired records only"""
+
+        self.post('key-1')
+        self.post('key-2')
+        IdempotencyRecord.objects.filter(pk=IdempotencyRecord.objects.first().pk).update(expires_at=timezone.now())
+        out = StringIO()
+
+        call_command('purge_idempotency_keys', batch_size=1, stdout=out)
+
+        self.assertEqual(IdempotencyRecord.objects.count(), 1)
+        self.assertIn('Deleted 1 idempotency records.', out.getvalue())
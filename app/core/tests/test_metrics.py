@@ -0,0 +1,102 @@
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import metrics
+
+import json
+import os
+import tempfile
+
+METRICS_URL = reverse('metrics')
+TAG_URL = reverse('recipe:tag-list')
+
+
+class RegistryTests(SimpleTestCase):
+    """Testing the metrics registry."""
+
+    def test_render_counter_and_histogram(self):
+        """Testing counters and histograms in the text format"""
+
+        registry = metrics.Registry()
+        registry.inc('requests_total', {'status': 200})
+        registry.inc('requests_total', {'status': 200})
+        registry.observe('latency_seconds', 0.3, buckets=(0.1, 0.5))
+
+        output = registry.render()
+
+        self.assertIn('# TYPE requests_total counter', output)
+        self.assertIn('requests_total{status="200"} 2', output)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 0', output)
+        self.assertIn('latency_seconds_bucket{le="0.5"} 1', output)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 1', output)
+        self.assertIn('latency_seconds_count 1', output)
+
+    def test_merge_worker_files(self):
+        """Testing samples of other workers are merged from the directory"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            dead_pid = 2 ** 22 + 1
+            with open(os.path.join(directory, f'metrics-{dead_pid}.json'), 'w') as fh:
+                json.dump({
+                    'pid': dead_pid,
+                    'buckets': {},
+                    'samples': [
+                        ['counter', 'requests_total', [], 3],
+                        ['gauge', 'in_flight', [], 5],
+                    ],
+                }, fh)
+
+            registry = metrics.Registry(directory=directory)
+            registry.inc('requests_total')
+            registry.gauge_add('in_flight', 1)
+            output = registry.render()
+
+        self.assertIn('requests_total 4', output)
+        self.assertIn('in_flight 1', output)
+
+    def test_cache_hit_ratio(self):
+        """Testing the hit ratio is derived from cache counters"""
+
+        registry = metrics.Registry()
+        registry.inc(metrics.CACHE_REQUESTS_TOTAL, {'cache': 'c', 'result': 'hit'}, 3)
+        registry.inc(metrics.CACHE_REQUESTS_TOTAL, {'cache': 'c', 'result': 'miss'})
+
+        self.assertIn(f'{metrics.CACHE_HIT_RATIO}{{cache="c"}} 0.75', registry.render())
+
+
+class MetricsEndpointTests(TestCase):
+    """Testing the /metrics endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_request_is_recorded(self):
+        """Testing API requests show up in the scraped metrics"""
+
+        self.client.get(TAG_URL)
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        content = res.content.decode()
+        self.assertIn(
+            'recipe_api_http_requests_total{action="list",method="GET",status="200",view="TagViewSet"}',
+            content
+        )
+        self.assertIn('recipe_api_db_queries_total{action="list",view="TagViewSet"}', content)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.1'])
+    def test_remote_scrape_forbidden(self):
+        """Testing scrapes from other addresses are rejected"""
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
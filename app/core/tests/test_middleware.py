@@ -0,0 +1,57 @@
+from django.test import TestCase, RequestFactory, Client
+from django.http import HttpResponse
+from django.urls import reverse
+
+from core.middleware import WebOnlyMiddleware
+
+
+class WebOnlyMiddlewareTests(TestCase):
+    """Testing the path aware session/CSRF/auth middleware."""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.seen = []
+        self.middleware = WebOnlyMiddleware(self.get_response)
+
+    def get_response(self, request):
+        self.seen.append(request)
+        return HttpResponse()
+
+    def test_api_requests_skip_web_stack(self):
+        """Testing API requests get no session or user from middleware"""
+
+        self.middleware(self.factory.get('/api/recipe/tags/'))
+
+        request = self.seen[0]
+        self.assertFalse(hasattr(request, 'session'))
+        self.assertFalse(hasattr(request, 'user'))
+
+    def test_admin_requests_use_web_stack(self):
+        """Testing admin requests still get sessions and users"""
+
+        self.middleware(self.factory.get('/admin/'))
+
+        request = self.seen[0]
+        self.assertTrue(hasattr(request, 'session'))
+        self.assertTrue(hasattr(request, 'user'))
+
+    def test_admin_csrf_enforced(self):
+        """Testing CSRF checks still run for the admin"""
+
+        client = Client(enforce_csrf_checks=True)
+        res = client.post(reverse('admin:login'), {'username': 'a', 'password': 'b'})
+
+        self.assertEqual(res.status_code, 403)
+
+    def test_api_post_without_csrf(self):
+        """Testing API posts do not depend on CSRF cookies"""
+
+        client = Client(enforce_csrf_checks=True)
+        res = client.post(reverse('user:create'), {
+            'email': 'test@example.com',
+            'password': 'testpass123',
+            'name': 'Test Name'
+        })
+
+        self.assertEqual(res.status_code, 201)
+        self.assertNotIn('csrftoken', res.cookies)
@@ -0,0 +1,47 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from core.models import Recipe, Tag, RecipeTag
+
+from decimal import Decimal
+from io import StringIO
+
+
+class PartitionedRecipeTests(TestCase):
+    """Testing the user partitioned recipe tables."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='test@example.com', password='testpass')
+        self.recipe = Recipe.objects.create(user=self.user, title='T', time_minutes=5, price=Decimal('1.00'))
+        self.tag = Tag.objects.create(user=self.user, name='Tag')
+
+    def test_links_carry_owner(self):
+        """Testing links added through the relation get the owner's id"""
+
+        self.recipe.tags.add(self.tag)
+
+        self.assertEqual(RecipeTag.objects.get().user_id, self.user.pk)
+        self.assertEqual(list(self.tag.recipe.all()), [self.recipe])
+
+    def test_delete_cascades_to_links(self):
+        """Testing deleting a recipe or tag removes its links"""
+
+        self.recipe.tags.add(self.tag)
+        self.tag.delete()
+
+        self.assertFalse(RecipeTag.objects.exists())
+        self.assertTrue(Recipe.objects.filter(pk=self.recipe.pk).exists())
+
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Other'))
+        self.recipe.delete()
+
+        self.assertFalse(RecipeTag.objects.exists())
+
+    def test_api_queries_pruned(self):
+        """Testing every recipe API query scans a single partition"""
+
+        out = StringIO()
+        call_command('check_partition_pruning', stdout=out)
+
+        self.assertIn('one partition per table', out.getvalue())
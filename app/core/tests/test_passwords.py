@@ -0,0 +1,59 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import authenticate, get_user_model
+
+from core import passwords
+
+from unittest.mock import patch
+import time
+
+
+class PasswordHashingTests(TestCase):
+    """Testing pooled password hashing and rehash on login."""
+
+    def setUp(self):
+        self.email = 'test@example.com'
+        self.password = 'testpass123'
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1)
+    def test_login_with_hashing_pool(self):
+        """Testing users created and verified through the process pool"""
+
+        self.addCleanup(passwords.shutdown_pool)
+        get_user_model().objects.create_user(email=self.email, password=self.password)
+
+        self.assertIsNotNone(authenticate(username=self.email, password=self.password))
+        self.assertIsNone(authenticate(username=self.email, password='wrongpass'))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_QUEUE=0, PASSWORD_HASHING_TIMEOUT=0.2)
+    def test_slow_hash_times_out(self):
+        """Testing a hash running past the timeout fails with 503 and keeps its slot until done"""
+
+        self.addCleanup(passwords.shutdown_pool)
+
+        with self.assertRaises(passwords.PasswordHashingBusy):
+            passwords._run(time.sleep, 0.5)
+        with self.assertRaises(passwords.PasswordHashingBusy):
+            passwords._run(time.sleep, 0)
+
+        time.sleep(1.5)
+        self.assertIsNone(passwords._run(time.sleep, 0))
+
+    def test_rehash_on_login(self):
+        """Testing outdated hashes are upgraded on successful login"""
+
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=1000):
+            user = get_user_model().objects.create_user(email=self.email, password=self.password)
+        self.assertIn('$1000$', user.password)
+
+        authenticate(username=self.email, password=self.password)
+
+        user.refresh_from_db()
+        self.assertNotIn('$1000$', user.password)
+        self.assertTrue(user.check_password(self.password))
+
+    @patch('core.passwords.make_password', wraps=passwords.make_password)
+    def test_unknown_user_still_hashes(self, patched_make_password):
+        """Testing unknown emails cost as much as wrong passwords"""
+
+        self.assertIsNone(authenticate(username='nobody@example.com', password=self.password))
+        patched_make_password.assert_called_once_with(self.password)
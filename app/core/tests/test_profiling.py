@@ -0,0 +1,76 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from rest_framework.test import APIClient
+
+from core import profiling
+
+from io import StringIO
+import os
+import shutil
+import tempfile
+
+TAG_URL = reverse('recipe:tag-list')
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """Testing on-demand request profiling."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass'
+        )
+        self.client.force_authenticate(self.user)
+
+    def profiles(self):
+        return list(profiling.load_profiles(self.directory))
+
+    def test_signed_header_profiles_request(self):
+        """Testing a signed header captures a profile with queries"""
+
+        with override_settings(PROFILING_ENABLED=True, PROFILING_DIR=self.directory):
+            self.client.get(TAG_URL, HTTP_X_PROFILE=profiling.issue_token())
+
+        profiles = self.profiles()
+        self.assertEqual(len(profiles), 1)
+        self.assertEqual(profiles[0]['group'], 'tag')
+        self.assertEqual(profiles[0]['view'], 'TagViewSet')
+        self.assertTrue(profiles[0]['queries'])
+        self.assertTrue(profiles[0]['top_functions'])
+        self.assertIsNotNone(profiles[0]['call_tree'])
+
+    def test_invalid_header_ignored(self):
+        """Testing a forged header does not trigger profiling"""
+
+        with override_settings(PROFILING_ENABLED=True, PROFILING_DIR=self.directory):
+            self.client.get(TAG_URL, HTTP_X_PROFILE='profile:forged')
+
+        self.assertEqual(self.profiles(), [])
+
+    def test_sample_rate_and_rotation(self):
+        """Testing sampled profiles are rotated to the configured maximum"""
+
+        with override_settings(PROFILING_ENABLED=True, PROFILING_DIR=self.directory,
+                               PROFILING_SAMPLE_RATE=1.0, PROFILING_MAX_FILES=2):
+            for _ in range(3):
+                self.client.get(TAG_URL)
+
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_summarize_command(self):
+        """Testing the summary groups profiles by endpoint"""
+
+        with override_settings(PROFILING_ENABLED=True, PROFILING_DIR=self.directory,
+                               PROFILING_SAMPLE_RATE=1.0):
+            self.client.get(TAG_URL)
+
+        out = StringIO()
+        call_command('summarize_profiles', dir=self.directory, stdout=out)
+
+        self.assertIn('tag: TagViewSet.list', out.getvalue())
@@ -0,0 +1,94 @@
+from django.test import TestCase, RequestFactory, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from core import checks, routers
+from core.middleware import DatabaseRoutingMiddleware
+from core.models import Recipe
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaRouterTests(TestCase):
+    """Testing read replica routing."""
+
+    def setUp(self):
+        cache.clear()
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass'
+        )
+
+    def read_alias(self):
+        return self.router.db_for_read(Recipe)
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_without_replicas(self):
+        """Testing reads use the primary when no replica is configured"""
+
+        self.assertEqual(self.read_alias(), 'default')
+
+    def test_reads_and_writes(self):
+        """Testing reads go to replicas and writes to the primary"""
+
+        self.assertEqual(self.read_alias(), 'replica1')
+        self.assertEqual(self.router.db_for_write(Recipe), 'default')
+
+    def test_writing_request_reads_primary(self):
+        """Testing reads inside a writing request use the primary"""
+
+        token = routers.start_request(self.factory.post('/api/recipe/recipes/'), pinned=True)
+        try:
+            self.assertEqual(self.read_alias(), 'default')
+        finally:
+            routers.finish_request(token)
+
+    def test_recent_writer_pinned(self):
+        """Testing a user's reads stick to the primary after a write"""
+
+        def view(request):
+            request.user = self.user
+            return HttpResponse()
+
+        middleware = DatabaseRoutingMiddleware(view)
+        middleware(self.factory.post('/api/recipe/recipes/'))
+
+        request = self.factory.get('/api/recipe/recipes/')
+        token = routers.start_request(request, pinned=False)
+        try:
+            self.assertEqual(self.read_alias(), 'replica1')
+            request.user = self.user
+            self.assertEqual(self.read_alias(), 'default')
+        finally:
+            routers.finish_request(token)
+
+    def test_other_users_read_replica(self):
+        """Testing pins only affect the user who wrote"""
+
+        routers.pin_user(self.user.pk)
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='testpass'
+        )
+
+        request = self.factory.get('/api/recipe/recipes/')
+        request.user = other_user
+        token = routers.start_request(request, pinned=False)
+        try:
+            self.assertEqual(self.read_alias(), 'replica1')
+        finally:
+            routers.finish_request(token)
+
+    def test_pins_need_shared_cache(self):
+        """Testing replicas with a per process cache fail the system checks"""
+
+        errors = checks.check_replica_pin_cache(None)
+        self.assertEqual([error.id for error in errors], ['core.E001'])
+
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(checks.check_replica_pin_cache(None), [])
+        with override_settings(REPLICA_DATABASES=[]):
+            self.assertEqual(checks.check_replica_pin_cache(None), [])
@@ -0,0 +1,170 @@
+from django.test import TestCase, override_settings
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import routers, sharding
+from core.models import Recipe, Tag, ShardAssignment
+
+from decimal import Decimal
+from io import StringIO
+import unittest
+
+RECIPES_URL = reverse('recipe:recipe-list')
+SHARDS = ['default', 'shard1']
+
+
+def create_user(email='test@example.com'):
+    return get_user_model().objects.create_user(email=email, password='testpass')
+
+
+class ShardRouterTests(TestCase):
+    """Testing user shard routing."""
+
+    databases = set(settings.SHARD_DATABASES)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.router = routers.ShardRouter()
+        self.user = create_user()
+        ShardAssignment.objects.update_or_create(user=self.user, defaults={'alias': 'shard1'})
+
+    @override_settings(SHARDING_ENABLED=False)
+    def test_disabled_without_shards(self):
+        """Testing the router stays out of the way without shards"""
+
+        self.assertIsNone(self.router.db_for_write(Recipe, instance=Recipe(user_id=self.user.pk)))
+
+    @override_settings(SHARDING_ENABLED=True, SHARD_DATABASES=SHARDS)
+    def test_instance_routed_to_owner_shard(self):
+        """Testing rows are written to their owner's shard"""
+
+        self.assertEqual(self.router.db_for_write(Recipe, instance=Recipe(user_id=self.user.pk)), 'shard1')
+        self.assertIsNone(self.router.db_for_write(get_user_model(), instance=self.user))
+
+    @override_settings(SHARDING_ENABLED=True, SHARD_DATABASES=SHARDS)
+    def test_queries_routed_by_current_user(self):
+        """Testing queries without an instance use the current user's shard"""
+
+        # new users are placed by id, an odd one would be mirrored to shard1 which only exists in settings here
+        with override_settings(SHARDING_ENABLED=False):
+            other_user = create_user(email='other@example.com')
+
+        with routers.user_shard(self.user.pk):
+            self.assertEqual(self.router.db_for_read(Tag), 'shard1')
+            self.assertEqual(self.router.db_for_read(Recipe.tags.through), 'shard1')
+        with routers.user_shard(other_user.pk):
+            self.assertEqual(self.router.db_for_read(Tag), 'default')
+
+    def test_writes_refused_while_moving(self):
+        """Testing writes get 503 while the user's data moves"""
+
+        ShardAssignment.objects.filter(user=self.user).update(alias='default', moving=True)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with override_settings(SHARDING_ENABLED=True, SHARD_DATABASES=SHARDS):
+            res = client.post(RECIPES_URL, {'title': 'T', 'price': '1.00', 'time_minutes': 5})
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', res)
+
+
+class ShardIdRangeTests(TestCase):
+    """Testing every shard hands out ids of its own range."""
+
+    databases = set(settings.SHARD_DATABASES)
+
+    def test_sequences_in_alias_range(self):
+        """Testing the id sequences of the sharded tables are bounded by the alias's range"""
+
+        for index, alias in enumerate(settings.SHARD_DATABASES):
+            with connections[alias].cursor() as cursor:
+                cursor.execute(
+                    "SELECT min_value, max_value FROM pg_sequences "
+                    "WHERE sequencename IN ('core_recipe_id_seq', 'core_recipe_tags_id_seq')"
+                )
+                bounds = cursor.fetchall()
+            first = index * settings.SHARD_ID_RANGE + 1
+            self.assertEqual(bounds, [(first, first + settings.SHARD_ID_RANGE - 1)] * 2)
+
+
+@unittest.skipUnless('shard1' in settings.DATABASES, 'needs DB_SHARD_HOSTS')
+class MoveUserShardTests(TestCase):
+    """Testing moving a user's data between shards."""
+
+    databases = set(settings.SHARD_DATABASES)
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = create_user()
+        ShardAssignment.objects.update_or_create(user=self.user, defaults={'alias': 'default'})
+        get_user_model().objects.using('shard1').filter(pk=self.user.pk).delete()
+
+    def test_move_user(self):
+        """Testing recipes, tags and links end up on the target shard only"""
+
+        with routers.user_shard(self.user.pk):
+            recipe = Recipe.objects.create(
+                user=self.user, title='T', time_minutes=5, price=Decimal('1.00'))
+            recipe.tags.add(Tag.objects.create(user=self.user, name='Tag'))
+
+        call_command('move_user_shard', self.user.pk, 'shard1', settle=0, stdout=StringIO())
+
+        self.assertEqual(ShardAssignment.objects.get(user=self.user).alias, 'shard1')
+        self.assertFalse(Recipe.objects.using('default').filter(user=self.user).exists())
+        moved = Recipe.objects.using('shard1').get(pk=recipe.pk)
+        self.assertEqual([t.name for t in moved.tags.all()], ['Tag'])
+
+    def test_move_onto_shard_with_rows(self):
+        """Testing a user moves onto a shard already holding other users' rows"""
+
+        other_user = create_user(email='other@example.com')
+        ShardAssignment.objects.update_or_create(user=other_user, defaults={'alias': 'shard1'})
+        sharding.mirror_user(other_user, 'shard1')
+        sharding.forget(other_user.pk)
+        for user in [self.user, other_user]:
+            with routers.user_shard(user.pk):
+                recipe = Recipe.objects.create(user=user, title=user.email, time_minutes=5, price=Decimal('1.00'))
+                recipe.tags.add(Tag.objects.create(user=user, name=user.email))
+
+        call_command('move_user_shard', self.user.pk, 'shard1', settle=0, stdout=StringIO())
+
+        recipes = Recipe.objects.using('shard1').order_by('title')
+        self.assertEqual([r.title for r in recipes], ['other@example.com', 'test@example.com'])
+        self.assertEqual([[t.name for t in r.tags.all()] for r in recipes],
+                         [['other@example.com'], ['test@example.com']])
+        with routers.user_shard(self.user.pk):
+            recipe = Recipe.objects.create(user=self.user, title='New', time_minutes=5, price=Decimal('1.00'))
+        self.assertGreater(recipe.pk, settings.SHARD_ID_RANGE)
+
+
+@unittest.skipUnless('shard1' in settings.DATABASES, 'needs DB_SHARD_HOSTS')
+class DeleteShardedUserTests(TestCase):
+    """Testing deleting a user whose data lives on a shard."""
+
+    databases = set(settings.SHARD_DATABASES)
+
+    def test_delete_user(self):
+        """Testing a plain user delete removes the user's rows on their shard"""
+
+        user = create_user()
+        ShardAssignment.objects.update_or_create(user=user, defaults={'alias': 'shard1'})
+        sharding.mirror_user(user, 'shard1')
+        sharding.forget(user.pk)
+        with routers.user_shard(user.pk):
+            Recipe.objects.create(user=user, title='T', time_minutes=5, price=Decimal('1.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.delete()
+
+        self.assertFalse(get_user_model().objects.using('shard1').filter(email='test@example.com').exists())
+        self.assertFalse(Recipe.objects.using('shard1').filter(title='T').exists())
@@ -0,0 +1,175 @@
+"""
+Tests for the background task queue.
+"""
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+
+import datetime
+import threading
+import time
+
+calls = []
+calls_lock = threading.Lock()
+
+
+@tasks.task(name='tests.record')
+def record(value):
+    with calls_lock:
+        calls.append(value)
+
+
+@tasks.task(name='tests.explode', max_attempts=2)
+def explode():
+    raise ValueError('boom')
+
+
+@override_settings(TASK_LEASE_SECONDS=300, TASK_RETRY_BASE_SECONDS=10, TASK_RETRY_MAX_SECONDS=60)
+class TaskQueueTests(TestCase):
+    """Test queueing, claiming and running tasks"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_run(self):
+        """Testing a queued task is claimed, run and deleted"""
+
+        queued = tasks.enqueue(record, value=3)
+
+        claimed = tasks.claim()
+        self.assertEqual([task.pk for task in claimed], [queued.pk])
+        self.assertEqual(claimed[0].status, Task.RUNNING)
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertEqual(claimed[0].kwargs, {'value': 3})
+        self.assertEqual(tasks.claim(), [])
+
+        self.assertIsNone(tasks.run_task(claimed[0]))
+        self.assertEqual(calls, [3])
+        self.assertFalse(Task.objects.exists())
+
+    def test_claims_due_tasks_in_order(self):
+        """Testing tasks are claimed oldest first and not before they are due"""
+
+        later = tasks.enqueue(record, run_at=timezone.now() + datetime.timedelta(minutes=1), value=1)
+        first = tasks.enqueue(record, value=2)
+        second = tasks.enqueue(record, value=3)
+
+        self.assertEqual([task.pk for task in tasks.claim(limit=5)], [first.pk, second.pk])
+        Task.objects.filter(pk=later.pk).update(run_at=timezone.now())
+        self.assertEqual([task.pk for task in tasks.claim(limit=5)], [later.pk])
+
+    def test_failed_task_retried_with_backoff(self):
+        """Testing a failing task is queued again after a growing delay"""
+
+        queued = tasks.enqueue(explode)
+
+        error = tasks.run_task(tasks.claim()[0])
+
+        self.assertIn('ValueError: boom', error)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.QUEUED)
+        self.assertIn('boom', queued.last_error)
+        delay = (queued.run_at - timezone.now()).total_seconds()
+        self.assertTrue(4 < delay <= 10)
+        self.assertEqual(tasks.claim(), [])
+
+    def test_retry_delay(self):
+        """Testing the retry delay doubles up to the maximum"""
+
+        self.assertTrue(5 <= tasks.retry_delay(1) <= 10)
+        self.assertTrue(20 <= tasks.retry_delay(3) <= 40)
+        self.assertTrue(30 <= tasks.retry_delay(10) <= 60)
+
+    def test_task_failed_after_max_attempts(self):
+        """Testing a task is left failed once out of attempts"""
+
+        queued = tasks.enqueue(explode)
+        self.assertEqual(queued.max_attempts, 2)
+
+        tasks.run_task(tasks.claim()[0])
+        Task.objects.filter(pk=queued.pk).update(run_at=timezone.now())
+        tasks.run_task(tasks.claim()[0])
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.FAILED)
+        self.assertEqual(queued.attempts, 2)
+        self.assertIsNotNone(queued.finished_at)
+        self.assertEqual(tasks.claim(), [])
+
+    def test_unknown_task_fails(self):
+        """Testing a task nobody registered fails"""
+
+        Task.objects.create(name='tests.missing', max_attempts=1)
+
+        error = tasks.run_task(tasks.claim()[0])
+
+        self.assertIn('No task is registered as tests.missing', error)
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    def test_expired_lease_claimed_again(self):
+        """Testing a task whose worker stopped is taken over, and the stale worker cannot finish it"""
+
+        queued = tasks.enqueue(record, value=1)
+        stale = tasks.claim()[0]
+        Task.objects.filter(pk=queued.pk).update(run_at=timezone.now() - datetime.timedelta(seconds=1))
+
+        claimed = tasks.claim()
+        self.assertEqual([task.pk for task in claimed], [queued.pk])
+        self.assertEqual(claimed[0].attempts, 2)
+
+        tasks.run_task(stale)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Task.RUNNING)
+        tasks.run_task(claimed[0])
+        self.assertFalse(Task.objects.exists())
+
+    def test_run_workers_burst(self):
+        """Testing a burst worker runs every due task and exits"""
+
+        for value in range(3):
+            tasks.enqueue(record, value=value)
+        reports = []
+
+        tasks.run_workers(burst=True, report=lambda task, error: reports.append(error))
+
+        self.assertEqual(calls, [0, 1, 2])
+        self.assertEqual(reports, [None] * 3)
+
+
+@tasks.task(name='tests.outlive_lease')
+def outlive_lease():
+    time.sleep(0.5)
+    # another worker looking for due tasks
+    record([task.pk for task in tasks.claim()])
+
+
+class ParallelWorkerTests(TransactionTestCase):
+    """Test workers sharing the queue"""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_parallel_workers_run_each_task_once(self):
+        """Testing concurrent workers never run a task twice"""
+
+        for value in range(40):
+            tasks.enqueue(record, value=value)
+
+        tasks.run_workers(concurrency=4, burst=True)
+
+        self.assertEqual(sorted(calls), list(range(40)))
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(TASK_LEASE_SECONDS=0.2)
+    def test_lease_renewed_while_running(self):
+        """Testing a task running longer than its lease is not claimed again"""
+
+        tasks.enqueue(outlive_lease)
+
+        tasks.run_workers(burst=True)
+
+        self.assertEqual(calls, [[]])
+        self.assertFalse(Task.objects.exists())
@@ -0,0 +1,142 @@
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import ratelimit
+
+from unittest.mock import patch
+import multiprocessing
+import time
+
+TOKEN_URL = reverse('user:token')
+TAG_URL = reverse('recipe:tag-list')
+
+RATES = {
+    'read': '2/min',
+    'write': '100/min',
+    'upload': '1/min',
+    'login': '2/min',
+}
+
+
+class SharedTokenBucketTests(SimpleTestCase):
+    """Testing the shared memory token bucket."""
+
+    def setUp(self):
+        self.buckets = ratelimit.SharedTokenBucket(slots=64, stripes=4)
+
+    def test_capacity_and_refill(self):
+        """Testing buckets empty at capacity and refill over time"""
+
+        self.assertEqual(self.buckets.consume('k', 2, 1.0, now=100.0), 0)
+        self.assertEqual(self.buckets.consume('k', 2, 1.0, now=100.0), 0)
+        self.assertAlmostEqual(self.buckets.consume('k', 2, 1.0, now=100.0), 1.0)
+        self.assertEqual(self.buckets.consume('k', 2, 1.0, now=101.0), 0)
+
+    def test_keys_are_independent(self):
+        """Testing one key does not drain another"""
+
+        self.buckets.consume('a', 1, 1.0, now=0.0)
+
+        self.assertGreater(self.buckets.consume('a', 1, 1.0, now=0.0), 0)
+        self.assertEqual(self.buckets.consume('b', 1, 1.0, now=0.0), 0)
+
+    @patch('core.ratelimit.LOCK_TIMEOUT', 0.05)
+    def test_stripe_of_killed_worker_recovered(self):
+        """Testing stripes left locked by a worker that died are taken back"""
+
+        def die_holding_stripes(buckets):
+            for stripe in range(len(buckets._locks)):
+                buckets._acquire(stripe)
+
+        worker = multiprocessing.get_context('fork').Process(target=die_holding_stripes, args=(self.buckets,))
+        worker.start()
+        worker.join()
+
+        for key in ['a', 'b', 'c', 'd']:
+            self.assertEqual(self.buckets.consume(key, 1, 1.0, now=0.0), 0)
+        start = time.perf_counter()
+        self.buckets.consume('a', 1, 1.0, now=0.0)
+        self.assertLess(time.perf_counter() - start, 0.05)
+
+    @patch('core.ratelimit.LOCK_TIMEOUT', 0.05)
+    def test_stripe_of_slow_worker_kept(self):
+        """Testing stripes held by a live worker are not broken, the check fails open"""
+
+        context = multiprocessing.get_context('fork')
+        held, done = context.Event(), context.Event()
+
+        def hold_stripes(buckets):
+            for stripe in range(len(buckets._locks)):
+                buckets._acquire(stripe)
+            held.set()
+            done.wait(10)
+
+        worker = context.Process(target=hold_stripes, args=(self.buckets,))
+        worker.start()
+        self.addCleanup(worker.join)
+        self.addCleanup(done.set)
+        held.wait(10)
+
+        for _ in range(3):
+            self.assertEqual(self.buckets.consume('a', 1, 1.0, now=0.0), 0)
+        self.assertFalse(any(lock.acquire(block=False) for lock in self.buckets._locks))
+
+    def test_check_cost(self):
+        """Testing a limit check costs well under a millisecond"""
+
+        start = time.perf_counter()
+        for i in range(1000):
+            self.buckets.consume(f'user:{i % 50}', 100, 10.0)
+
+        self.assertLess((time.perf_counter() - start) / 1000, 0.0005)
+
+
+@override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': RATES})
+class ThrottleApiTests(TestCase):
+    """Testing throttled API endpoints."""
+
+    def setUp(self):
+        ratelimit.buckets.reset()
+        self.addCleanup(ratelimit.buckets.reset)
+        self.client = APIClient()
+
+    def test_login_throttled_with_retry_after(self):
+        """Testing login attempts per client address are limited"""
+
+        payload = {'email': 'test@example.com', 'password': 'wrongpass'}
+        for _ in range(2):
+            res = self.client.post(TOKEN_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+
+    def test_reads_limited_per_user(self):
+        """Testing read limits apply per authenticated user"""
+
+        user = get_user_model().objects.create_user(email='test@example.com', password='testpass')
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='testpass')
+
+        self.client.force_authenticate(user)
+        for _ in range(2):
+            self.assertEqual(self.client.get(TAG_URL).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(TAG_URL).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        self.client.force_authenticate(other_user)
+        self.assertEqual(self.client.get(TAG_URL).status_code, status.HTTP_200_OK)
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_throttling_disabled(self):
+        """Testing the switch turns throttling off"""
+
+        payload = {'email': 'test@example.com', 'password': 'wrongpass'}
+        for _ in range(3):
+            res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from core import ratelimit
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """Convert '100/min' into (capacity, tokens per second)."""
+
+    num, period = rate.split('/')
+    try:
+        seconds = PERIODS[period[0]]
+    except (IndexError, KeyError):
+        raise ImproperlyConfigured(f'Invalid throttle rate {rate!r}')
+    return int(num), int(num) / seconds
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttle each user (or client address) per scope with a token bucket.
+
+    The scope is `view.throttle_scope`, an entry of `view.throttle_scopes`
+    for the current action, or 'read'/'write' depending on the method. Rates
+    come from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'].
+    """
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        scope = getattr(view, 'throttle_scopes', {}).get(getattr(view, 'action', None))
+        if scope:
+            return scope
+        return 'read' if request.method in SAFE_METHODS else 'write'
+
+    def get_cache_key(self, request, view, scope):
+        user = request.user
+        if user and user.is_authenticated:
+            return f'{scope}:user:{user.pk}'
+        return f'{scope}:ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        if not settings.THROTTLE_ENABLED:
+            return True
+
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+
+        capacity, per_second = parse_rate(rate)
+        self.wait_seconds = ratelimit.buckets.consume(
+            self.get_cache_key(request, view, scope),
+            capacity,
+            per_second
+        )
+        return self.wait_seconds == 0
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from core import metrics
+
+
+def metrics_view(request):
+    """Expose the merged worker metrics for local scraping."""
+
+    allowed_ips = settings.METRICS_ALLOWED_IPS
+    if allowed_ips and request.META.get('REMOTE_ADDR') not in allowed_ips:
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        metrics.registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,133 @@
+"""
+Changes feed of a user's recipes, tags and ingredients.
+
+Rows are read in (timestamp, source, id) order, where the timestamp is
+updated_at or a tombstone's deleted_at, and the cursor is the key of the
+last row returned. Every source is read with a keyset query on its
+(user, timestamp, id) index so a sync costs as much as the delta.
+"""
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import Q, prefetch_related_objects
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+
+from core.models import Recipe, Tag, Ingredient, Tombstone
+from recipe import serializers
+
+import base64
+import binascii
+import datetime
+
+SOURCES = {
+    'ingredient': (Ingredient, 'updated_at'),
+    'recipe': (Recipe, 'updated_at'),
+    'tag': (Tag, 'updated_at'),
+    'tombstone': (Tombstone, 'deleted_at'),
+}
+# sorts after every source, a cursor at (horizon, HORIZON, 0) has seen it all
+HORIZON = '~'
+
+
+class CursorExpired(exceptions.APIException):
+    status_code = 410
+    default_detail = _('The cursor is older than the deletion history, sync from scratch.')
+    default_code = 'cursor_expired'
+
+
+def encode_cursor(key):
+    timestamp, source, pk = key
+    raw = f'{timestamp.isoformat()}|{source}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (timestamp, source, id) key of a cursor."""
+
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, source, pk = raw.split('|')
+        timestamp, pk = parse_datetime(timestamp), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        timestamp = None
+    if timestamp is None or (source not in SOURCES and source != HORIZON):
+        raise exceptions.ValidationError({'since': _('Invalid cursor.')})
+    return timestamp, source, pk
+
+
+def _after(queryset, field, source, key):
+    """Filter queryset to the rows of source that sort after key."""
+
+    if key is None:
+        return queryset
+    timestamp, key_source, pk = key
+    if source > key_source:
+        return queryset.filter(**{f'{field}__gte': timestamp})
+    if source < key_source:
+        return queryset.filter(**{f'{field}__gt': timestamp})
+    return queryset.filter(Q(**{f'{field}__gt': timestamp}) | Q(**{field: timestamp, 'id__gt': pk}))
+
+
+def read_changes(user, key, limit):
+    """Return up to limit (key, row) pairs after key, the next key and whether more rows wait."""
+
+    horizon = timezone.now() - datetime.timedelta(seconds=settings.CHANGES_SETTLE_SECONDS)
+    if key is not None and key[0] < horizon - datetime.timedelta(days=settings.TOMBSTONE_RETENTION_DAYS):
+        raise CursorExpired()
+
+    rows = []
+    for source, (model, field) in SOURCES.items():
+        queryset = model.objects.filter(user=user, **{f'{field}__lte': horizon})
+        queryset = _after(queryset, field, source, key).order_by(field, 'id')[:limit + 1]
+        rows.extend(((getattr(row, field), source, row.id), row) for row in queryset)
+
+    rows.sort(key=lambda item: item[0])
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1][0], True
+    return rows, (horizon, HORIZON, 0), False
+
+
+def serialize_changes(rows, context):
+    """Render (key, row) pairs as change entries in feed order."""
+
+    by_source = {source: [] for source in SOURCES}
+    for (_timestamp, source, _pk), row in rows:
+        by_source[source].append(row)
+
+    prefetch_related_objects(by_source['recipe'], 'tags', 'ingredients')
+
+    rendered = {}
+    for source, serializer_class in [
+        ('recipe', serializers.RecipeDetailSerializer),
+        ('tag', serializers.TagSerializer),
+        ('ingredient', serializers.IngredientSerializer),
+    ]:
+        data = serializer_class(by_source[source], many=True, context=context).data
+        for row, row_data in zip(by_source[source], data):
+            rendered[(source, row.id)] = row_data
+
+    changes = []
+    for (_timestamp, source, pk), row in rows:
+        if source == 'tombstone':
+            changes.append({'type': row.kind, 'id': row.object_id, 'deleted': True})
+        else:
+            changes.append({'type': source, 'id': pk, 'deleted': False, 'data': rendered[(source, pk)]})
+    return changes
+
+
+def delete_with_tombstone(instance):
+    """Delete a recipe, tag or ingredient and record it for the feed."""
+
+    using = router.db_for_write(type(instance), instance=instance)
+    with transaction.atomic(using=using):
+        Tombstone.objects.using(using).create(
+            user_id=instance.user_id,
+            kind=instance._meta.model_name,
+            object_id=instance.pk,
+        )
+        instance.delete(using=using)
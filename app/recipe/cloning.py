@@ -0,0 +1,58 @@
+"""
+Copy recipes inside the database.
+
+The recipe row and its tag and ingredient links are copied with INSERT ...
+SELECT. The copies keep the image path, the uploaded file is shared rather
+than duplicated, which is safe since files are never deleted and a new
+upload gets a new name. The statements bypass the model signals, so the
+statistics and similar recipes are updated here.
+"""
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from core.models import Recipe, RecipeTag
+from recipe import stats, similarity
+
+# copied as they are, besides user_id which is a constant for partition pruning
+COPIED_COLUMNS = [
+    'title', 'description', 'time_minutes', 'price', 'link', 'image', 'tag_summary', 'ingredient_summary',
+]
+LINK_TABLES = [('core_recipe_tags', 'tag_id'), ('core_recipe_ingredients', 'ingredient_id')]
+
+
+def clone_recipe(recipe, count=1):
+    """Create count copies of recipe with its links, returning their ids."""
+
+    user_id = recipe.user_id
+    using = router.db_for_write(Recipe, instance=recipe)
+    columns = ', '.join(COPIED_COLUMNS)
+
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO core_recipe (user_id, updated_at, {columns}) '
+            f'SELECT user_id, %s, {columns} FROM core_recipe, generate_series(1, %s) '
+            'WHERE user_id = %s AND id = %s RETURNING id',
+            [timezone.now(), count, user_id, recipe.pk]
+        )
+        clone_ids = sorted(row[0] for row in cursor.fetchall())
+        if not clone_ids:
+            return []
+
+        for table, column in LINK_TABLES:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, recipe_id, {column}) '
+                f'SELECT link.user_id, clone.id, link.{column} FROM {table} link, unnest(%s::bigint[]) AS clone (id) '
+                'WHERE link.user_id = %s AND link.recipe_id = %s',
+                [clone_ids, user_id, recipe.pk]
+            )
+
+        tag_ids = RecipeTag.objects.using(using).filter(user_id=user_id, recipe_id=recipe.pk).values_list(
+            'tag_id', flat=True)
+        stats.apply(user_id, stats.merge(
+            *[stats.recipe_contributions(recipe.price, recipe.time_minutes)] * count,
+            stats.tag_contributions({tag_id: count for tag_id in tag_ids}),
+        ), using=using)
+        similarity.refresh(user_id, clone_ids, using=using)
+
+    return clone_ids
@@ -0,0 +1,34 @@
+"""
+Django command to compare recipe summaries with the recipe links.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import summaries
+
+import itertools
+
+
+class Command(BaseCommand):
+    """Django command to check the denormalized recipe summaries"""
+
+    help = 'Report recipes whose tag or ingredient summaries disagree with their links.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Recompute the stale summaries.')
+
+    def handle(self, *args, **options):
+        stale_count = 0
+        for alias in settings.SHARD_DATABASES:
+            stale = summaries.stale_recipes(alias)
+            stale_count += len(stale)
+            for user_id, rows in itertools.groupby(stale, key=lambda row: row[0]):
+                recipe_ids = [recipe_id for _, recipe_id in rows]
+                self.stdout.write(f'{alias}: user {user_id} recipes {recipe_ids}')
+                if options['fix']:
+                    summaries.refresh_recipes(user_id, recipe_ids, using=alias)
+
+        if stale_count and not options['fix']:
+            raise CommandError(f'{stale_count} recipes have stale summaries, run with --fix.')
+        self.stdout.write(self.style.SUCCESS(f'{stale_count} stale recipe summaries{" fixed" if stale_count else ""}.'))
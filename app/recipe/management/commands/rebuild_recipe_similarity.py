@@ -0,0 +1,32 @@
+"""
+Django command to recompute the stored similar recipes.
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import Recipe
+from recipe import similarity
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the similar recipes of every user"""
+
+    help = 'Recompute RecipeSimilarity from the tags and ingredients of the recipes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only rebuild this user.')
+
+    def handle(self, *args, **options):
+        users = 0
+        for alias in settings.SHARD_DATABASES:
+            user_ids = Recipe.objects.using(alias).order_by('user_id').values_list('user_id', flat=True).distinct()
+            if options['user'] is not None:
+                user_ids = user_ids.filter(user_id=options['user'])
+            for user_id in user_ids:
+                # one transaction per user keeps the locks short
+                with transaction.atomic(using=alias):
+                    similarity.rebuild(user_id, using=alias)
+                users += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt similar recipes of {users} users.'))
@@ -0,0 +1,106 @@
+"""
+Keyset pagination of recipe lists.
+"""
+
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework import exceptions
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+import base64
+import binascii
+import json
+
+
+class KeysetPagination(BasePagination):
+    """Paginate by the (ordering field, id) of the last row instead of an offset.
+
+    Pagination is opt-in: lists are only paginated when `limit` or `cursor`
+    is given. The view's get_ordering() returns the (field, id) ordering,
+    which the cursor remembers so it cannot be replayed under another one.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 50
+    max_page_size = 200
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            raise exceptions.ValidationError({self.page_size_query_param: _('Expected an integer.')})
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, cursor, ordering):
+        try:
+            position = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            cursor_ordering, value, pk = position['o'], position['v'], int(position['id'])
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            cursor_ordering = None
+        if cursor_ordering != list(ordering):
+            raise exceptions.ValidationError({self.cursor_query_param: _('Invalid cursor.')})
+        return value, pk
+
+    def encode_cursor(self, ordering, row):
+        field = ordering[0].lstrip('-')
+        position = {'o': list(ordering), 'v': str(getattr(row, field)), 'id': row.pk}
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        ordering = view.get_ordering()
+        page_size = self.get_page_size(request)
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode_cursor(cursor, ordering)
+            field, descending = ordering[0].lstrip('-'), ordering[0].startswith('-')
+            after = 'lt' if descending else 'gt'
+            if field == 'id':
+                queryset = queryset.filter(**{f'id__{after}': pk})
+            else:
+                queryset = queryset.filter(Q(**{f'{field}__{after}': value}) | Q(**{field: value, f'id__{after}': pk}))
+
+        rows = list(queryset[:page_size + 1])
+        self.next_url = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            url = request.build_absolute_uri()
+            self.next_url = replace_query_param(url, self.cursor_query_param, self.encode_cursor(ordering, rows[-1]))
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.next_url, 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Cursor of the next page, as returned in `next`.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Paginate with this many recipes per page, at most {self.max_page_size}.',
+                'schema': {'type': 'integer'},
+            },
+        ]
@@ -0,0 +1,72 @@
+"""
+Pantry matching: rank a user's recipes by the share of their ingredients owned.
+
+The index of a user maps every ingredient id to the ids of the recipes using
+it, plus the number of ingredients of every recipe. It is built with one query
+on the link table and cached under a version read from the links, so every
+worker sees a change as soon as it is committed, whatever the cache backend.
+Scoring only walks the posting lists of the owned ingredients.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from core import metrics
+from core.models import RecipeIngredient
+
+from collections import Counter
+
+
+def _cache_key(user_id, version):
+    return f'pantry-index:{user_id}:{version[0]}:{version[1]}'
+
+
+def index_version(user_id):
+    """Return (link count, last link id) of a user.
+
+    Link ids only grow, so adding a link changes the last id and removing
+    links alone lowers the count.
+    """
+
+    links = RecipeIngredient.objects.filter(user_id=user_id).aggregate(count=Count('id'), last=Max('id'))
+    return links['count'], links['last']
+
+
+def build_index(user_id):
+    """Return ({ingredient id: recipe ids}, {recipe id: ingredient count}) of a user."""
+
+    postings, sizes = {}, Counter()
+    links = RecipeIngredient.objects.filter(user_id=user_id).values_list('ingredient_id', 'recipe_id')
+    for ingredient_id, recipe_id in links.iterator():
+        postings.setdefault(ingredient_id, []).append(recipe_id)
+        sizes[recipe_id] += 1
+    return postings, dict(sizes)
+
+
+def get_index(user_id):
+    """Return the cached index of a user, building it on a miss."""
+
+    key = _cache_key(user_id, index_version(user_id))
+    index = cache.get(key)
+    metrics.record_cache('pantry_index', index is not None)
+    if index is None:
+        index = build_index(user_id)
+        cache.set(key, index, settings.PANTRY_INDEX_CACHE_TIMEOUT)
+    return index
+
+
+def rank(user_id, ingredient_ids, limit):
+    """Return up to limit (recipe id, matched, total) by coverage, fully covered recipes first."""
+
+    postings, sizes = get_index(user_id)
+    matched = Counter()
+    for ingredient_id in set(ingredient_ids):
+        matched.update(postings.get(ingredient_id, ()))
+
+    ranked = sorted(
+        matched.items(),
+        key=lambda item: (item[1] == sizes[item[0]], item[1] / sizes[item[0]], item[1], item[0]),
+        reverse=True
+    )
+    return [(recipe_id, count, sizes[recipe_id]) for recipe_id, count in ranked[:limit]]
@@ -1,3 +1,5 @@
+from django.db import router, transaction
+
 from rest_framework import serializers
 from core.models import Recipe, Tag, Ingredient
 
@@ -28,21 +30,25 @@ class RecipeSerializer(serializers.ModelSerializer):
 
     def _get_or_create_tags(self, tags, recipe):
         auth_user = self.context['request'].user
+        tag_objs = []
         for tag in tags:
             tag_obj, _ = Tag.objects.get_or_create(
                 user=auth_user,
                 **tag
             )
-            recipe.tags.add(tag_obj)
+            tag_objs.append(tag_obj)
+        recipe.tags.add(*tag_objs)
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         auth_user = self.context['request'].user
+        ing_objs = []
         for ingredient in ingredients:
             ing_obj, _ = Ingredient.objects.get_or_create(
                 user=auth_user,
                 **ingredient
             )
-            recipe.ingredients.add(ing_obj)
+            ing_objs.append(ing_obj)
+        recipe.ingredients.add(*ing_objs)
 
     class Meta:
         model = Recipe
@@ -56,9 +62,11 @@ class RecipeSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
 
-        recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(tags, recipe)
-        self._get_or_create_ingredients(ingredients, recipe)
+        recipe = Recipe(**validated_data)
+        with transaction.atomic(using=router.db_for_write(Recipe, instance=recipe)):
+            recipe.save()
+            self._get_or_create_tags(tags, recipe)
+            self._get_or_create_ingredients(ingredients, recipe)
 
         return recipe
 
@@ -66,21 +74,35 @@ class RecipeSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
 
-        if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+        with transaction.atomic(using=router.db_for_write(Recipe, instance=instance)):
+            if tags is not None:
+                instance.tags.clear()
+                self._get_or_create_tags(tags, instance)
+
+            if ingredients is not None:
+                instance.ingredients.clear()
+                self._get_or_create_ingredients(ingredients, instance)
 
-        if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
 
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
+            instance.save()
 
-        instance.save()
         return instance
 
 
+class RecipeListSerializer(serializers.ModelSerializer):
+    """Serializer for recipe lists reading the denormalized summaries"""
+
+    tags = serializers.JSONField(source='tag_summary', read_only=True)
+    ingredients = serializers.JSONField(source='ingredient_summary', read_only=True)
+
+    class Meta:
+        model = Recipe
+        fields = RecipeSerializer.Meta.fields
+        read_only_fields = fields
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for Recipe Detail"""
 
@@ -0,0 +1,51 @@
+"""
+Shopping list of a meal plan, aggregated in one query.
+"""
+
+from django.db import connections, router
+
+from core.models import Recipe
+
+from decimal import Decimal
+
+SHOPPING_LIST_SQL = (
+    'WITH plan AS (SELECT * FROM unnest(%s::bigint[], %s::numeric[]) AS plan (recipe_id, servings)), '
+    'recipes AS ('
+    'SELECT core_recipe.id, core_recipe.price, core_recipe.time_minutes, plan.servings '
+    'FROM core_recipe JOIN plan ON plan.recipe_id = core_recipe.id WHERE core_recipe.user_id = %s), '
+    'items AS ('
+    'SELECT item.id, item.name, array_agg(recipes.id ORDER BY recipes.id) AS recipe_ids, '
+    'sum(recipes.servings) AS servings FROM recipes '
+    'JOIN core_recipe_ingredients link ON link.user_id = %s AND link.recipe_id = recipes.id '
+    'JOIN core_ingredient item ON item.id = link.ingredient_id AND item.user_id = %s '
+    'GROUP BY item.id, item.name) '
+    'SELECT totals.recipe_ids, totals.price, totals.time_minutes, '
+    'items.id, items.name, items.recipe_ids, items.servings '
+    'FROM (SELECT array_agg(id ORDER BY id) AS recipe_ids, round(sum(price * servings), 2) AS price, '
+    'sum(time_minutes) AS time_minutes FROM recipes) totals '
+    'LEFT JOIN items ON true ORDER BY items.name, items.id'
+)
+
+
+def shopping_list(user_id, servings):
+    """Return the ingredients, cost and time of a plan of {recipe id: servings}.
+
+    The price of a recipe is multiplied by its servings, its time is not.
+    """
+
+    using = router.db_for_read(Recipe, instance=Recipe(user_id=user_id))
+    with connections[using].cursor() as cursor:
+        cursor.execute(SHOPPING_LIST_SQL, [list(servings), list(servings.values()), user_id, user_id, user_id])
+        rows = cursor.fetchall()
+
+    recipe_ids, price, time_minutes = rows[0][:3]
+    return {
+        'recipes': recipe_ids or [],
+        # rounded by the database, whose numeric has no precision limit unlike quantize()
+        'total_price': str(price if price is not None else Decimal('0.00')),
+        'total_time_minutes': time_minutes or 0,
+        'ingredients': [
+            {'id': item_id, 'name': name, 'recipes': item_recipe_ids, 'servings': str(servings)}
+            for *_, item_id, name, item_recipe_ids, servings in rows if item_id is not None
+        ],
+    }
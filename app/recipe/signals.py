@@ -0,0 +1,147 @@
+from django.db.models.signals import m2m_changed, post_init, pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from core.models import Recipe, RecipeTag, RecipeIngredient, RecipeSimilarity, Tag, Ingredient, UserRecipeStat
+from recipe import summaries, stats, similarity
+
+
+@receiver(m2m_changed, sender=RecipeTag)
+@receiver(m2m_changed, sender=RecipeIngredient)
+def refresh_link_summaries(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """Recompute recipe summaries after links were added or removed."""
+
+    if action == 'pre_clear' and reverse:
+        # the cleared recipes are unknown afterwards
+        instance._cleared_recipe_ids = summaries.linked_recipe_ids(instance)
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'post_clear':
+        recipe_ids = instance.__dict__.pop('_cleared_recipe_ids', [])
+    else:
+        recipe_ids = pk_set
+    summaries.refresh_recipes(instance.user_id, recipe_ids, using=using)
+
+
+@receiver(post_init, sender=Recipe)
+def remember_recipe_values(sender, instance, **kwargs):
+    """Keep the values the statistics hold for this recipe."""
+
+    instance._stats_values = (instance.__dict__.get('price'), instance.__dict__.get('time_minutes'))
+
+
+@receiver(pre_save, sender=Recipe)
+def load_recipe_values(sender, instance, raw, using, **kwargs):
+    """Load the stored values of recipes fetched without them."""
+
+    if raw or instance._state.adding or None not in instance._stats_values:
+        return
+    instance._stats_values = Recipe.objects.using(using).filter(
+        pk=instance.pk, user_id=instance.user_id
+    ).values_list('price', 'time_minutes').first() or (None, None)
+
+
+@receiver(post_save, sender=Recipe)
+def count_saved_recipe(sender, instance, created, raw, using, **kwargs):
+    """Move the recipe's contribution to its new values."""
+
+    if raw:
+        return
+    contributions = stats.recipe_contributions(instance.price, instance.time_minutes)
+    if not created and None not in instance._stats_values:
+        contributions = stats.merge(contributions, stats.recipe_contributions(*instance._stats_values, sign=-1))
+    stats.apply(instance.user_id, contributions, using=using)
+    instance._stats_values = (instance.price, instance.time_minutes)
+
+
+@receiver(pre_delete, sender=Recipe)
+def uncount_deleted_recipe(sender, instance, using, **kwargs):
+    """Remove the recipe and its tag links from the statistics."""
+
+    values = instance._stats_values
+    if None in values:
+        values = (instance.price, instance.time_minutes)
+    tag_ids = RecipeTag.objects.using(using).filter(
+        user_id=instance.user_id, recipe_id=instance.pk
+    ).values_list('tag_id', flat=True)
+    contributions = stats.merge(
+        stats.recipe_contributions(*values, sign=-1),
+        stats.tag_contributions({tag_id: -1 for tag_id in tag_ids}),
+    )
+    stats.apply(instance.user_id, contributions, using=using, insert=False)
+
+
+@receiver(m2m_changed, sender=RecipeTag)
+def count_tag_links(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """Count recipes per tag as links are added and removed."""
+
+    if action in ('pre_remove', 'pre_clear'):
+        # remember which links really exist, remove() is given any ids
+        links = RecipeTag.objects.using(using).filter(user_id=instance.user_id)
+        links = links.filter(tag_id=instance.pk) if reverse else links.filter(recipe_id=instance.pk)
+        if pk_set is not None:
+            links = links.filter(**{'recipe_id__in' if reverse else 'tag_id__in': pk_set})
+        instance._removed_link_ids = set(links.values_list('recipe_id' if reverse else 'tag_id', flat=True))
+        return
+
+    if action == 'post_add':
+        ids, sign = pk_set, 1
+    elif action in ('post_remove', 'post_clear'):
+        ids, sign = instance.__dict__.pop('_removed_link_ids', set()), -1
+    else:
+        return
+
+    tag_counts = {instance.pk: sign * len(ids)} if reverse else {tag_id: sign for tag_id in ids}
+    stats.apply(instance.user_id, stats.tag_contributions(tag_counts), using=using, insert=sign > 0)
+
+
+@receiver(post_delete, sender=Tag)
+def forget_deleted_tag(sender, instance, using, **kwargs):
+    """Drop the statistics of a deleted tag, its links cascaded in the database."""
+
+    UserRecipeStat.objects.using(using).filter(user_id=instance.user_id, key=f'tag:{instance.pk}').delete()
+
+
+@receiver(m2m_changed, sender=RecipeTag)
+@receiver(m2m_changed, sender=RecipeIngredient)
+def refresh_similar_recipes(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """Rank similar recipes again after links were added or removed."""
+
+    if action == 'pre_clear' and reverse:
+        instance._cleared_similar_ids = summaries.linked_recipe_ids(instance)
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'post_clear':
+        recipe_ids = instance.__dict__.pop('_cleared_similar_ids', [])
+    else:
+        recipe_ids = pk_set
+    similarity.schedule(instance.user_id, recipe_ids, using=using)
+
+
+@receiver(pre_delete, sender=Recipe)
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_similar_recipes(sender, instance, using, **kwargs):
+    """Keep the recipes whose similar recipes change with the deleted row."""
+
+    if sender is Recipe:
+        instance._similar_ids = set(RecipeSimilarity.objects.using(using).filter(
+            user_id=instance.user_id, similar_id=instance.pk
+        ).values_list('recipe_id', flat=True))
+    else:
+        instance._similar_ids = set(summaries.linked_recipe_ids(instance))
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def refresh_similar_after_delete(sender, instance, using, **kwargs):
+    """Rank similar recipes again once the links of the deleted row cascaded."""
+
+    recipe_ids = instance.__dict__.pop('_similar_ids', set())
+    similarity.schedule(instance.user_id, recipe_ids, using=using, rebuild_only=sender is Recipe)
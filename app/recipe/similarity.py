@@ -0,0 +1,174 @@
+"""
+Similar recipes of a user, ranked by weighted Jaccard over tags and ingredients.
+
+A recipe is a set of features, its tags and ingredients, each weighted by
+FEATURE_WEIGHTS. The similarity of two recipes is the weight of the features
+they share over the weight of the features either has. The best
+settings.SIMILAR_RECIPES of every recipe are kept in RecipeSimilarity, scored
+in batches by one SQL statement over the user's partitions of the link
+tables, and refreshed by recipe.signals once the transaction changing the
+links commits.
+
+A feature of more than settings.SIMILAR_FEATURE_MAX_RECIPES recipes still
+counts in their totals but is not matched, it says little about similarity
+and would pair every one of its recipes with every other.
+"""
+
+from django.conf import settings
+from django.db import connections, router, transaction
+
+from core.models import Recipe, RecipeSimilarity
+
+import threading
+
+FEATURE_WEIGHTS = [
+    ('core_recipe_tags', 'tag_id', 1.0),
+    ('core_recipe_ingredients', 'ingredient_id', 2.0),
+]
+
+
+def _features(where):
+    return ' UNION ALL '.join(
+        f'SELECT recipe_id, {kind} AS kind, {column} AS feature, {weight}::float AS weight '
+        f'FROM {table} WHERE user_id = %(user_id)s' + where.format(kind=kind, column=column)
+        for kind, (table, column, weight) in enumerate(FEATURE_WEIGHTS)
+    )
+
+
+def scores_sql(restricted):
+    """SQL yielding (recipe_id, similar_id, score) for every pair sharing a feature.
+
+    The parameters are user_id, max_recipes and, when restricted to some
+    recipes, recipe_ids. Restricted, only the links of their features and
+    the links of the recipes scored are read.
+    """
+
+    if restricted:
+        own = _features(' AND recipe_id = ANY(%(recipe_ids)s)')
+        features = _features(' AND {column} IN (SELECT feature FROM own WHERE kind = {kind})')
+    else:
+        own = _features('')
+        features = 'SELECT * FROM own'
+    return (
+        f'WITH own AS MATERIALIZED ({own}), '
+        f'features AS MATERIALIZED ({features}), '
+        'matched AS (SELECT kind, feature FROM features GROUP BY kind, feature HAVING count(*) <= %(max_recipes)s), '
+        'shared AS ('
+        'SELECT a.recipe_id, b.recipe_id AS similar_id, sum(a.weight) AS shared FROM own a '
+        'JOIN matched ON matched.kind = a.kind AND matched.feature = a.feature '
+        'JOIN features b ON b.kind = a.kind AND b.feature = a.feature AND b.recipe_id <> a.recipe_id '
+        'GROUP BY a.recipe_id, b.recipe_id), '
+        'scored AS (SELECT recipe_id FROM own UNION SELECT similar_id FROM shared), '
+        'totals AS (SELECT recipe_id, sum(weight) AS total FROM ('
+        + _features(' AND recipe_id IN (SELECT recipe_id FROM scored)') +
+        ') links GROUP BY recipe_id) '
+        'SELECT shared.recipe_id, shared.similar_id, shared.shared / (a.total + b.total - shared.shared) AS score '
+        'FROM shared JOIN totals a ON a.recipe_id = shared.recipe_id JOIN totals b ON b.recipe_id = shared.similar_id'
+    )
+
+
+def scores_params(user_id, recipe_ids=None):
+    params = {'user_id': user_id, 'max_recipes': settings.SIMILAR_FEATURE_MAX_RECIPES}
+    if recipe_ids is not None:
+        params['recipe_ids'] = list(recipe_ids)
+    return params
+
+
+def _using(user_id, using):
+    return using or router.db_for_write(RecipeSimilarity, instance=RecipeSimilarity(user_id=user_id))
+
+
+def rebuild(user_id, recipe_ids=None, using=None):
+    """Replace the stored similar recipes of some recipes of a user, or all of them."""
+
+    using = _using(user_id, using)
+    restricted = recipe_ids is not None
+    ids = [list(recipe_ids)] if restricted else []
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'DELETE FROM core_recipesimilarity WHERE user_id = %s' + (' AND recipe_id = ANY(%s)' if restricted else ''),
+            [user_id] + ids
+        )
+        cursor.execute(
+            'INSERT INTO core_recipesimilarity (user_id, recipe_id, similar_id, score) '
+            'SELECT %(user_id)s, recipe_id, similar_id, score FROM ('
+            'SELECT *, row_number() OVER (PARTITION BY recipe_id ORDER BY score DESC, similar_id DESC) AS rank '
+            f'FROM ({scores_sql(restricted)}) scores) ranked WHERE rank <= %(limit)s',
+            {**scores_params(user_id, recipe_ids), 'limit': settings.SIMILAR_RECIPES}
+        )
+
+
+def refresh(user_id, recipe_ids, using=None):
+    """Update the stored similar recipes after the features of some recipes changed.
+
+    Besides the changed recipes only the recipes listing one of them, or
+    whose list one of them now enters, are ranked again.
+    """
+
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    using = _using(user_id, using)
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'SELECT DISTINCT recipe_id FROM core_recipesimilarity WHERE user_id = %s AND similar_id = ANY(%s)',
+            [user_id, list(recipe_ids)]
+        )
+        affected = recipe_ids | {row[0] for row in cursor.fetchall()}
+
+        cursor.execute(scores_sql(True), scores_params(user_id, recipe_ids))
+        # the scores are symmetric, so these are also the new scores of the candidates
+        scores = {}
+        for _recipe_id, similar_id, score in cursor.fetchall():
+            scores[similar_id] = max(score, scores.get(similar_id, 0))
+
+        cursor.execute(
+            'SELECT recipe_id, count(*), min(score) FROM core_recipesimilarity '
+            'WHERE user_id = %s AND recipe_id = ANY(%s) GROUP BY recipe_id',
+            [user_id, list(scores)]
+        )
+        thresholds = {recipe_id: (count, lowest) for recipe_id, count, lowest in cursor.fetchall()}
+
+    for recipe_id, score in scores.items():
+        count, lowest = thresholds.get(recipe_id, (0, 0))
+        if count < settings.SIMILAR_RECIPES or score >= lowest:
+            affected.add(recipe_id)
+    rebuild(user_id, affected, using=using)
+
+
+_pending = threading.local()
+
+
+def schedule(user_id, recipe_ids, using=None, rebuild_only=False):
+    """Refresh the similar recipes of some recipes once the current transaction commits.
+
+    The recipes changed by one transaction are refreshed together, so a
+    recipe saved with new tags and ingredients is ranked once. With
+    rebuild_only they are ranked again without looking for new candidates,
+    which is what the recipes listing a deleted recipe need.
+    """
+
+    using = _using(user_id, using)
+    pending = _pending.__dict__.setdefault(using, {})
+    changed, listing = pending.setdefault(user_id, (set(), set()))
+    (listing if rebuild_only else changed).update(recipe_ids)
+    transaction.on_commit(lambda: _run_scheduled(user_id, using), using=using)
+
+
+def _run_scheduled(user_id, using):
+    # the first callback of the transaction takes every recipe, the others find none
+    changed, listing = _pending.__dict__.get(using, {}).pop(user_id, (set(), set()))
+    if listing - changed:
+        rebuild(user_id, listing - changed, using=using)
+    if changed:
+        refresh(user_id, changed, using=using)
+
+
+def similar_recipes(recipe, limit):
+    """Return up to limit (recipe, score) most similar to recipe."""
+
+    rows = RecipeSimilarity.objects.filter(user_id=recipe.user_id, recipe_id=recipe.pk)
+    rows = list(rows.order_by('-score', '-similar_id').values_list('similar_id', 'score')[:limit])
+    by_id = Recipe.objects.filter(user_id=recipe.user_id).in_bulk([similar_id for similar_id, _ in rows])
+    return [(by_id[similar_id], score) for similar_id, score in rows if similar_id in by_id]
@@ -0,0 +1,164 @@
+"""
+Per-user recipe statistics kept in UserRecipeStat.
+
+Every recipe contributes to a handful of (count, total) rows:
+
+- `price` and `time_minutes`: one recipe and its value, for averages
+- `price:<bucket>` and `time_minutes:<bucket>`: one recipe, for distributions
+- `tag:<id>`: one recipe per tag link
+
+recipe.signals applies the difference of every change with an upsert, and
+`manage.py rebuild_recipe_stats` recomputes the rows from scratch.
+"""
+
+from django.db import connections, router, transaction
+from django.db.models import Count, Sum
+
+from core.models import Recipe, RecipeTag, Tag, UserRecipeStat
+
+from bisect import bisect_right
+from decimal import Decimal
+
+# lower bounds of the buckets, the last bucket is open ended
+BUCKETS = {
+    'price': [Decimal('0'), Decimal('5'), Decimal('10'), Decimal('20'), Decimal('50')],
+    'time_minutes': [0, 15, 30, 60, 120],
+}
+
+
+def bucket(field, value):
+    return max(bisect_right(BUCKETS[field], value) - 1, 0)
+
+
+def recipe_contributions(price, time_minutes, sign=1):
+    """Return {key: (count, total)} contributed by a recipe with these values."""
+
+    contributions = {}
+    for field, value in [('price', Decimal(str(price))), ('time_minutes', int(time_minutes))]:
+        contributions[field] = (sign, sign * Decimal(value))
+        contributions[f'{field}:{bucket(field, value)}'] = (sign, Decimal(0))
+    return contributions
+
+
+def tag_contributions(tag_counts):
+    """Return {key: (count, total)} for recipe counts per tag id."""
+
+    return {f'tag:{tag_id}': (count, Decimal(0)) for tag_id, count in tag_counts.items() if count}
+
+
+def lock_user(user_id, using):
+    """Serialize changes to the user's statistics until the transaction ends."""
+
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', [user_id])
+
+
+def apply(user_id, contributions, using=None, insert=True):
+    """Add contributions to the user's statistics in one statement.
+
+    With insert=False missing rows are left alone instead of being created,
+    which is what removals want. The user's lock is held until the enclosing
+    transaction ends, so a rebuild of the user waits for it.
+    """
+
+    contributions = {key: value for key, value in contributions.items() if value[0] or value[1]}
+    if not contributions:
+        return
+    using = using or router.db_for_write(UserRecipeStat, instance=UserRecipeStat(user_id=user_id))
+    params = []
+    for key, (count, total) in contributions.items():
+        params += [key, count, total]
+    values = ', '.join(['(%s, %s::bigint, %s::numeric)'] * len(contributions))
+
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        lock_user(user_id, using)
+        if insert:
+            cursor.execute(
+                'INSERT INTO core_userrecipestat (user_id, key, count, total) '
+                f'SELECT %s, key, count, total FROM (VALUES {values}) AS delta (key, count, total) '
+                'ON CONFLICT (user_id, key) DO UPDATE SET '
+                'count = core_userrecipestat.count + EXCLUDED.count, '
+                'total = core_userrecipestat.total + EXCLUDED.total',
+                [user_id] + params
+            )
+        else:
+            cursor.execute(
+                'UPDATE core_userrecipestat SET '
+                'count = core_userrecipestat.count + delta.count, '
+                'total = core_userrecipestat.total + delta.total '
+                f'FROM (VALUES {values}) AS delta (key, count, total) '
+                'WHERE core_userrecipestat.user_id = %s AND core_userrecipestat.key = delta.key',
+                params + [user_id]
+            )
+
+
+def merge(*contributions):
+    """Sum several {key: (count, total)} mappings."""
+
+    merged = {}
+    for contribution in contributions:
+        for key, (count, total) in contribution.items():
+            old_count, old_total = merged.get(key, (0, Decimal(0)))
+            merged[key] = (old_count + count, old_total + total)
+    return merged
+
+
+def compute(using, user_id=None):
+    """Recompute {user_id: {key: (count, total)}} from the recipes."""
+
+    recipes = Recipe.objects.using(using)
+    links = RecipeTag.objects.using(using)
+    if user_id is not None:
+        recipes, links = recipes.filter(user_id=user_id), links.filter(user_id=user_id)
+
+    stats = {}
+    for row in recipes.values('user_id').annotate(count=Count('id'), price=Sum('price'), time=Sum('time_minutes')):
+        stats[row['user_id']] = {
+            'price': (row['count'], row['price']),
+            'time_minutes': (row['count'], Decimal(row['time'])),
+        }
+    for field in BUCKETS:
+        for row in recipes.values('user_id', field).annotate(count=Count('id')):
+            key = f'{field}:{bucket(field, row[field])}'
+            count, _ = stats[row['user_id']].get(key, (0, 0))
+            stats[row['user_id']][key] = (count + row['count'], Decimal(0))
+    for row in links.values('user_id', 'tag_id').annotate(count=Count('id')):
+        stats.setdefault(row['user_id'], {})[f'tag:{row["tag_id"]}'] = (row['count'], Decimal(0))
+    return stats
+
+
+def summary(user):
+    """Return the statistics of a user for the stats endpoint."""
+
+    stats = {
+        key: (count, total)
+        for key, count, total in UserRecipeStat.objects.filter(user=user).values_list('key', 'count', 'total')
+    }
+    recipes, price_total = stats.get('price', (0, Decimal(0)))
+    _, time_total = stats.get('time_minutes', (0, Decimal(0)))
+
+    tag_counts = {int(key[4:]): count for key, (count, _) in stats.items() if key.startswith('tag:')}
+    tags = Tag.objects.filter(user=user, id__in=[tag_id for tag_id, count in tag_counts.items() if count > 0])
+
+    def distribution(field):
+        bounds = BUCKETS[field]
+        return [
+            {
+                'min': low,
+                'max': bounds[index + 1] if index + 1 < len(bounds) else None,
+                'recipes': stats.get(f'{field}:{index}', (0, 0))[0],
+            }
+            for index, low in enumerate(bounds)
+        ]
+
+    return {
+        'recipes': recipes,
+        'average_price': str((price_total / recipes).quantize(Decimal('0.01'))) if recipes else None,
+        'average_time_minutes': float(time_total / recipes) if recipes else None,
+        'tags': sorted(
+            ({'id': tag.id, 'name': tag.name, 'recipes': tag_counts[tag.id]} for tag in tags),
+            key=lambda tag: (-tag['recipes'], tag['name'])
+        ),
+        'price_buckets': distribution('price'),
+        'time_minutes_buckets': distribution('time_minutes'),
+    }
@@ -0,0 +1,65 @@
+"""
+Denormalized tag and ingredient summaries on Recipe.
+
+Recipe.tag_summary and Recipe.ingredient_summary hold the [{id, name}] of a
+recipe's links ordered by id, so recipe lists render from core_recipe alone.
+They are recomputed in SQL whenever the links change through the relation
+managers (see recipe.signals) and when the tag and ingredient viewsets
+rename or delete an item.
+"""
+
+from django.db import connections, router
+from django.utils import timezone
+
+from core.models import Recipe
+
+SUMMARIES = [
+    ('tag_summary', 'core_recipe_tags', 'tag_id', 'core_tag'),
+    ('ingredient_summary', 'core_recipe_ingredients', 'ingredient_id', 'core_ingredient'),
+]
+
+
+def summary_sql(link_table, column, target_table, user='core_recipe.user_id'):
+    """SQL computing the summary of the core_recipe row in scope.
+
+    Pass user='%s' to filter the links by a constant user id, which unlike
+    the correlated column lets Postgres prune the link table partitions.
+    """
+
+    return (
+        "COALESCE((SELECT jsonb_agg(jsonb_build_object('id', item.id, 'name', item.name) ORDER BY item.id) "
+        f'FROM {link_table} link JOIN {target_table} item ON item.id = link.{column} '
+        f'WHERE link.user_id = {user} AND link.recipe_id = core_recipe.id), '
+        "'[]'::jsonb)"
+    )
+
+
+def linked_recipe_ids(item):
+    """Ids of the recipes linked to a tag or ingredient."""
+
+    links = item.recipe_links.filter(user_id=item.user_id)
+    return list(links.values_list('recipe_id', flat=True))
+
+
+def refresh_recipes(user_id, recipe_ids, using=None):
+    """Recompute the summaries of some recipes of a user."""
+
+    if not recipe_ids:
+        return 0
+    using = using or router.db_for_write(Recipe, instance=Recipe(user_id=user_id))
+    assignments = ', '.join(f'{field} = {summary_sql(*source, user="%s")}' for field, *source in SUMMARIES)
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f'UPDATE core_recipe SET {assignments}, updated_at = %s WHERE user_id = %s AND id = ANY(%s)',
+            [user_id] * len(SUMMARIES) + [timezone.now(), user_id, list(recipe_ids)]
+        )
+        return cursor.rowcount
+
+
+def stale_recipes(using):
+    """(user_id, id) of every recipe whose stored summaries differ from its links."""
+
+    where = ' OR '.join(f'{field} IS DISTINCT FROM {summary_sql(*source)}' for field, *source in SUMMARIES)
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'SELECT user_id, id FROM core_recipe WHERE {where} ORDER BY user_id, id')
+        return cursor.fetchall()
@@ -0,0 +1,144 @@
+"""
+Tests for the async views of the ASGI deployment.
+"""
+
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, TransactionTestCase, override_settings
+from django.urls import resolve, reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from core import metrics, profiling
+from core.models import Recipe, Tag
+from user import tokens
+
+from decimal import Decimal
+
+import asyncio
+import shutil
+import tempfile
+
+QUERIES_SAMPLE = 'recipe_api_db_queries_total{action="%s",view="%s"}'
+
+
+def queries_recorded(view='TagViewSet', action='list'):
+    for line in metrics.registry.render().splitlines():
+        if line.startswith(QUERIES_SAMPLE % (action, view) + ' '):
+            return float(line.split()[-1])
+    return 0
+
+
+@override_settings(ROOT_URLCONF='app.urls_async')
+class AsyncRecipeApiTests(TransactionTestCase):
+    """Testing the API served by async views"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='test@example.com', password='testpass')
+        self.other = get_user_model().objects.create_user(email='other@example.com', password='testpass')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=20, price=Decimal('4.50'))
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Dinner'))
+        Recipe.objects.create(user=self.other, title='Stew', time_minutes=60, price=Decimal('8.00'))
+
+        self.headers = {'authorization': f'Bearer {tokens.issue_access_token(self.user)}'}
+        self.client = AsyncClient()
+        self.sync_client = APIClient()
+        self.sync_client.credentials(HTTP_AUTHORIZATION=self.headers['authorization'])
+
+    def test_views_are_async(self):
+        """Testing every view is a coroutine, included and admin views too"""
+
+        for url in [reverse('recipe:recipe-list'), reverse('recipe:recipe-detail', args=[1]),
+                    reverse('recipe:tag-list'), reverse('recipe:stats'), reverse('user:token'),
+                    reverse('api-schema'), reverse('admin:index'), reverse('metrics')]:
+            self.assertTrue(iscoroutinefunction(resolve(url).func), url)
+
+    async def test_list_and_detail_match_sync_views(self):
+        """Testing the async views return what the sync views do"""
+
+        for url in [reverse('recipe:recipe-list'), reverse('recipe:recipe-detail', args=[self.recipe.id]),
+                    reverse('recipe:tag-list'), reverse('recipe:ingredient-list')]:
+            res = await self.client.get(url, **self.headers)
+            with override_settings(ROOT_URLCONF='app.urls'):
+                expected = await sync_to_async(self.sync_client.get)(url)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.json(), expected.json())
+
+    async def test_other_users_recipe_not_found(self):
+        """Testing the async detail view is limited to the user's recipes"""
+
+        other_recipe = await sync_to_async(lambda: Recipe.objects.get(user=self.other).id)()
+
+        res = await self.client.get(reverse('recipe:recipe-detail', args=[other_recipe]), **self.headers)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_auth_required(self):
+        """Testing the async views authenticate"""
+
+        res = await self.client.get(reverse('recipe:recipe-list'))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_write_through_async_view(self):
+        """Testing the other methods of the async URLs still work"""
+
+        res = await self.client.post(
+            reverse('recipe:recipe-list'),
+            {'title': 'Salad', 'description': 'Green', 'time_minutes': 5, 'price': '3.00'},
+            content_type='application/json',
+            **self.headers
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.json()['title'], 'Salad')
+
+    async def test_concurrent_requests(self):
+        """Testing concurrent requests are served side by side"""
+
+        url = reverse('recipe:recipe-list')
+        responses = await asyncio.gather(*[self.client.get(url, **self.headers) for _ in range(10)])
+
+        self.assertEqual({res.status_code for res in responses}, {status.HTTP_200_OK})
+        self.assertEqual({len(res.json()) for res in responses}, {1})
+
+    async def test_queries_counted_in_pool(self):
+        """Testing the metrics count the queries run in the pool threads"""
+
+        before = queries_recorded()
+
+        await self.client.get(reverse('recipe:tag-list'), **self.headers)
+
+        self.assertGreater(queries_recorded(), before)
+
+    async def test_token_in_pool(self):
+        """Testing logins are served from the pool and their queries counted"""
+
+        before = queries_recorded('CreateTokenView', 'post')
+
+        res = await self.client.post(
+            reverse('user:token'), {'email': 'test@example.com', 'password': 'testpass'},
+            content_type='application/json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertGreater(queries_recorded('CreateTokenView', 'post'), before)
+
+    async def test_profiled_in_pool(self):
+        """Testing profiles of async views cover the work run in the pool"""
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        with override_settings(PROFILING_ENABLED=True, PROFILING_DIR=directory):
+            await AsyncClient().get(reverse('recipe:tag-list'), x_profile=profiling.issue_token(), **self.headers)
+
+        profiles = list(profiling.load_profiles(directory))
+        self.assertEqual(len(profiles), 1)
+        self.assertEqual(profiles[0]['view'], 'TagViewSet')
+        self.assertTrue(profiles[0]['queries'])
+        self.assertIsNotNone(profiles[0]['call_tree'])
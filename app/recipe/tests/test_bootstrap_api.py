@@ -0,0 +1,91 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Tag, Ingredient, Recipe
+
+from decimal import Decimal
+
+BOOTSTRAP_URL = reverse('recipe:bootstrap')
+
+
+def create_user(email='test@example.com', password='testpass'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password=password
+    )
+
+
+def create_sample_recipe(user, **params):
+    """Create and return sample recipe"""
+
+    defaults = {
+        'title': 'Sample Title',
+        'description': 'Sample Description',
+        'price': Decimal('10.12'),
+        'time_minutes': 22,
+    }
+
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PrivateBootstrapApiTest(TestCase):
+    """Testing the bootstrap api."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_matches_list_endpoints(self):
+        """Testing bootstrap returns what the three list endpoints return"""
+
+        tag = Tag.objects.create(user=self.user, name='Tag')
+        Ingredient.objects.create(user=self.user, name='Salt')
+        for title in ['Recipe 1', 'Recipe 2']:
+            create_sample_recipe(self.user, title=title).tags.add(tag)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(BOOTSTRAP_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for name in ['recipes', 'tags', 'ingredients']:
+            self.assertEqual(res.data[name], self.client.get(reverse(f'recipe:{name[:-1]}-list')).data)
+
+    def test_filters_applied(self):
+        """Testing the list filters apply to the bootstrap lists"""
+
+        tag = Tag.objects.create(user=self.user, name='Tag')
+        Tag.objects.create(user=self.user, name='Unused')
+        recipe = create_sample_recipe(self.user)
+        recipe.tags.add(tag)
+        create_sample_recipe(self.user, title='Untagged')
+
+        res = self.client.get(BOOTSTRAP_URL, {'tags': tag.id, 'assigned_only': 1})
+
+        self.assertEqual([r['id'] for r in res.data['recipes']], [recipe.id])
+        self.assertEqual([t['name'] for t in res.data['tags']], ['Tag'])
+        self.assertEqual(res.data['ingredients'], [])
+
+    def test_ids_and_pagination_applied(self):
+        """Testing the list level ids and pagination parameters apply to the bootstrap recipes"""
+
+        recipes = [create_sample_recipe(self.user, title=f'Recipe {i}') for i in range(3)]
+        recipes_url = reverse('recipe:recipe-list')
+
+        params = {'ids': f'{recipes[2].id},{recipes[0].id}'}
+        res = self.client.get(BOOTSTRAP_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipes'], self.client.get(recipes_url, params).data)
+
+        res = self.client.get(BOOTSTRAP_URL, {'limit': 2})
+        self.assertEqual([r['id'] for r in res.data['recipes']['results']], [recipes[2].id, recipes[1].id])
+        res = self.client.get(res.data['recipes']['next'])
+        self.assertEqual([r['id'] for r in res.data['recipes']['results']], [recipes[0].id])
+
+        res = self.client.get(BOOTSTRAP_URL, {'ids': ','.join(str(i) for i in range(1, 102))})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
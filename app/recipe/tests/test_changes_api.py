@@ -0,0 +1,137 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Tag, Ingredient, Recipe, Tombstone
+from recipe import changes
+
+from decimal import Decimal
+from io import StringIO
+import datetime
+
+CHANGES_URL = reverse('recipe:changes')
+
+
+def create_user(email='test@example.com', password='testpass'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password=password
+    )
+
+
+def create_sample_recipe(user, **params):
+    """Create and return sample recipe"""
+
+    defaults = {
+        'title': 'Sample Title',
+        'description': 'Sample Description',
+        'price': Decimal('10.12'),
+        'time_minutes': 22,
+    }
+
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PublicChangesApiTest(TestCase):
+    """Testing unauthenticated changes api"""
+
+    def test_auth_required(self):
+        """Testing the changes feed requires authentication"""
+
+        res = APIClient().get(CHANGES_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(CHANGES_SETTLE_SECONDS=0)
+class PrivateChangesApiTest(TestCase):
+    """Testing the authenticated changes feed."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, cursor=None):
+        res = self.client.get(CHANGES_URL, {'since': cursor} if cursor else {})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_full_sync(self):
+        """Testing the first sync returns everything of the user in order"""
+
+        tag = Tag.objects.create(user=self.user, name='Tag')
+        recipe = create_sample_recipe(self.user)
+        recipe.tags.add(tag)
+        create_sample_recipe(create_user(email='other@example.com'))
+
+        data = self.sync()
+
+        self.assertEqual([(c['type'], c['id']) for c in data['changes']], [('tag', tag.id), ('recipe', recipe.id)])
+        self.assertEqual(data['changes'][1]['data']['tags'], [{'id': tag.id, 'name': 'Tag'}])
+        self.assertFalse(data['more'])
+
+    def test_incremental_sync(self):
+        """Testing a cursor returns only later changes including deletes"""
+
+        tag = Tag.objects.create(user=self.user, name='Tag')
+        recipe = create_sample_recipe(self.user)
+        cursor = self.sync()['cursor']
+
+        self.assertEqual(self.sync(cursor)['changes'], [])
+
+        recipe.title = 'Changed'
+        recipe.save()
+        self.client.delete(reverse('recipe:tag-detail', args=[tag.id]))
+        data = self.sync(cursor)
+
+        self.assertEqual(
+            [(c['type'], c['id'], c['deleted']) for c in data['changes']],
+            [('recipe', recipe.id, False), ('tag', tag.id, True)]
+        )
+        self.assertEqual(data['changes'][0]['data']['title'], 'Changed')
+        self.assertTrue(Tombstone.objects.filter(kind='tag', object_id=tag.id).exists())
+
+    @override_settings(CHANGES_PAGE_SIZE=2)
+    def test_paginated(self):
+        """Testing pages continue where the last one stopped"""
+
+        created = [Ingredient.objects.create(user=self.user, name=f'Ing {i}').id for i in range(5)]
+
+        seen, cursor, more = [], None, True
+        while more:
+            data = self.sync(cursor)
+            seen.extend(change['id'] for change in data['changes'])
+            cursor, more = data['cursor'], data['more']
+
+        self.assertEqual(seen, created)
+
+    def test_invalid_cursor(self):
+        """Testing a malformed cursor is rejected"""
+
+        res = self.client.get(CHANGES_URL, {'since': 'nonsense'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_expired_cursor(self):
+        """Testing cursors older than the tombstone retention must resync"""
+
+        old = timezone.now() - datetime.timedelta(days=365)
+        res = self.client.get(CHANGES_URL, {'since': changes.encode_cursor((old, 'tag', 1))})
+
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
+
+    def test_prune_tombstones(self):
+        """Testing old tombstones are pruned"""
+
+        Tombstone.objects.create(user=self.user, kind='tag', object_id=1)
+        Tombstone.objects.update(deleted_at=timezone.now() - datetime.timedelta(days=365))
+        Tombstone.objects.create(user=self.user, kind='tag', object_id=2)
+
+        call_command('prune_tombstones', stdout=StringIO())
+
+        self.assertEqual(list(Tombstone.objects.values_list('object_id', flat=True)), [2])
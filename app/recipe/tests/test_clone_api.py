@@ -0,0 +1,91 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Tag, Ingredient, Recipe, RecipeSimilarity, UserRecipeStat
+from recipe import stats
+
+from decimal import Decimal
+from io import StringIO
+
+
+def clone_url(recipe_id):
+    return reverse('recipe:recipe-clone', args=[recipe_id])
+
+
+def create_user(email='test@example.com', password='testpass'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password=password
+    )
+
+
+def create_sample_recipe(user, **params):
+    """Create and return sample recipe"""
+
+    defaults = {
+        'title': 'Sample Title',
+        'description': 'Sample Description',
+        'price': Decimal('10.12'),
+        'time_minutes': 22,
+        'image': 'uploads/recipe/shared.jpg',
+    }
+
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class PrivateCloneApiTest(TestCase):
+    """Testing the recipe clone api."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = create_sample_recipe(self.user)
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Dinner'))
+        self.recipe.ingredients.add(Ingredient.objects.create(user=self.user, name='Egg'))
+
+    def test_clone(self):
+        """Testing a clone copies the fields and links and shares the image"""
+
+        res = self.client.post(clone_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        clone = Recipe.objects.get(id=res.data['id'])
+        self.assertNotEqual(clone.id, self.recipe.id)
+        self.assertEqual(clone.image.name, self.recipe.image.name)
+        self.assertEqual(res.data['tags'], [{'id': t.id, 'name': t.name} for t in self.recipe.tags.all()])
+        self.recipe.refresh_from_db()
+        self.assertEqual(clone.ingredient_summary, self.recipe.ingredient_summary)
+        self.assertTrue(clone.ingredient_summary)
+        self.assertEqual(res.data['title'], self.recipe.title)
+
+    def test_bulk_clone_keeps_derived_data(self):
+        """Testing bulk clones update statistics and similar recipes"""
+
+        res = self.client.post(clone_url(self.recipe.id) + '?count=3')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 4)
+        stored = {row.key: (row.count, row.total) for row in UserRecipeStat.objects.filter(user=self.user)}
+        self.assertEqual(stored, stats.compute('default', self.user.pk)[self.user.pk])
+        incremental = sorted(RecipeSimilarity.objects.values_list('recipe_id', 'similar_id', 'score'))
+        call_command('rebuild_recipe_similarity', stdout=StringIO())
+        self.assertEqual(incremental, sorted(RecipeSimilarity.objects.values_list('recipe_id', 'similar_id', 'score')))
+
+    def test_clone_limits(self):
+        """Testing invalid counts and other users' recipes are rejected"""
+
+        other = create_sample_recipe(create_user(email='other@example.com'))
+
+        self.assertEqual(self.client.post(clone_url(other.id)).status_code, status.HTTP_404_NOT_FOUND)
+        for count in ['0', '51', 'x']:
+            res = self.client.post(clone_url(self.recipe.id) + f'?count={count}')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,94 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Ingredient, Recipe
+
+from decimal import Decimal
+
+PANTRY_URL = reverse('recipe:recipe-pantry')
+
+
+def create_user(email='test@example.com', password='testpass'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password=password
+    )
+
+
+def create_sample_recipe(user, ingredients, **params):
+    """Create and return sample recipe with the given ingredients"""
+
+    defaults = {
+        'title': 'Sample Title',
+        'description': 'Sample Description',
+        'price': Decimal('10.12'),
+        'time_minutes': 22,
+    }
+
+    defaults.update(params)
+    recipe = Recipe.objects.create(user=user, **defaults)
+    recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+class PrivatePantryApiTest(TestCase):
+    """Testing the pantry matching api."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.salt, self.egg, self.flour, self.milk = [
+            Ingredient.objects.create(user=self.user, name=name) for name in ['Salt', 'Egg', 'Flour', 'Milk']
+        ]
+
+    def get(self, *ingredients):
+        return self.client.get(PANTRY_URL, {'ingredients': ','.join(str(i.id) for i in ingredients)})
+
+    def test_ranked_by_coverage(self):
+        """Testing fully covered recipes come first, then by coverage"""
+
+        omelette = create_sample_recipe(self.user, [self.salt, self.egg], title='Omelette')
+        pancakes = create_sample_recipe(self.user, [self.egg, self.flour, self.milk], title='Pancakes')
+        boiled = create_sample_recipe(self.user, [self.egg], title='Boiled egg')
+        create_sample_recipe(self.user, [self.milk], title='Milk')
+        other = create_user(email='other@example.com')
+        create_sample_recipe(other, [Ingredient.objects.create(user=other, name='Egg')])
+
+        res = self.get(self.egg, self.salt, self.flour)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [omelette.id, boiled.id, pancakes.id])
+        self.assertEqual(res.data[2]['matched'], 2)
+        self.assertEqual(res.data[2]['missing'], 1)
+        self.assertAlmostEqual(res.data[2]['coverage'], 2 / 3)
+
+    def test_index_follows_links(self):
+        """Testing link changes and deletes reach the cached index without invalidation"""
+
+        recipe = create_sample_recipe(self.user, [self.egg, self.milk])
+        self.assertEqual(self.get(self.egg).data[0]['coverage'], 0.5)
+
+        with self.assertNumQueries(2):
+            self.get(self.egg)
+
+        recipe.ingredients.remove(self.milk)
+        self.assertEqual(self.get(self.egg).data[0]['coverage'], 1)
+
+        recipe.ingredients.add(self.flour)
+        self.assertEqual(self.get(self.flour).data[0]['coverage'], 0.5)
+
+        self.egg.delete()
+        self.assertEqual(self.get(self.salt).data, [])
+
+    def test_invalid_ingredients(self):
+        """Testing the ingredients parameter is required"""
+
+        self.assertEqual(self.client.get(PANTRY_URL).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(PANTRY_URL, {'ingredients': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
@@ -407,6 +407,74 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(s2.data, res.data)
         self.assertNotIn(s3.data, res.data)
 
+    def test_multi_get(self):
+        """Testing fetching several recipes by id in request order"""
+
+        r1 = create_sample_recipe(user=self.user, title='Recipe 1')
+        r2 = create_sample_recipe(user=self.user, title='Recipe 2')
+        r2.tags.add(Tag.objects.create(user=self.user, name='Tag 1'))
+        other = create_sample_recipe(user=create_user(email='other@example.com'))
+
+        with self.assertNumQueries(3):
+            res = self.client.get(RECEIPE_URL, {'ids': f'{r2.id},{other.id},{r1.id}'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([recipe['id'] for recipe in res.data], [r2.id, r1.id])
+        self.assertEqual(res.data[0]['tags'][0]['name'], 'Tag 1')
+        self.assertIn('description', res.data[0])
+
+    def test_multi_get_limit(self):
+        """Testing too many or malformed ids are rejected"""
+
+        ids = ','.join(str(i) for i in range(1, 102))
+
+        self.assertEqual(self.client.get(RECEIPE_URL, {'ids': ids}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(RECEIPE_URL, {'ids': '1,x'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_range_filters(self):
+        """Testing filtering recipes by price and time"""
+
+        cheap = create_sample_recipe(user=self.user, price=Decimal('3.00'), time_minutes=10)
+        create_sample_recipe(user=self.user, price=Decimal('8.00'), time_minutes=90)
+        create_sample_recipe(user=self.user, price=Decimal('30.00'), time_minutes=10)
+
+        res = self.client.get(RECEIPE_URL, {'price_min': '2', 'price_max': '10', 'time_max': 30})
+
+        self.assertEqual([recipe['id'] for recipe in res.data], [cheap.id])
+        res = self.client.get(RECEIPE_URL, {'price_min': 'cheap'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ordering(self):
+        """Testing ordering recipes by a whitelisted field"""
+
+        r1 = create_sample_recipe(user=self.user, title='B', price=Decimal('5.00'))
+        r2 = create_sample_recipe(user=self.user, title='A', price=Decimal('5.00'))
+        r3 = create_sample_recipe(user=self.user, title='C', price=Decimal('1.00'))
+
+        for ordering, expected in [('price', [r3, r1, r2]), ('-price', [r2, r1, r3]), ('title', [r2, r1, r3])]:
+            res = self.client.get(RECEIPE_URL, {'ordering': ordering})
+
+            self.assertEqual([recipe['id'] for recipe in res.data], [recipe.id for recipe in expected])
+        res = self.client.get(RECEIPE_URL, {'ordering': 'description'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_keyset_pagination(self):
+        """Testing paging through an ordering with ties by cursor"""
+
+        recipes = [create_sample_recipe(user=self.user, price=Decimal(price)) for price in ['4', '2', '4', '4', '1']]
+        expected = sorted(recipes, key=lambda recipe: (-recipe.price, -recipe.id))
+
+        seen, res = [], self.client.get(RECEIPE_URL, {'ordering': '-price', 'limit': 2})
+        while True:
+            seen += [recipe['id'] for recipe in res.data['results']]
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(seen, [recipe.id for recipe in expected])
+        res = self.client.get(RECEIPE_URL, {'ordering': 'price', 'cursor': 'bogus'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class ImageUploadTests(TestCase):
     """Testing image upload functionality"""
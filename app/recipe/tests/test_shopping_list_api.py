@@ -0,0 +1,82 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Ingredient, Recipe
+
+from decimal import Decimal
+
+SHOPPING_LIST_URL = reverse('recipe:recipe-shopping-list')
+
+
+def create_user(email='test@example.com', password='testpass'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password=password
+    )
+
+
+def create_sample_recipe(user, ingredients=(), **params):
+    """Create and return sample recipe with the given ingredients"""
+
+    defaults = {
+        'title': 'Sample Title',
+        'description': 'Sample Description',
+        'price': Decimal('10.00'),
+        'time_minutes': 20,
+    }
+
+    defaults.update(params)
+    recipe = Recipe.objects.create(user=user, **defaults)
+    recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+class PrivateShoppingListApiTest(TestCase):
+    """Testing the shopping list api."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_shopping_list(self):
+        """Testing ingredients are merged and totals scaled by servings"""
+
+        egg, milk = [Ingredient.objects.create(user=self.user, name=name) for name in ['Egg', 'Milk']]
+        omelette = create_sample_recipe(self.user, [egg, milk], price=Decimal('4.00'), time_minutes=10)
+        boiled = create_sample_recipe(self.user, [egg], price=Decimal('1.50'), time_minutes=8)
+        other = create_sample_recipe(create_user(email='other@example.com'))
+
+        with self.assertNumQueries(1):
+            res = self.client.get(SHOPPING_LIST_URL, {'ids': f'{omelette.id}:2,{boiled.id},{other.id},{boiled.id}:0.5'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {
+            'recipes': [omelette.id, boiled.id],
+            'total_price': '10.25',
+            'total_time_minutes': 18,
+            'ingredients': [
+                {'id': egg.id, 'name': 'Egg', 'recipes': [omelette.id, boiled.id], 'servings': '3.5'},
+                {'id': milk.id, 'name': 'Milk', 'recipes': [omelette.id], 'servings': '2'},
+            ],
+        })
+
+    def test_empty_plan(self):
+        """Testing a plan without the user's recipes is empty"""
+
+        res = self.client.get(SHOPPING_LIST_URL, {'ids': '999'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'recipes': [], 'total_price': '0.00', 'total_time_minutes': 0, 'ingredients': []})
+
+    def test_invalid_plan(self):
+        """Testing malformed ids and servings are rejected"""
+
+        for ids in [None, 'x', '1:0', '1:-2', '1:nan', '1:a', '1:1e30', '1:1001', '1:600,1:600', '1:0.001']:
+            res = self.client.get(SHOPPING_LIST_URL, {'ids': ids} if ids else {})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,142 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Tag, Ingredient, Recipe, RecipeSimilarity
+from recipe import similarity
+
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+
+def similar_url(recipe_id):
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+def create_user(email='test@example.com', password='testpass'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password=password
+    )
+
+
+def create_sample_recipe(user, tags=(), ingredients=(), **params):
+    """Create and return sample recipe with the given links"""
+
+    defaults = {
+        'title': 'Sample Title',
+        'description': 'Sample Description',
+        'price': Decimal('10.12'),
+        'time_minutes': 22,
+    }
+
+    defaults.update(params)
+    recipe = Recipe.objects.create(user=user, **defaults)
+    recipe.tags.add(*tags)
+    recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+@override_settings(SIMILAR_RECIPES=2)
+class PrivateSimilarApiTest(TestCase):
+    """Testing the similar recipes api."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.dinner = Tag.objects.create(user=self.user, name='Dinner')
+        self.egg, self.milk, self.flour = [
+            Ingredient.objects.create(user=self.user, name=name) for name in ['Egg', 'Milk', 'Flour']
+        ]
+
+    def stored(self):
+        rows = RecipeSimilarity.objects.filter(user=self.user)
+        return sorted(rows.values_list('recipe_id', 'similar_id', 'score'))
+
+    def test_ranked_by_weighted_jaccard(self):
+        """Testing similar recipes are ranked by the weight of shared features"""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = create_sample_recipe(self.user, [self.dinner], [self.egg, self.milk])
+            close = create_sample_recipe(self.user, [], [self.egg, self.milk])
+            far = create_sample_recipe(self.user, [self.dinner], [self.flour])
+            create_sample_recipe(self.user, [], [self.flour])
+
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [close.id, far.id])
+        self.assertAlmostEqual(res.data[0]['score'], 4 / 5)
+        self.assertAlmostEqual(res.data[1]['score'], 1 / 7)
+
+    def test_incremental_matches_rebuild(self):
+        """Testing link changes and deletes keep the stored lists exact"""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipes = [create_sample_recipe(self.user, [self.dinner], [self.egg]) for _ in range(4)]
+        for change in [
+            lambda: recipes[0].ingredients.add(self.milk),
+            lambda: recipes[1].ingredients.add(self.milk, self.flour),
+            lambda: recipes[2].tags.clear(),
+            lambda: self.flour.recipe.clear(),
+            lambda: recipes[3].delete(),
+            lambda: self.milk.delete(),
+        ]:
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+        incremental = self.stored()
+
+        call_command('rebuild_recipe_similarity', stdout=StringIO())
+
+        self.assertEqual(incremental, self.stored())
+        self.assertTrue(incremental)
+
+    def test_refreshed_once_per_transaction(self):
+        """Testing a recipe created with tags and ingredients is ranked once, after commit"""
+
+        create_sample_recipe(self.user, [self.dinner], [self.egg])
+
+        with patch('recipe.similarity.refresh', wraps=similarity.refresh) as refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                res = self.client.post(reverse('recipe:recipe-list'), {
+                    'title': 'Omelette', 'description': 'Eggs', 'time_minutes': 5, 'price': '2.00',
+                    'tags': [{'name': 'Dinner'}], 'ingredients': [{'name': 'Egg'}],
+                }, format='json')
+                self.assertEqual(refresh.call_count, 0)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(len(self.stored()), 2)
+
+    @override_settings(SIMILAR_FEATURE_MAX_RECIPES=2)
+    def test_common_features_not_matched(self):
+        """Testing a feature of too many recipes does not make them similar"""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipes = [create_sample_recipe(self.user, [self.dinner], [self.egg]) for _ in range(3)]
+            recipes[0].ingredients.add(self.milk)
+            recipes[1].ingredients.add(self.milk)
+        incremental = self.stored()
+
+        call_command('rebuild_recipe_similarity', stdout=StringIO())
+
+        self.assertEqual(incremental, self.stored())
+        # only milk is shared by at most two recipes, the totals still count every feature
+        self.assertEqual([row[:2] for row in incremental], sorted([(recipes[0].id, recipes[1].id),
+                                                                   (recipes[1].id, recipes[0].id)]))
+        self.assertAlmostEqual(incremental[0][2], 2 / 8)
+
+    def test_other_users_recipe(self):
+        """Testing similar recipes of another user's recipe are not found"""
+
+        recipe = create_sample_recipe(create_user(email='other@example.com'))
+
+        res = self.client.get(similar_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
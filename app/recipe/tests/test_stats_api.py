@@ -0,0 +1,126 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Tag, Recipe, UserRecipeStat
+from recipe import stats
+
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+STATS_URL = reverse('recipe:stats')
+
+
+def create_user(email='test@example.com', password='testpass'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password=password
+    )
+
+
+def create_sample_recipe(user, **params):
+    """Create and return sample recipe"""
+
+    defaults = {
+        'title': 'Sample Title',
+        'description': 'Sample Description',
+        'price': Decimal('10.00'),
+        'time_minutes': 20,
+    }
+
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeStatsApiTests(TestCase):
+    """Testing the recipe statistics api."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def stored(self):
+        rows = UserRecipeStat.objects.filter(user=self.user).exclude(count=0, total=0)
+        return {row.key: (row.count, row.total) for row in rows}
+
+    def test_stats(self):
+        """Testing averages, tag counts and buckets"""
+
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        create_sample_recipe(self.user, price=Decimal('4.00'), time_minutes=10).tags.add(tag)
+        create_sample_recipe(self.user, price=Decimal('12.00'), time_minutes=50).tags.add(tag)
+        create_sample_recipe(create_user(email='other@example.com'))
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipes'], 2)
+        self.assertEqual(res.data['average_price'], '8.00')
+        self.assertEqual(res.data['average_time_minutes'], 30.0)
+        self.assertEqual(res.data['tags'], [{'id': tag.id, 'name': 'Dinner', 'recipes': 2}])
+        self.assertEqual([b['recipes'] for b in res.data['price_buckets']], [1, 0, 1, 0, 0])
+        self.assertEqual([b['recipes'] for b in res.data['time_minutes_buckets']], [1, 0, 1, 0, 0])
+
+    def test_incremental_updates(self):
+        """Testing edits, link changes and deletes keep the statistics exact"""
+
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        other_tag = Tag.objects.create(user=self.user, name='Quick')
+        recipe = create_sample_recipe(self.user)
+        recipe.tags.add(tag, other_tag)
+        recipe.tags.remove(other_tag, Tag.objects.create(user=self.user, name='Unlinked'))
+        recipe.price = Decimal('60.00')
+        recipe.save()
+        kept = create_sample_recipe(self.user, price=Decimal('1.00'))
+        kept.tags.add(other_tag)
+        create_sample_recipe(self.user).delete()
+        other_tag.recipe.clear()
+
+        self.assertEqual(self.stored(), {
+            key: value for key, value in stats.compute('default', self.user.pk)[self.user.pk].items()
+        })
+
+    def test_rebuild_reconciles_drift(self):
+        """Testing the rebuild command fixes drifted rows"""
+
+        recipe = create_sample_recipe(self.user)
+        expected = self.stored()
+        Recipe.objects.filter(pk=recipe.pk).update(price=Decimal('30.00'))
+        UserRecipeStat.objects.create(user=self.user, key='tag:999', count=3)
+
+        out = StringIO()
+        call_command('rebuild_recipe_stats', stdout=out)
+
+        expected.update({'price': (1, Decimal('30.00')), 'price:2': (0, 0), 'price:3': (1, Decimal(0))})
+        self.assertEqual(self.stored(), {key: value for key, value in expected.items() if value[0]})
+        self.assertIn('4 rows had drifted', out.getvalue())
+
+    def test_rebuild_locks_one_user(self):
+        """Testing the rebuild locks the user it reconciles, not the table"""
+
+        create_sample_recipe(self.user)
+        compute = stats.compute
+        locks = []
+
+        def locked_compute(using, user_id=None):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    # the test's own upserts hold RowExclusiveLock, which writers share
+                    "SELECT locktype, objid, mode FROM pg_locks WHERE pid = pg_backend_pid() "
+                    "AND (locktype = 'advisory' OR "
+                    "relation = 'core_userrecipestat'::regclass AND mode <> 'RowExclusiveLock')"
+                )
+                locks.extend(cursor.fetchall())
+            return compute(using, user_id)
+
+        with patch.object(stats, 'compute', locked_compute):
+            call_command('rebuild_recipe_stats', user=self.user.pk, stdout=StringIO())
+
+        self.assertEqual(locks, [('advisory', self.user.pk, 'ExclusiveLock')])
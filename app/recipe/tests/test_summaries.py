@@ -0,0 +1,83 @@
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Tag, Recipe
+
+from io import StringIO
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_user(email='test@example.com', password='testpass'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password=password
+    )
+
+
+class RecipeSummaryTests(TestCase):
+    """Testing the denormalized recipe tag and ingredient summaries."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        res = self.client.post(RECIPES_URL, {
+            'title': 'Soup',
+            'description': 'Hot',
+            'time_minutes': 10,
+            'price': '2.00',
+            'tags': [{'name': 'Dinner'}, {'name': 'Quick'}],
+            'ingredients': [{'name': 'Salt'}],
+        }, format='json')
+        self.recipe = Recipe.objects.get(pk=res.data['id'])
+
+    def test_list_reads_summaries(self):
+        """Testing recipe lists render tags and ingredients from one query"""
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual([t['name'] for t in res.data[0]['tags']], ['Dinner', 'Quick'])
+        self.assertEqual([i['name'] for i in res.data[0]['ingredients']], ['Salt'])
+
+    def test_links_changed(self):
+        """Testing replacing and adding links updates the summary"""
+
+        self.client.patch(reverse('recipe:recipe-detail', args=[self.recipe.id]), {'tags': [{'name': 'Lunch'}]},
+                          format='json')
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Cold'))
+
+        self.recipe.refresh_from_db()
+        self.assertEqual([t['name'] for t in self.recipe.tag_summary], ['Lunch', 'Cold'])
+
+    def test_tag_renamed_and_deleted(self):
+        """Testing renaming or deleting a tag through the api updates the summary"""
+
+        dinner, quick = self.recipe.tags.order_by('id')
+
+        res = self.client.patch(reverse('recipe:tag-detail', args=[dinner.id]), {'name': 'Supper'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.client.delete(reverse('recipe:tag-detail', args=[quick.id]))
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.tag_summary, [{'id': dinner.id, 'name': 'Supper'}])
+
+    def test_check_command(self):
+        """Testing the check command reports and fixes drift"""
+
+        Recipe.objects.filter(pk=self.recipe.pk).update(tag_summary=[])
+
+        with self.assertRaises(CommandError):
+            call_command('check_recipe_summaries', stdout=StringIO())
+        call_command('check_recipe_summaries', fix=True, stdout=StringIO())
+        call_command('check_recipe_summaries', stdout=StringIO())
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(len(self.recipe.tag_summary), 2)
@@ -10,5 +10,8 @@ router.register('ingredients', views.IngredientViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
+    path('bootstrap/', views.BootstrapView.as_view(), name='bootstrap'),
+    path('stats/', views.StatsView.as_view(), name='stats'),
+    path('changes/', views.ChangesView.as_view(), name='changes'),
     path('', include(router.urls)),
 ]
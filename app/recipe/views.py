@@ -1,11 +1,20 @@
-from rest_framework import viewsets, mixins, status
+from django.conf import settings
+from django.db import router, transaction
+
+from rest_framework import viewsets, mixins, status, views
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 
+from core.coalescing import CoalescedReadMixin
+from core.idempotency import idempotent
 from core.models import Recipe, Tag, Ingredient
-from recipe import serializers
+from core.permissions import ShardWritable
+from recipe import serializers, changes, summaries, stats, pantry, similarity, shopping, cloning
+from recipe.pagination import KeysetPagination
+from user.authentication import SignedTokenAuthentication
 
 from drf_spectacular.utils import (
     extend_schema,
@@ -14,6 +23,8 @@ from drf_spectacular.utils import (
     OpenApiTypes
 )
 
+from decimal import Decimal
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -27,17 +38,83 @@ from drf_spectacular.utils import (
                 'ingredients',
                 OpenApiTypes.STR,
                 description='Comma separated list of IDs to filter'
+            ),
+            OpenApiParameter(
+                'ids',
+                OpenApiTypes.STR,
+                description='Comma separated list of recipe IDs to fetch in detail, in that order'
+            ),
+            OpenApiParameter(
+                'price_min',
+                OpenApiTypes.DECIMAL,
+                description='Only recipes costing at least this much'
+            ),
+            OpenApiParameter(
+                'price_max',
+                OpenApiTypes.DECIMAL,
+                description='Only recipes costing at most this much'
+            ),
+            OpenApiParameter(
+                'time_max',
+                OpenApiTypes.INT,
+                description='Only recipes taking at most this many minutes'
+            ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR,
+                enum=['price', '-price', 'time_minutes', '-time_minutes', 'title', '-title', 'id', '-id'],
+                description='Order of the recipes, -id by default'
+            )
+        ]
+    ),
+    shopping_list=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'ids',
+                OpenApiTypes.STR,
+                description='Comma separated list of recipe IDs, each optionally followed by :servings'
+            )
+        ]
+    ),
+    clone=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'count',
+                OpenApiTypes.INT,
+                description='Number of copies to create, one by default'
+            )
+        ]
+    ),
+    pantry=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'ingredients',
+                OpenApiTypes.STR,
+                description='Comma separated list of ingredient IDs on hand'
             )
         ]
     )
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CoalescedReadMixin, viewsets.ModelViewSet):
     """View for managing recipe APIs."""
 
     serializer_class = serializers.RecipeDetailSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = [TokenAuthentication]
-    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication, SignedTokenAuthentication]
+    permission_classes = [IsAuthenticated, ShardWritable]
+    throttle_scopes = {'upload_image': 'upload'}
+    pagination_class = KeysetPagination
+    max_ids = 100
+    max_plan_recipes = 500
+    max_plan_servings = 1000
+    max_clones = 50
+    # each has a (user, field, id) index, ties are broken by id in the same direction
+    orderings = ['price', '-price', 'time_minutes', '-time_minutes', 'title', '-title', 'id', '-id']
+    range_filters = {
+        'price_min': ('price__gte', Decimal),
+        'price_max': ('price__lte', Decimal),
+        'time_max': ('time_minutes__lte', int),
+    }
 
     def _params_to_ints(self, qs):
         """Convert comma separated values to list of int"""
@@ -49,32 +126,155 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        user = self.request.user
         query_set = self.queryset
 
+        # filter the link tables by user too, they are partitioned by it
         if tags:
             tag_ids = self._params_to_ints(tags)
-            query_set = query_set.filter(tags__id__in=tag_ids)
+            query_set = query_set.filter(tag_links__user=user, tag_links__tag_id__in=tag_ids)
 
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
-            query_set = query_set.filter(ingredients__id__in=ingredient_ids)
-
-        return query_set.filter(user=self.request.user).order_by('-id').distinct()
+            query_set = query_set.filter(
+                ingredient_links__user=user, ingredient_links__ingredient_id__in=ingredient_ids)
+
+        for param, (lookup, convert) in self.range_filters.items():
+            value = self.request.query_params.get(param)
+            if value:
+                try:
+                    query_set = query_set.filter(**{lookup: convert(value)})
+                except (ValueError, ArithmeticError):
+                    raise ValidationError({param: 'Expected a number.'})
+
+        return query_set.filter(user=user).order_by(*self.get_ordering()).distinct()
+
+    def get_ordering(self):
+        """Return the ordering of the list, the field asked for then id."""
+
+        ordering = self.request.query_params.get('ordering', '-id')
+        if ordering not in self.orderings:
+            raise ValidationError({'ordering': f'Expected one of {", ".join(self.orderings)}.'})
+        if ordering.lstrip('-') == 'id':
+            return (ordering,)
+        return (ordering, '-id' if ordering.startswith('-') else 'id')
+
+    def list(self, request, *args, **kwargs):
+        """List recipes, or fetch the recipes given by `ids` in detail."""
+
+        ids = request.query_params.get('ids')
+        if not ids:
+            return super().list(request, *args, **kwargs)
+
+        try:
+            recipe_ids = list(dict.fromkeys(self._params_to_ints(ids)))
+        except ValueError:
+            raise ValidationError({'ids': 'Expected a comma separated list of IDs.'})
+        if len(recipe_ids) > self.max_ids:
+            raise ValidationError({'ids': f'At most {self.max_ids} IDs per request.'})
+
+        recipes = self.get_queryset().filter(id__in=recipe_ids).prefetch_related('tags', 'ingredients')
+        by_id = {recipe.id: recipe for recipe in recipes}
+        serializer = serializers.RecipeDetailSerializer(
+            [by_id[recipe_id] for recipe_id in recipe_ids if recipe_id in by_id],
+            many=True,
+            context=self.get_serializer_context()
+        )
+        return Response(serializer.data)
 
     def get_serializer_class(self):
         """Returns the serializer class for the request."""
 
-        if self.action == 'list':
-            return serializers.RecipeSerializer
+        if self.action in ('list', 'pantry', 'similar'):
+            return serializers.RecipeListSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
 
         return self.serializer_class
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        changes.delete_with_tombstone(instance)
+
+    @action(methods=['GET'], detail=False)
+    def pantry(self, request):
+        """List recipes by the share of their ingredients on hand, complete ones first."""
+
+        try:
+            ingredient_ids = self._params_to_ints(request.query_params['ingredients'])
+        except (KeyError, ValueError):
+            raise ValidationError({'ingredients': 'Expected a comma separated list of IDs.'})
+
+        ranked = pantry.rank(request.user.pk, ingredient_ids, settings.PANTRY_RESULTS)
+        by_id = Recipe.objects.filter(user=request.user).in_bulk([recipe_id for recipe_id, _, _ in ranked])
+        results = []
+        for recipe_id, matched, total in ranked:
+            if recipe_id in by_id:
+                data = self.get_serializer(by_id[recipe_id]).data
+                results.append({**data, 'matched': matched, 'missing': total - matched, 'coverage': matched / total})
+        return Response(results)
+
+    @action(methods=['POST'], detail=True)
+    @idempotent
+    def clone(self, request, pk=None):
+        """Copy a recipe with its tags and ingredients, `count` times."""
+
+        try:
+            count = int(request.query_params.get('count', 1))
+        except ValueError:
+            count = 0
+        if not 1 <= count <= self.max_clones:
+            raise ValidationError({'count': f'Expected a number from 1 to {self.max_clones}.'})
+
+        clone_ids = cloning.clone_recipe(self.get_object(), count)
+        clones = Recipe.objects.filter(user=request.user, id__in=clone_ids).order_by('id')
+        serializer = serializers.RecipeDetailSerializer(
+            clones.prefetch_related('tags', 'ingredients'), many=True, context=self.get_serializer_context())
+        data = serializer.data if 'count' in request.query_params else serializer.data[0]
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @action(methods=['GET'], detail=False, url_path='shopping-list')
+    def shopping_list(self, request):
+        """Return the merged ingredients, cost and time of a meal plan."""
+
+        plan = {}
+        try:
+            for entry in request.query_params['ids'].split(','):
+                recipe_id, _, servings = entry.partition(':')
+                servings = Decimal(servings or 1)
+                if not servings.is_finite() or servings <= 0 or servings.as_tuple().exponent < -2:
+                    raise ValueError(entry)
+                plan[int(recipe_id)] = plan.get(int(recipe_id), 0) + servings
+                if plan[int(recipe_id)] > self.max_plan_servings:
+                    raise ValueError(entry)
+        except (KeyError, ValueError, ArithmeticError):
+            raise ValidationError({'ids': (
+                'Expected a comma separated list of IDs with optional :servings, '
+                f'up to {self.max_plan_servings} with at most 2 decimal places.'
+            )})
+        if len(plan) > self.max_plan_recipes:
+            raise ValidationError({'ids': f'At most {self.max_plan_recipes} recipes per plan.'})
+
+        return Response(shopping.shopping_list(request.user.pk, plan))
+
+    @action(methods=['GET'], detail=True)
+    def similar(self, request, pk=None):
+        """List the recipes sharing the most tags and ingredients with a recipe."""
+
+        recipe = self.get_object()
+        return Response([
+            {**self.get_serializer(similar).data, 'score': score}
+            for similar, score in similarity.similar_recipes(recipe, settings.SIMILAR_RECIPES)
+        ])
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
+    @idempotent
     def upload_image(self, request, pk=None):
         """Upload an image to recipe."""
 
@@ -99,12 +299,12 @@ class RecipeViewSet(viewsets.ModelViewSet):
         ]
     )
 )
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet, mixins.UpdateModelMixin, mixins.ListModelMixin,
-                            mixins.DestroyModelMixin):
+class BaseRecipeAttrViewSet(CoalescedReadMixin, viewsets.GenericViewSet, mixins.UpdateModelMixin,
+                            mixins.ListModelMixin, mixins.DestroyModelMixin):
     """Base view set for Recipe attribute viewsets"""
 
-    authentication_classes = [TokenAuthentication]
-    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication, SignedTokenAuthentication]
+    permission_classes = [IsAuthenticated, ShardWritable]
 
     def _params_to_ints(self, qs):
         """Convert comma separated values to list of int"""
@@ -116,18 +316,30 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet, mixins.UpdateModelMixin, mi
             self.request.query_params.get('assigned_only', '0'))
         query_set = self.queryset
         if assigned_only:
-            query_set = query_set.filter(recipe__isnull=False)
+            query_set = query_set.filter(recipe_links__user=self.request.user)
 
         return query_set.filter(user=self.request.user).order_by('-name').distinct()
 
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        with transaction.atomic(using=router.db_for_write(type(instance), instance=instance)):
+            serializer.save()
+            summaries.refresh_recipes(instance.user_id, summaries.linked_recipe_ids(instance))
+
+    def perform_destroy(self, instance):
+        with transaction.atomic(using=router.db_for_write(type(instance), instance=instance)):
+            recipe_ids = summaries.linked_recipe_ids(instance)
+            changes.delete_with_tombstone(instance)
+            summaries.refresh_recipes(instance.user_id, recipe_ids)
+
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """View for managing tag APIs."""
 
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
-    authentication_classes = [TokenAuthentication]
-    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication, SignedTokenAuthentication]
+    permission_classes = [IsAuthenticated, ShardWritable]
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
@@ -135,5 +347,108 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
 
     serializer_class = serializers.IngredientSerializer
     queryset = Ingredient.objects.all()
-    authentication_classes = [TokenAuthentication]
-    permission_classes = [IsAuthenticated]
+    authentication_classes = [TokenAuthentication, SignedTokenAuthentication]
+    permission_classes = [IsAuthenticated, ShardWritable]
+
+
+@extend_schema_view(
+    get=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'since',
+                OpenApiTypes.STR,
+                description='Cursor returned by the previous call, omit for a full sync.'
+            ),
+        ]
+    )
+)
+class ChangesView(views.APIView):
+    """View for syncing changed recipes, tags and ingredients."""
+
+    authentication_classes = [TokenAuthentication, SignedTokenAuthentication]
+    permission_classes = [IsAuthenticated, ShardWritable]
+
+    def get(self, request):
+        """Return changes after the `since` cursor in commit order."""
+
+        since = request.query_params.get('since')
+        key = changes.decode_cursor(since) if since else None
+        rows, next_key, more = changes.read_changes(request.user, key, settings.CHANGES_PAGE_SIZE)
+
+        return Response({
+            'changes': changes.serialize_changes(rows, {'request': request}),
+            'cursor': changes.encode_cursor(next_key),
+            'more': more,
+        })
+
+
+class StatsView(views.APIView):
+    """View for statistics of the user's recipes."""
+
+    authentication_classes = [TokenAuthentication, SignedTokenAuthentication]
+    permission_classes = [IsAuthenticated, ShardWritable]
+
+    def get(self, request):
+        """Return recipe counts per tag and the price and time distributions."""
+
+        return Response(stats.summary(request.user))
+
+
+@extend_schema_view(
+    get=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'tags',
+                OpenApiTypes.STR,
+                description='Comma separated list of tag IDs to filter recipes'
+            ),
+            OpenApiParameter(
+                'ingredients',
+                OpenApiTypes.STR,
+                description='Comma separated list of ingredient IDs to filter recipes'
+            ),
+            OpenApiParameter(
+                'assigned_only',
+                OpenApiTypes.INT, enum=[0, 1],
+                description='Filter tags and ingredients by item assigned to recipe.'
+            ),
+            OpenApiParameter(
+                'ids',
+                OpenApiTypes.STR,
+                description='Comma separated list of recipe IDs to fetch in detail, in that order'
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Page the recipes by this many'
+            ),
+            OpenApiParameter(
+                'cursor',
+                OpenApiTypes.STR,
+                description='Position of the next page of recipes'
+            ),
+        ]
+    )
+)
+class BootstrapView(views.APIView):
+    """View returning recipes, tags and ingredients in one response."""
+
+    authentication_classes = [TokenAuthentication, SignedTokenAuthentication]
+    permission_classes = [IsAuthenticated, ShardWritable]
+    viewsets = {
+        'recipes': RecipeViewSet,
+        'tags': TagViewSet,
+        'ingredients': IngredientViewSet,
+    }
+
+    def _list(self, viewset_class, request):
+        """Run the list action of viewset_class on this request without another request cycle."""
+
+        view = viewset_class(request=request, format_kwarg=None, action='list', args=(), kwargs={})
+        # list() handles `ids` and the pagination parameters, not only get_queryset()
+        return view.list(request).data
+
+    def get(self, request):
+        """Return what the recipe, tag and ingredient lists return for the same parameters."""
+
+        return Response({name: self._list(viewset_class, request) for name, viewset_class in self.viewsets.items()})
@@ -0,0 +1,38 @@
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext as _
+
+from rest_framework import authentication, exceptions
+
+from user import tokens
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """Authenticate `Authorization: Bearer <access token>` headers.
+
+    The token is verified in memory. The returned user only carries the id
+    and token version; views needing other fields must load the user.
+    """
+
+    keyword = 'Bearer'
+
+    def authenticate(self, request):
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed(_('Invalid bearer header.'))
+
+        payload = tokens.read_access_token(auth[1].decode(errors='replace'))
+        if payload is None:
+            raise exceptions.AuthenticationFailed(_('Invalid or expired token.'))
+
+        state = tokens.get_token_version(payload['uid'])
+        if state is None or state[0] != payload['ver'] or not state[1]:
+            raise exceptions.AuthenticationFailed(_('Token has been revoked.'))
+
+        user = get_user_model()(pk=payload['uid'], token_version=payload['ver'])
+        user.is_stateless = True
+        return user, payload
+
+    def authenticate_header(self, request):
+        return self.keyword
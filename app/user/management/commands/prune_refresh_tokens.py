@@ -0,0 +1,31 @@
+"""
+Django command to delete expired refresh tokens in batches.
+"""
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import RefreshToken
+
+
+class Command(BaseCommand):
+    """Django command to prune expired refresh tokens"""
+
+    help = 'Delete expired refresh tokens in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            ids = list(
+                RefreshToken.objects.filter(expires_at__lte=now)
+                .values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            deleted += RefreshToken.objects.filter(id__in=ids).delete()[0]
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired refresh tokens.'))
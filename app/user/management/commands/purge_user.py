@@ -0,0 +1,37 @@
+"""
+Django command to delete a user and their data in batches.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.tasks import enqueue
+from user import purge, tasks
+
+
+class Command(BaseCommand):
+    """Django command to purge a user"""
+
+    help = 'Delete a user and everything they own in small batches without long locks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches.')
+        parser.add_argument('--background', action='store_true', help='Queue the purge for run_worker.')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.using('default').get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user {options["email"]}.')
+
+        if options['background']:
+            task = enqueue(tasks.purge_user, user_id=user.pk, batch_size=options['batch_size'], pause=options['pause'])
+            self.stdout.write(self.style.SUCCESS(f'Queued task {task.pk} to purge user {options["email"]}.'))
+            return
+
+        deleted = purge.purge_user(user, options['batch_size'], options['pause'])
+        for table, count in deleted.items():
+            self.stdout.write(f'{table}: {count} rows')
+        self.stdout.write(self.style.SUCCESS(f'Purged user {options["email"]}.'))
@@ -0,0 +1,57 @@
+"""
+Chunked deletion of everything a user owns.
+
+Deleting a user cascades in the database, which for a large account is one
+long statement holding locks on every table involved. purge_user first
+deletes the user's rows in small batches, each its own short transaction,
+and only then deletes the user.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+
+from user import tokens
+
+import time
+
+# recipes first, their links and similar recipes go with them
+PURGED_TABLES = ['core_recipe', 'core_tag', 'core_ingredient', 'core_tombstone', 'core_userrecipestat',
+                 'core_recipesimilarity']
+
+
+def delete_in_batches(alias, table, user_id, batch_size, pause=0):
+    """Delete the rows of a user from table batch_size at a time, returning how many."""
+
+    deleted = 0
+    while True:
+        with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE user_id = %s AND id IN '
+                f'(SELECT id FROM {table} WHERE user_id = %s LIMIT %s)',
+                [user_id, user_id, batch_size]
+            )
+            deleted += cursor.rowcount
+        if cursor.rowcount < batch_size:
+            return deleted
+        time.sleep(pause)
+
+
+def purge_user(user, batch_size=1000, pause=0):
+    """Delete a user and their recipes, tags and ingredients on every shard.
+
+    Returns {table: rows deleted}.
+    """
+
+    # no new rows can be written once the user is locked out
+    get_user_model().objects.filter(pk=user.pk).update(is_active=False)
+    tokens.revoke_tokens(user)
+
+    deleted = dict.fromkeys(PURGED_TABLES, 0)
+    for alias in settings.SHARD_DATABASES:
+        for table in PURGED_TABLES:
+            deleted[table] += delete_in_batches(alias, table, user.pk, batch_size, pause)
+        if alias != 'default':
+            get_user_model().objects.using(alias).filter(pk=user.pk).delete()
+    get_user_model().objects.using('default').filter(pk=user.pk).delete()
+    return deleted
@@ -3,6 +3,8 @@ from django.contrib.auth import get_user_model, authenticate
 from rest_framework import serializers
 from django.utils.translation import gettext as _
 
+from core import passwords
+
 
 class UserSerializer(serializers.ModelSerializer):
     """Serializer for the user object"""
@@ -26,7 +28,7 @@ class UserSerializer(serializers.ModelSerializer):
         user = super().update(instance, validated_data)
 
         if password:
-            user.set_password(password)
+            passwords.set_password(user, password)
             user.save()
 
         return user
@@ -56,3 +58,9 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer for exchanging a refresh token"""
+
+    refresh = serializers.CharField(trim_whitespace=False)
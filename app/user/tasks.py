@@ -0,0 +1,17 @@
+"""
+Background tasks of the user app.
+"""
+
+from django.contrib.auth import get_user_model
+
+from core.tasks import task
+from user import purge
+
+
+@task
+def purge_user(user_id, batch_size=1000, pause=0):
+    """Purge a user, see user.purge. Does nothing once they are gone."""
+
+    user = get_user_model().objects.using('default').filter(pk=user_id).first()
+    if user is not None:
+        purge.purge_user(user, batch_size, pause)
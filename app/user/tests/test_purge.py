@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Tag, Ingredient, Recipe, RecipeTag, UserRecipeStat, Task
+
+from decimal import Decimal
+from io import StringIO
+
+
+def create_user(email='test@example.com', password='testpass'):
+    return get_user_model().objects.create_user(
+        email=email,
+        password=password
+    )
+
+
+def create_recipes(user, count):
+    """Create recipes sharing a tag and an ingredient, return the tag"""
+
+    tag = Tag.objects.create(user=user, name='Dinner')
+    ingredient = Ingredient.objects.create(user=user, name='Egg')
+    for _ in range(count):
+        recipe = Recipe.objects.create(
+            user=user, title='Recipe', description='Recipe', time_minutes=5, price=Decimal('1.00'))
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+    return tag
+
+
+def count_rows(user):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT (SELECT count(*) FROM core_recipe WHERE user_id = %s) '
+            '+ (SELECT count(*) FROM core_recipe_tags WHERE user_id = %s) '
+            '+ (SELECT count(*) FROM core_recipe_ingredients WHERE user_id = %s) '
+            '+ (SELECT count(*) FROM core_tag WHERE user_id = %s) '
+            '+ (SELECT count(*) FROM core_userrecipestat WHERE user_id = %s)',
+            [user.pk] * 5
+        )
+        return cursor.fetchone()[0]
+
+
+class PurgeTests(TestCase):
+    """Testing deletion of users and their data."""
+
+    databases = set(settings.SHARD_DATABASES)
+
+    def setUp(self):
+        self.user = create_user()
+        self.other = create_user(email='other@example.com')
+        create_recipes(self.other, 2)
+
+    def test_user_delete_cascades_in_database(self):
+        """Testing deleting a user deletes their data without loading it"""
+
+        create_recipes(self.user, 5)
+
+        with self.assertNumQueries(7):
+            self.user.delete()
+
+        self.assertEqual(count_rows(self.user), 0)
+        self.assertEqual(Recipe.objects.filter(user=self.other).count(), 2)
+
+    def test_tag_delete_queries_constant(self):
+        """Testing deleting a tag does not load its links"""
+
+        few, many = create_recipes(self.user, 1), create_recipes(self.other, 20)
+
+        with CaptureQueriesContext(connection) as few_queries:
+            few.delete()
+        many_id = many.id
+        with self.assertNumQueries(len(few_queries.captured_queries)):
+            many.delete()
+        self.assertFalse(RecipeTag.objects.filter(user=self.other, tag_id=many_id).exists())
+
+    def test_purge_user_command(self):
+        """Testing the purge command deletes in batches"""
+
+        create_recipes(self.user, 5)
+        out = StringIO()
+
+        call_command('purge_user', self.user.email, batch_size=2, stdout=out)
+
+        self.assertFalse(get_user_model().objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(count_rows(self.user), 0)
+        self.assertIn('core_recipe: 5 rows', out.getvalue())
+        self.assertTrue(UserRecipeStat.objects.filter(user=self.other).exists())
+
+    def test_purge_user_command_background(self):
+        """Testing the purge command can queue the purge for a worker"""
+
+        create_recipes(self.user, 2)
+
+        call_command('purge_user', self.user.email, background=True, stdout=StringIO())
+        self.assertTrue(get_user_model().objects.filter(pk=self.user.pk).exists())
+        call_command('run_worker', burst=True, stdout=StringIO())
+
+        self.assertFalse(get_user_model().objects.filter(pk=self.user.pk).exists())
+        self.assertEqual(count_rows(self.user), 0)
+        self.assertFalse(Task.objects.exists())
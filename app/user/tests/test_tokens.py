@@ -0,0 +1,131 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import checks
+from core.models import RefreshToken
+from user import tokens
+
+from io import StringIO
+import datetime
+
+TOKEN_URL = reverse('user:token')
+REFRESH_URL = reverse('user:token-refresh')
+REVOKE_URL = reverse('user:token-revoke')
+USER_PROFILE_URL = reverse('user:me')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+@override_settings(SIGNED_TOKENS=True)
+class SignedTokenApiTests(TestCase):
+    """Testing signed access and refresh tokens."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass',
+            name='Test Name'
+        )
+
+    def obtain_tokens(self):
+        res = self.client.post(TOKEN_URL, {'email': 'test@example.com', 'password': 'testpass'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_issue_token_pair(self):
+        """Testing the token endpoint issues access and refresh tokens"""
+
+        data = self.obtain_tokens()
+
+        self.assertIn('access', data)
+        self.assertIn('refresh', data)
+        self.assertNotIn('token', data)
+
+    def test_access_token_verified_in_memory(self):
+        """Testing bearer tokens authenticate without token table lookups"""
+
+        access = self.obtain_tokens()['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_profile_with_access_token(self):
+        """Testing the profile endpoint loads the full user"""
+
+        access = self.obtain_tokens()['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        res = self.client.get(USER_PROFILE_URL)
+
+        self.assertEqual(res.data, {'email': self.user.email, 'name': self.user.name})
+
+    @override_settings(ACCESS_TOKEN_LIFETIME=-1)
+    def test_expired_access_token(self):
+        """Testing expired access tokens are rejected"""
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens.issue_access_token(self.user)}')
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke_bumps_version(self):
+        """Testing revocation invalidates access and refresh tokens"""
+
+        data = self.obtain_tokens()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {data["access"]}')
+
+        res = self.client.post(REVOKE_URL)
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials()
+        res = self.client.post(REFRESH_URL, {'refresh': data['refresh']})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_per_process_cache_check(self):
+        """Testing signed tokens with a per process cache fail the system checks"""
+
+        errors = checks.check_token_version_cache(None)
+        self.assertEqual([error.id for error in errors], ['core.E002'])
+
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(checks.check_token_version_cache(None), [])
+        with override_settings(SIGNED_TOKENS=False):
+            self.assertEqual(checks.check_token_version_cache(None), [])
+
+    def test_refresh_rotates_token(self):
+        """Testing refresh tokens can only be used once"""
+
+        refresh = self.obtain_tokens()['refresh']
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['refresh'], refresh)
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_prune_expired_refresh_tokens(self):
+        """Testing the cleanup command only removes expired tokens"""
+
+        tokens.issue_refresh_token(self.user)
+        tokens.issue_refresh_token(self.user)
+        RefreshToken.objects.filter(id=RefreshToken.objects.first().id).update(
+            expires_at=timezone.now() - datetime.timedelta(days=1))
+
+        call_command('prune_refresh_tokens', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(RefreshToken.objects.count(), 1)
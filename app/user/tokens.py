@@ -0,0 +1,115 @@
+"""
+Signed access tokens and rotating refresh tokens.
+
+Access tokens are HMAC signed and carry the user id and the user's token
+version, so they are verified without touching the token tables. Bumping
+``User.token_version`` revokes every access and refresh token of the user.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core import metrics
+from core.models import RefreshToken
+
+import datetime
+import hashlib
+import secrets
+
+ACCESS_TOKEN_SALT = 'user.tokens.access'
+
+
+def _version_cache_key(user_id):
+    return f'token-version:{user_id}'
+
+
+def _hash(raw_token):
+    return hashlib.sha256(raw_token.encode()).hexdigest()
+
+
+def issue_access_token(user):
+    """Return a signed access token for the user."""
+
+    return signing.dumps(
+        {'uid': user.pk, 'ver': user.token_version},
+        salt=ACCESS_TOKEN_SALT
+    )
+
+
+def read_access_token(token):
+    """Return the payload of a valid, unexpired access token or None."""
+
+    try:
+        return signing.loads(
+            token,
+            salt=ACCESS_TOKEN_SALT,
+            max_age=settings.ACCESS_TOKEN_LIFETIME
+        )
+    except signing.BadSignature:
+        return None
+
+
+def get_token_version(user_id):
+    """Return the current (version, is_active) of a user, cached briefly."""
+
+    key = _version_cache_key(user_id)
+    state = cache.get(key)
+    metrics.record_cache('token_version', state is not None)
+    if state is None:
+        state = get_user_model().objects.filter(pk=user_id).values_list(
+            'token_version', 'is_active').first()
+        cache.set(key, state, settings.TOKEN_VERSION_CACHE_TIMEOUT)
+    return state
+
+
+def issue_refresh_token(user):
+    """Create and return a new refresh token for the user."""
+
+    raw_token = secrets.token_urlsafe(32)
+    RefreshToken.objects.create(
+        user=user,
+        token_hash=_hash(raw_token),
+        version=user.token_version,
+        expires_at=timezone.now() + datetime.timedelta(seconds=settings.REFRESH_TOKEN_LIFETIME)
+    )
+    return raw_token
+
+
+def issue_token_pair(user):
+    return {
+        'access': issue_access_token(user),
+        'refresh': issue_refresh_token(user),
+        'expires_in': settings.ACCESS_TOKEN_LIFETIME,
+    }
+
+
+def rotate_refresh_token(raw_token):
+    """Exchange a refresh token for a new token pair, or return None."""
+
+    with transaction.atomic():
+        refresh_token = RefreshToken.objects.select_for_update().select_related('user').filter(
+            token_hash=_hash(raw_token)).first()
+        if refresh_token is None:
+            return None
+
+        refresh_token.delete()
+        user = refresh_token.user
+        if (refresh_token.expires_at <= timezone.now()
+                or refresh_token.version != user.token_version
+                or not user.is_active):
+            return None
+
+        return issue_token_pair(user)
+
+
+def revoke_tokens(user):
+    """Invalidate all signed access and refresh tokens of the user."""
+
+    get_user_model().objects.filter(pk=user.pk).update(token_version=F('token_version') + 1)
+    RefreshToken.objects.filter(user_id=user.pk).delete()
+    cache.delete(_version_cache_key(user.pk))
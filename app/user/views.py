@@ -1,8 +1,18 @@
-from rest_framework import generics, authentication, permissions
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext as _
+
+from rest_framework import generics, authentication, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from rest_framework.views import APIView
 
-from user.serializers import UserSerializer, AuthTokenSerializer
+from core.idempotency import idempotent
+from user import tokens
+from user.authentication import SignedTokenAuthentication
+from user.serializers import UserSerializer, AuthTokenSerializer, RefreshTokenSerializer
 
 
 class CreateUserView(generics.CreateAPIView):
@@ -10,20 +20,67 @@ class CreateUserView(generics.CreateAPIView):
 
     serializer_class = UserSerializer
 
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
 
 class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user."""
 
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = 'login'
+
+    def post(self, request, *args, **kwargs):
+        if not settings.SIGNED_TOKENS:
+            return super().post(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(tokens.issue_token_pair(serializer.validated_data['user']))
+
+
+class RefreshTokenView(generics.GenericAPIView):
+    """Exchange a refresh token for a new access and refresh token."""
+
+    serializer_class = RefreshTokenSerializer
+    authentication_classes = []
+
+    def get_authenticate_header(self, request):
+        return SignedTokenAuthentication.keyword
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        pair = tokens.rotate_refresh_token(serializer.validated_data['refresh'])
+        if pair is None:
+            raise AuthenticationFailed(_('Invalid or expired refresh token.'))
+        return Response(pair)
+
+
+class RevokeTokenView(APIView):
+    """Revoke all signed tokens of the logged in user."""
+
+    authentication_classes = [authentication.TokenAuthentication, SignedTokenAuthentication]
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        tokens.revoke_tokens(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class UpdateUserView(generics.RetrieveUpdateAPIView):
     """Update the user model of logged in user"""
 
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [authentication.TokenAuthentication, SignedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        user = self.request.user
+        if getattr(user, 'is_stateless', False):
+            user = get_user_model().objects.get(pk=user.pk)
+        return user
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""
+Compare uWSGI configurations under load.
+
+Each --config is a space separated list of the WEB_* variables of run.sh
+overriding its defaults. For each one uWSGI is started with uwsgi.ini on a
+local HTTP port, loadtest.py runs against --path, and the number of workers
+and their memory are reported. PSS counts the pages shared between the
+master and its workers once, so the further it is below RSS the more memory
+the workers share copy-on-write. For example:
+
+    AUTH="Authorization: Bearer <access token from /api/user/token/>"
+    bench_uwsgi.py --header "$AUTH" --concurrency 8,32 \\
+        --config "WEB_PROCESSES=4" \\
+        --config "WEB_PROCESSES=4 WEB_THREADS=4" \\
+        --config "WEB_PROCESSES=8 WEB_CHEAPER=2"
+
+Run it with the database settings of the app in the environment.
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(SCRIPTS_DIR), 'app')
+
+# the defaults of run.sh
+DEFAULTS = {
+    'WEB_PROCESSES': '4',
+    'WEB_THREADS': '1',
+    'WEB_CHEAPER': '0',
+    'WEB_CHEAPER_STEP': '1',
+    'WEB_CHEAPER_ALGO': 'spare',
+    'WEB_CHEAPER_OVERLOAD': '3',
+    'WEB_HARAKIRI': '60',
+    'WEB_MAX_REQUESTS': '5000',
+    'WEB_MAX_REQUESTS_DELTA': '50',
+    'WEB_LISTEN': '128',
+}
+
+
+def parse_config(value):
+    config = {}
+    for item in value.split():
+        name, sep, setting = item.partition('=')
+        if not sep or not name.startswith('WEB_'):
+            raise argparse.ArgumentTypeError(f'Expected WEB_NAME=value, got {item!r}.')
+        config[name] = setting
+    return config
+
+
+def wait_for_app(url, process, timeout):
+    """Wait for a response from url, the master binds the port before its workers are ready."""
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'uwsgi exited with {process.returncode}, see its log.')
+        try:
+            urllib.request.urlopen(url, timeout=1).close()
+            return
+        except urllib.error.HTTPError:
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f'uwsgi did not answer {url} within {timeout} seconds.')
+
+
+def children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as file:
+            return [int(child) for child in file.read().split()]
+    except OSError:
+        return []
+
+
+def memory_kb(pid):
+    """Return the RSS and PSS of a process in kB, read from /proc."""
+
+    sizes = {'Rss:': 0, 'Pss:': 0}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as file:
+            for line in file:
+                fields = line.split()
+                if fields[0] in sizes:
+                    sizes[fields[0]] = int(fields[1])
+    except OSError:
+        pass
+    return sizes['Rss:'], sizes['Pss:']
+
+
+def report_processes(pid):
+    workers = children(pid)
+    rss = pss = 0
+    for process in [pid] + workers:
+        process_rss, process_pss = memory_kb(process)
+        rss += process_rss
+        pss += process_pss
+    print(f'workers {len(workers)}, RSS {rss / 1024:.0f} MB, PSS {pss / 1024:.0f} MB')
+
+
+def stop(process):
+    # die-on-term makes the master stop its workers and exit on SIGTERM
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def bench(config, options, log):
+    settings = dict(DEFAULTS, **config)
+    settings.setdefault('WEB_CHEAPER_INITIAL', settings['WEB_CHEAPER'])
+    settings.update(WEB_SOCKET=f'127.0.0.1:{options.port}', WEB_PROTOCOL='http')
+    command = [
+        'uwsgi', '--ini', os.path.join(SCRIPTS_DIR, 'uwsgi.ini'),
+        '--listen', settings['WEB_LISTEN'], '--disable-logging',
+    ]
+    process = subprocess.Popen(command, cwd=APP_DIR, env=dict(os.environ, **settings), stdout=log, stderr=log)
+    try:
+        url = f'http://127.0.0.1:{options.port}{options.path}'
+        wait_for_app(url, process, options.start_timeout)
+        print('after start: ', end='')
+        report_processes(process.pid)
+        sys.stdout.flush()
+
+        loadtest = [
+            sys.executable, os.path.join(SCRIPTS_DIR, 'loadtest.py'), '--url', url,
+            '--concurrency', options.concurrency, '--duration', str(options.duration),
+            '--timeout', str(options.timeout), '--slow-clients', str(options.slow_clients),
+        ]
+        for header in options.header:
+            loadtest += ['--header', header]
+        subprocess.run(loadtest, check=True)
+
+        print('after load:  ', end='')
+        report_processes(process.pid)
+    finally:
+        stop(process)
+
+
+def main(options):
+    with open(options.log, 'a') as log:
+        for config in options.config:
+            print(f'\n== {" ".join(f"{name}={value}" for name, value in config.items()) or "defaults"}')
+            sys.stdout.flush()
+            log.write(f'\n== {config}\n')
+            log.flush()
+            bench(config, options, log)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--config', action='append', type=parse_config,
+                        help='WEB_* overrides of one configuration, repeatable. Default: the defaults alone.')
+    parser.add_argument('--path', default='/api/recipe/recipes/', help='Path to GET.')
+    parser.add_argument('--header', action='append', default=[], help='Extra "Name: value" header, repeatable.')
+    parser.add_argument('--port', type=int, default=8010, help='Local port to run uWSGI on.')
+    parser.add_argument('--concurrency', default='1,8,32', help='Comma separated concurrency levels.')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per concurrency level.')
+    parser.add_argument('--timeout', type=float, default=10, help='Seconds to wait for a response.')
+    parser.add_argument('--slow-clients', type=int, default=0, help='Connections trickling their request.')
+    parser.add_argument('--start-timeout', type=float, default=30, help='Seconds to wait for uWSGI to start.')
+    parser.add_argument('--log', default='bench_uwsgi.log', help='File the uWSGI output is appended to.')
+    options = parser.parse_args()
+    options.config = options.config or [{}]
+    main(options)
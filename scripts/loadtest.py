@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+"""
+Load test an API endpoint at rising concurrency.
+
+Each level keeps that many keep-alive connections busy for --duration
+seconds and reports throughput and latency. --slow-clients opens extra
+connections that trickle their request a byte at a time, like clients on
+bad networks: a server reading requests in its workers loses a worker to
+each of them, an async server does not.
+
+Compare what one process of each server handles, for example:
+
+    uwsgi --http :8001 --workers 1 --master --enable-threads --module app.wsgi
+    uvicorn app.asgi:application --port 8002 --workers 1
+
+    AUTH="Authorization: Bearer <access token from /api/user/token/>"
+    loadtest.py --url http://127.0.0.1:8001/api/recipe/recipes/ --header "$AUTH" --slow-clients 4
+    loadtest.py --url http://127.0.0.1:8002/api/recipe/recipes/ --header "$AUTH" --slow-clients 4
+
+Only the standard library is used, so it runs anywhere Python does.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from urllib.parse import urlsplit
+
+
+class Target:
+    """Host, port and request bytes of the URL under test."""
+
+    def __init__(self, url, headers):
+        parts = urlsplit(url)
+        if parts.scheme != 'http':
+            raise SystemExit('Only http:// URLs are supported.')
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        lines = [f'GET {path} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: keep-alive'] + headers
+        self.request = ('\r\n'.join(lines) + '\r\n\r\n').encode()
+
+
+async def read_response(reader):
+    """Read one response, returning its status code and whether the server closes the connection."""
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed.')
+    status = int(status_line.split()[1])
+    length, chunked, closing = None, False, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value:
+            chunked = True
+        elif name == 'connection' and value == 'close':
+            closing = True
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length is not None:
+        await reader.readexactly(length)
+    else:
+        await reader.read()
+        closing = True
+    return status, closing
+
+
+async def client(target, deadline, timeout, latencies, errors):
+    """Send requests one after another on a keep-alive connection until deadline."""
+
+    reader = writer = None
+    while time.monotonic() < deadline:
+        reused = writer is not None
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(target.host, target.port)
+            start = time.monotonic()
+            writer.write(target.request)
+            await writer.drain()
+            try:
+                status, closing = await asyncio.wait_for(read_response(reader), timeout)
+            except ConnectionError:
+                if not reused:
+                    raise
+                # the server closed an idle keep-alive connection, reconnect
+                writer.close()
+                writer = None
+                continue
+            latencies.append(time.monotonic() - start)
+            if status >= 400:
+                errors[status] = errors.get(status, 0) + 1
+            if closing:
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError,
+                IndexError) as error:
+            errors[type(error).__name__] = errors.get(type(error).__name__, 0) + 1
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def slow_client(target, interval, stop):
+    """Send the request a byte every interval seconds, over and over, until stop is set."""
+
+    while not stop.is_set():
+        try:
+            reader, writer = await asyncio.open_connection(target.host, target.port)
+            for byte in target.request:
+                writer.write(bytes([byte]))
+                await writer.drain()
+                try:
+                    await asyncio.wait_for(stop.wait(), interval)
+                    writer.close()
+                    return
+                except asyncio.TimeoutError:
+                    pass
+            await read_response(reader)
+            writer.close()
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            await asyncio.sleep(interval)
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+async def run_level(target, concurrency, duration, timeout):
+    latencies, errors = [], {}
+    deadline = time.monotonic() + duration
+    start = time.monotonic()
+    await asyncio.gather(*[client(target, deadline, timeout, latencies, errors) for _ in range(concurrency)])
+    return latencies, errors, time.monotonic() - start
+
+
+async def main(options):
+    target = Target(options.url, options.header)
+
+    stop = asyncio.Event()
+    slow = [asyncio.ensure_future(slow_client(target, options.slow_interval, stop))
+            for _ in range(options.slow_clients)]
+    if slow:
+        # let them take their connections first
+        await asyncio.sleep(1)
+
+    print(f'{"clients":>8} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}  errors')
+    for concurrency in options.concurrency:
+        latencies, errors, elapsed = await run_level(target, concurrency, options.duration, options.timeout)
+        if latencies:
+            ms = [latency * 1000 for latency in latencies]
+            print(f'{concurrency:>8} {len(ms) / elapsed:>9.1f} {statistics.median(ms):>8.1f} '
+                  f'{percentile(ms, 0.95):>8.1f} {percentile(ms, 0.99):>8.1f} {max(ms):>8.1f}  {errors or ""}')
+        else:
+            print(f'{concurrency:>8} {"-":>9} {"-":>8} {"-":>8} {"-":>8} {"-":>8}  {errors}')
+        sys.stdout.flush()
+
+    stop.set()
+    await asyncio.gather(*slow)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', required=True, help='http:// URL to GET.')
+    parser.add_argument('--header', action='append', default=[], help='Extra "Name: value" header, repeatable.')
+    parser.add_argument('--concurrency', default='1,8,32,128',
+                        type=lambda value: [int(level) for level in value.split(',')],
+                        help='Comma separated numbers of concurrent connections to test.')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per concurrency level.')
+    parser.add_argument('--timeout', type=float, default=10, help='Seconds to wait for a response.')
+    parser.add_argument('--slow-clients', type=int, default=0, help='Connections trickling their request.')
+    parser.add_argument('--slow-interval', type=float, default=1, help='Seconds between the bytes of slow clients.')
+    asyncio.run(main(parser.parse_args()))
@@ -6,4 +6,33 @@ python manage.py wait_for_db
 python manage.py collectstatic --noinput
 python manage.py migrate
 
-uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
\ No newline at end of file
+# start every deployment with an empty metrics directory
+export METRICS_DIR=${METRICS_DIR:-/tmp/metrics}
+rm -rf "$METRICS_DIR" && mkdir -p "$METRICS_DIR"
+
+# SERVER=asgi serves app.asgi over HTTP with uvicorn, set APP_PROTOCOL=http on the proxy.
+# It runs a single process, scale with more containers: uvicorn spawns its workers
+# rather than forking them, so they would not share core.ratelimit's table.
+if [ "${SERVER:-uwsgi}" = "asgi" ]; then
+    exec uvicorn app.asgi:application --host 0.0.0.0 --port 9000 \
+        --proxy-headers --forwarded-allow-ips '*' --no-access-log
+fi
+
+# uwsgi.ini reads its settings from these variables, override them in the environment
+export WEB_SOCKET=${WEB_SOCKET:-:9000}
+export WEB_PROTOCOL=${WEB_PROTOCOL:-uwsgi}
+export WEB_PROCESSES=${WEB_PROCESSES:-4}
+export WEB_THREADS=${WEB_THREADS:-1}
+# WEB_CHEAPER=0 keeps every process running, above 0 the workers scale between it and WEB_PROCESSES
+export WEB_CHEAPER=${WEB_CHEAPER:-0}
+export WEB_CHEAPER_INITIAL=${WEB_CHEAPER_INITIAL:-$WEB_CHEAPER}
+export WEB_CHEAPER_STEP=${WEB_CHEAPER_STEP:-1}
+export WEB_CHEAPER_ALGO=${WEB_CHEAPER_ALGO:-spare}
+export WEB_CHEAPER_OVERLOAD=${WEB_CHEAPER_OVERLOAD:-3}
+export WEB_HARAKIRI=${WEB_HARAKIRI:-60}
+export WEB_MAX_REQUESTS=${WEB_MAX_REQUESTS:-5000}
+export WEB_MAX_REQUESTS_DELTA=${WEB_MAX_REQUESTS_DELTA:-50}
+WEB_LISTEN=${WEB_LISTEN:-128}
+
+# uwsgi does not expand variables in the listen option of an ini file, so it is passed here
+exec uwsgi --ini "$(dirname "$0")/uwsgi.ini" --listen "$WEB_LISTEN"